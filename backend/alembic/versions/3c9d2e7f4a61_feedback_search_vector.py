@@ -0,0 +1,41 @@
+"""feedback full-text search vector
+
+Revision ID: 3c9d2e7f4a61
+Revises: a15ef55cffb6
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d2e7f4a61'
+down_revision: Union[str, Sequence[str], None] = 'a15ef55cffb6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Генерируемая колонка: PostgreSQL сам пересчитывает вектор при изменении name/message.
+    # Добавление STORED-колонки перезаписывает таблицу - на больших таблицах выполнять в окно обслуживания
+    op.add_column('feedback', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('russian', coalesce(message, '')), 'B')",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index('ix_feedback_search_vector', 'feedback', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_feedback_search_vector', table_name='feedback', postgresql_using='gin')
+    op.drop_column('feedback', 'search_vector')
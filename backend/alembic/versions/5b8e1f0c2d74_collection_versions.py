@@ -0,0 +1,45 @@
+"""collection version counters for ETag
+
+Revision ID: 5b8e1f0c2d74
+Revises: 3c9d2e7f4a61
+Create Date: 2026-10-18 11:40:05.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e1f0c2d74'
+down_revision: Union[str, Sequence[str], None] = '3c9d2e7f4a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('users', 'feedback')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Версия таблицы - последовательность, которую триггер увеличивает на каждую команду записи.
+    # Триггер уровня команды (FOR EACH STATEMENT): пачка из тысяч строк - одно увеличение
+    op.execute(
+        "CREATE OR REPLACE FUNCTION bump_collection_version() RETURNS trigger AS $$ "
+        "BEGIN PERFORM nextval(TG_ARGV[0]); RETURN NULL; END; $$ LANGUAGE plpgsql"
+    )
+    for table in TABLES:
+        op.execute(f"CREATE SEQUENCE IF NOT EXISTS {table}_version_seq")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_version_bump ON {table}")
+        op.execute(
+            f"CREATE TRIGGER {table}_version_bump "
+            f"AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION bump_collection_version('{table}_version_seq')"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_version_bump ON {table}")
+        op.execute(f"DROP SEQUENCE IF EXISTS {table}_version_seq")
+    op.execute("DROP FUNCTION IF EXISTS bump_collection_version()")
@@ -0,0 +1,40 @@
+"""users indexes for admin listing filters
+
+Revision ID: 8d41c6a2e9b3
+Revises: 5b8e1f0c2d74
+Create Date: 2026-10-18 15:02:47.390126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41c6a2e9b3'
+down_revision: Union[str, Sequence[str], None] = '5b8e1f0c2d74'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Те же индексы, что в DBUser.__table_args__
+INDEXES = {
+    'ix_users_role_is_active': 'users (role, is_active, id)',
+    'ix_users_username_c': 'users ((username COLLATE "C"), id)',
+    'ix_users_email_lower_c': 'users ((lower(email) COLLATE "C"), id)',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY: таблица users не блокируется на запись, пока строится индекс.
+    # Такой CREATE INDEX нельзя выполнять в транзакции, поэтому - autocommit_block
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
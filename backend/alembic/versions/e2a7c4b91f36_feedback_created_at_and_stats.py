@@ -0,0 +1,90 @@
+"""feedback created_at and incrementally maintained stats
+
+Revision ID: e2a7c4b91f36
+Revises: 8d41c6a2e9b3
+Create Date: 2026-10-18 17:26:13.508342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c4b91f36'
+down_revision: Union[str, Sequence[str], None] = '8d41c6a2e9b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Разрезы статистики для строки отзыва c (как в app.db.database)
+STATS_KEYS = (
+    "(VALUES ('total', ''), "
+    "('day', to_char(c.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD')), "
+    "('domain', lower(split_part(c.email, '@', 2))), "
+    "('email', lower(c.email))) AS k(kind, key)"
+)
+
+
+def stats_upsert(source: str) -> str:
+    return (
+        "INSERT INTO feedback_stats AS s (kind, key, count) "
+        f"SELECT k.kind, k.key, sum(c.delta) FROM ({source}) AS c CROSS JOIN LATERAL {STATS_KEYS} "
+        "WHERE k.key IS NOT NULL GROUP BY k.kind, k.key HAVING sum(c.delta) <> 0 ORDER BY k.kind, k.key "
+        "ON CONFLICT (kind, key) DO UPDATE SET count = s.count + EXCLUDED.count"
+    )
+
+
+INSERTED = "SELECT 1 AS delta, created_at, email FROM new_rows"
+DELETED = "SELECT -1 AS delta, created_at, email FROM old_rows"
+
+TRIGGERS = {
+    'feedback_stats_insert': 'AFTER INSERT ON feedback REFERENCING NEW TABLE AS new_rows',
+    'feedback_stats_update': 'AFTER UPDATE ON feedback REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'feedback_stats_delete': 'AFTER DELETE ON feedback REFERENCING OLD TABLE AS old_rows',
+    'feedback_stats_truncate': 'AFTER TRUNCATE ON feedback',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # DEFAULT now() вычисляется один раз при ALTER (PostgreSQL 11+ не переписывает таблицу):
+    # существующие отзывы получают время миграции - настоящее время их создания неизвестно
+    op.add_column(
+        'feedback',
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+    op.create_table(
+        'feedback_stats',
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('kind', 'key'),
+    )
+    op.create_index('ix_feedback_stats_top', 'feedback_stats', ['kind', sa.text('count DESC'), 'key'])
+
+    # Счетчики обновляются триггерами уровня команды в транзакции, которая меняет feedback
+    op.execute(
+        "CREATE OR REPLACE FUNCTION feedback_stats_apply() RETURNS trigger AS $$ BEGIN "
+        f"IF TG_OP = 'INSERT' THEN {stats_upsert(INSERTED)}; "
+        f"ELSIF TG_OP = 'DELETE' THEN {stats_upsert(DELETED)}; "
+        f"ELSIF TG_OP = 'UPDATE' THEN {stats_upsert(INSERTED + ' UNION ALL ' + DELETED)}; "
+        "ELSE DELETE FROM feedback_stats; "
+        "END IF; RETURN NULL; END; $$ LANGUAGE plpgsql"
+    )
+    for name, definition in TRIGGERS.items():
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON feedback")
+        op.execute(f"CREATE TRIGGER {name} {definition} FOR EACH STATEMENT EXECUTE FUNCTION feedback_stats_apply()")
+
+    # Начальные значения - по уже существующим отзывам
+    op.execute(stats_upsert("SELECT 1 AS delta, created_at, email FROM feedback"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON feedback")
+    op.execute("DROP FUNCTION IF EXISTS feedback_stats_apply()")
+    op.drop_index('ix_feedback_stats_top', table_name='feedback_stats')
+    op.drop_table('feedback_stats')
+    op.drop_column('feedback', 'created_at')
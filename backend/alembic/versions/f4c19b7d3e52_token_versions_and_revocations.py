@@ -0,0 +1,43 @@
+"""token versions and revocations
+
+Revision ID: f4c19b7d3e52
+Revises: e2a7c4b91f36
+Create Date: 2026-10-18 19:02:41.117604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c19b7d3e52'
+down_revision: Union[str, Sequence[str], None] = 'e2a7c4b91f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Константный DEFAULT: PostgreSQL 11+ добавляет колонку без перезаписи таблицы
+    op.add_column(
+        'users',
+        sa.Column('token_version', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.create_table(
+        'token_revocations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('token_version', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_token_revocations_created_at'), 'token_revocations', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_token_revocations_created_at'), table_name='token_revocations')
+    op.drop_table('token_revocations')
+    op.drop_column('users', 'token_version')
@@ -1,43 +1,73 @@
 # Импорт необходимых модулей и классов
-from fastapi import Depends, HTTPException, status
+import hashlib
+import time
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from jose import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.responses import cache_headers, etag_matches
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.security import decode_access_token
+from app.db.database import collection_version, ensure_replica_fresh, get_db
 from app.db.models import UserRole
-from typing import Optional
+from app.db.revocations import token_revocations
+from typing import Callable, Optional
 
 # Создание экземпляра OAuth2PasswordBearer для обработки токенов
 # tokenUrl указывает endpoint, где клиенты могут получать токены
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-# Асинхронная функция для получения текущего пользователя по токену
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    # Создаем исключение для случаев, когда учетные данные недействительны
-    credentials_exception = HTTPException(
+
+# Сессия БД на запрос: session: AsyncSession = db_session
+# scope="function": зависимость закрывается сразу после обработчика, до отправки ответа,
+# поэтому ошибка COMMIT попадает в ответ клиенту, а не теряется после него
+db_session = Depends(get_db, scope="function")
+
+# Кеш проверенных токенов: ключ - SHA-256 токена, значение - данные пользователя из payload
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS)
+
+
+def _credentials_exception() -> HTTPException:
+    # Исключение для случаев, когда учетные данные недействительны
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        # Декодируем JWT токен с использованием секретного ключа и алгоритма из настроек
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        # Извлекаем имя пользователя (sub - стандартное поле в JWT для subject)
-        username: str = payload.get("sub")
-        # Извлекаем роль пользователя из payload
-        role: str = payload.get("role")
-        # Если имя пользователя или роль отсутствуют, вызываем исключение
-        if username is None or role is None:
-            raise credentials_exception
-        # Возвращаем словарь с именем пользователя и его ролью (преобразованной в UserRole)
-        return {"username": username, "role": UserRole(role)}  # Используем UserRole
-    except JWTError:
-        # Если возникает ошибка JWT (например, токен недействителен), вызываем исключение
-        raise credentials_exception
-
-# Функция для получения текущего активного пользователя
+
+
+# Асинхронная функция для получения текущего пользователя по токену
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    Данные пользователя из access-токена: username, role, id и token_version.
+    Запросов к БД нет: отозванные версии токенов (смена роли или статуса, удаление)
+    проверяются по таблице в памяти воркера, которая синхронизируется раз в несколько секунд.
+    """
+    # Токен уже проверялся этим воркером - подпись повторно не проверяем
+    cache_key = hashlib.sha256(token.encode()).digest()
+    current_user = token_cache.get(cache_key)
+    if current_user is None:
+        try:
+            # Проверяем подпись, срок действия и тип токена
+            claims = decode_access_token(token)
+        except JWTError:
+            # Если возникает ошибка JWT (например, токен недействителен или истек), вызываем исключение
+            raise _credentials_exception()
+        expires = claims.pop("exp")
+        current_user = claims
+        # Запись в кеше не переживет срок действия токена (exp)
+        token_cache.set(cache_key, current_user, ttl=expires - time.time())
+
+    # Проверяется и для закешированных токенов: отзыв действует сразу после синхронизации
+    if token_revocations.is_revoked(current_user["id"], current_user["token_version"]):
+        raise _credentials_exception()
+    return dict(current_user)
+
+# Функция для получения текущего активного пользователя.
+# Отдельный запрос не нужен: токены выдаются только активным пользователям, а деактивация
+# увеличивает token_version, после чего get_current_user отклоняет выданные ранее токены
 def get_current_active_user(current_user: dict = Depends(get_current_user)):
-    # Здесь можно добавить дополнительную проверку активности пользователя
-    # Например, проверку, что пользователь не заблокирован
     return current_user
 
 # Функция-декоратор для проверки роли пользователя
@@ -52,4 +82,43 @@ def role_required(required_role: UserRole):  # Используем UserRole к
                 detail="Not enough permissions"
             )
         return current_user
-    return role_checker
\ No newline at end of file
+    return role_checker
+
+# Параметры keyset-пагинации для списочных эндпоинтов
+class PageParams:
+    def __init__(
+        self,
+        limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, description="Размер страницы"),
+        after: Optional[int] = Query(None, ge=0, description="Курсор: id последней записи предыдущей страницы"),
+    ):
+        # Сервер не отдает больше PAGE_SIZE_MAX записей, какой бы limit ни пришел
+        self.limit = min(limit, settings.PAGE_SIZE_MAX)
+        self.after = after
+
+
+# Условный GET для списков: ETag по версии таблицы
+class CollectionETag:
+    """
+    Зависимость возвращает ETag текущей версии таблицы (или None, если версии не поддерживаются).
+    Если клиент прислал совпадающий If-None-Match, сразу отвечает 304 - запрос списка и
+    сериализация не выполняются. Ставить последним параметром, после проверки прав.
+
+    vary - функция от запроса, если ответ зависит не только от таблицы (параметры, текущая дата):
+    ее значение добавляется к ETag.
+    """
+
+    def __init__(self, table: str, vary: Optional[Callable[[Request], str]] = None):
+        self.table = table
+        self.vary = vary
+
+    async def __call__(self, request: Request, session: AsyncSession = db_session) -> Optional[str]:
+        version = await collection_version(session, self.table)
+        if version is None:
+            return None
+        suffix = f"-{self.vary(request)}" if self.vary is not None else ""
+        etag = f'W/"{self.table}-{version}{suffix}"'
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
+        # Список читается с реплики, если она не отстает от этой версии, иначе - с основной БД
+        await ensure_replica_fresh(session)
+        return etag
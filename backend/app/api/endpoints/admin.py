@@ -1,107 +1,271 @@
 # Импорт необходимых модулей и зависимостей
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
 from sqlalchemy.future import select
-from app.db.database import async_session
-from app.db.models import DBUser, UserResponse, UserCreate, UserRole
-from app.api.dependencies import role_required
-from passlib.context import CryptContext
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import after_commit, use_primary
+from app.core.cache import user_cache
+from app.core.profiling import request_profiler
+from app.core.config import settings
+from app.db.models import DBUser, UserAdminUpdate, UserBulkRequest, UserResponse, UserRole
+from typing import Literal, Optional
+from app.api.dependencies import db_session, role_required, CollectionETag
+from app.api.responses import FastJSONResponse, cache_headers, json_response
+from app.db.queries import (
+    USER_COLUMNS,
+    bulk_delete_users,
+    bulk_update_users,
+    fetch_users_page,
+    ids_condition,
+    record_token_revocations,
+    update_user_returning,
+    user_dict,
+)
+from app.core.security import hash_password
 
 # Создание роутера для админских эндпоинтов с префиксом /api/admin
-router = APIRouter(prefix="/api/admin", tags=["admin"])
+router = APIRouter(prefix="/api/admin", tags=["admin"], default_response_class=FastJSONResponse)
 
-# Инициализация контекста для хеширования паролей с использованием bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# Эндпоинт для получения списка всех пользователей
-@router.get("/users", response_model=list[UserResponse])
-async def get_all_users(_ = Depends(role_required(UserRole.ADMIN))):
+# Эндпоинт для получения списка пользователей (постранично, с фильтрами)
+@router.get("/users")
+async def get_all_users(
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    sort: Literal["id", "-id", "username", "-username", "email", "-email"] = Query(
+        "id", description="Сортировка; '-' в начале - по убыванию"
+    ),
+    role: Optional[UserRole] = Query(None, description="Только пользователи с этой ролью"),
+    is_active: Optional[bool] = Query(None, description="Только активные (true) или заблокированные (false)"),
+    username_prefix: Optional[str] = Query(None, min_length=1, max_length=50, description="Начало username (с учетом регистра)"),
+    email_prefix: Optional[str] = Query(None, min_length=1, max_length=100, description="Начало email (без учета регистра)"),
+    session: AsyncSession = db_session,
+    _ = Depends(role_required(UserRole.ADMIN)),
+    etag: Optional[str] = Depends(CollectionETag("users"))  # 304, если список не менялся
+):
     """
-    Получение списка всех пользователей.
+    Получение списка пользователей постранично (keyset-пагинация).
     Доступно только для пользователей с ролью ADMIN.
-    Возвращает список пользователей в формате UserResponse.
+
+    Фильтры объединяются через AND; каждый обслуживается индексом
+    (ix_users_role_is_active, ix_users_username_c, ix_users_email_lower_c).
+    Для следующей страницы передайте next_cursor с теми же фильтрами и сортировкой.
+
+    Возвращает:
+    - items: пользователи в формате UserResponse
+    - next_cursor: курсор следующей страницы или null, если это последняя страница
+    - limit: фактический размер страницы (не больше PAGE_SIZE_MAX)
     """
-    async with async_session() as session:
-        # Выполнение SQL-запроса для получения всех пользователей
-        result = await session.execute(select(DBUser))
-        # Преобразование результата в список объектов и возврат
-        return result.scalars().all()
+    # Выбираем только нужные колонки и сериализуем строки сразу в JSON,
+    # без ORM-объектов и pydantic-модели на каждого пользователя
+    try:
+        page = await fetch_users_page(
+            session,
+            limit=min(limit, settings.PAGE_SIZE_MAX),
+            sort=sort,
+            cursor=cursor,
+            role=role,
+            is_active=is_active,
+            username_prefix=username_prefix,
+            email_prefix=email_prefix,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(page, headers=cache_headers(etag))
 
 # Эндпоинт для получения конкретного пользователя по ID
 @router.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, _ = Depends(role_required(UserRole.ADMIN))):
+async def get_user(
+    user_id: int,
+    session: AsyncSession = db_session,
+    _ = Depends(role_required(UserRole.ADMIN))
+):
     """
     Получение информации о конкретном пользователе по его ID.
     Доступно только для пользователей с ролью ADMIN.
     Если пользователь не найден, возвращает 404 ошибку.
     """
-    async with async_session() as session:
-        # Выполнение SQL-запроса для поиска пользователя по ID
-        result = await session.execute(select(DBUser).where(DBUser.id == user_id))
-        user = result.scalars().first()
-        # Проверка существования пользователя
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        return user
+    # Профиль из кеша: запрос к БД не нужен
+    cached = await user_cache.get_by_id(user_id)
+    if cached is not None:
+        return cached
+
+    # Поколение - до чтения, заполнение - только с основной БД (как в GET /api/users/me)
+    generation = await user_cache.generation(user_id)
+    use_primary(session)
+    # Выполнение SQL-запроса для поиска пользователя по ID
+    result = await session.execute(select(DBUser).where(DBUser.id == user_id))
+    user = result.scalars().first()
+    # Проверка существования пользователя
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    await user_cache.store(user, generation)
+    return user
 
 # Эндпоинт для обновления информации о пользователе
 @router.put("/users/{user_id}", response_model=UserResponse)
 async def update_user(
     user_id: int, 
-    user_data: UserCreate,
+    user_data: UserAdminUpdate,
+    session: AsyncSession = db_session,
     _ = Depends(role_required(UserRole.ADMIN))
 ):
     """
     Обновление информации о пользователе.
     Доступно только для пользователей с ролью ADMIN.
+    Смена username, роли или статуса активности отзывает выданные пользователю токены
+    (на всех воркерах - в течение TOKEN_REVOCATION_SYNC_SECONDS).
     """
+    # Хешируем пароль до обращения к БД, чтобы не держать соединение во время bcrypt
+    hashed_password = await hash_password(user_data.password) if user_data.password else None
+
+    # Обновляем только переданные поля
+    values = {}
+    if user_data.username:
+        values["username"] = user_data.username
+    if user_data.email:
+        values["email"] = user_data.email
+    if hashed_password:
+        values["hashed_password"] = hashed_password
+    if user_data.role is not None:
+        values["role"] = user_data.role
+    if user_data.is_active is not None:
+        values["is_active"] = user_data.is_active
+    if not values:
+        # Менять нечего - просто возвращаем профиль
+        user = (await session.execute(select(*USER_COLUMNS).where(DBUser.id == user_id))).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+    
+    # Одна команда UPDATE ... RETURNING: новые значения и прежний username, без SELECT до и после.
+    # Ошибки БД (например, занятый username) возвращаются клиенту; COMMIT и откат выполняет get_db
     try:
-        async with async_session() as session:
-            result = await session.execute(select(DBUser).where(DBUser.id == user_id))
-            user = result.scalars().first()
-            
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
-            
-            # Обновляем только переданные поля
-            if user_data.username:
-                user.username = user_data.username
-            if user_data.email:
-                user.email = user_data.email
-            if user_data.password:
-                user.hashed_password = pwd_context.hash(user_data.password)
-            if user_data.role:
-                user.role = user_data.role
-            if hasattr(user_data, 'is_active'):
-                user.is_active = user_data.is_active
-            
-            await session.commit()
-            await session.refresh(user)
-            return user
-            
-    except Exception as e:
-        await session.rollback()
+        user = await update_user_returning(session, DBUser.id == user_id, values)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="Username already registered")
+    except SQLAlchemyError as e:
         raise HTTPException(
             status_code=500,
             detail=f"Update failed: {str(e)}"
         )
+    
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    # Записи в кеше сбрасываются после COMMIT (роль и статус должны обновиться сразу);
+    # после переименования сбросить нужно и запись под прежним username
+    old_username, new_username = user.old_username, user.username
+    after_commit(session, lambda: user_cache.invalidate(user_id, old_username, new_username))
+    return user
 
 # Эндпоинт для удаления пользователя
 @router.delete("/users/{user_id}")
-async def delete_user(user_id: int, _ = Depends(role_required(UserRole.ADMIN))):
+async def delete_user(
+    user_id: int,
+    session: AsyncSession = db_session,
+    _ = Depends(role_required(UserRole.ADMIN))
+):
     """
     Удаление пользователя по ID.
     Доступно только для пользователей с ролью ADMIN.
     Если пользователь не найден, возвращает 404 ошибку.
     При успешном удалении возвращает сообщение об успехе.
     """
-    async with async_session() as session:
-        # Поиск пользователя для удаления
-        result = await session.execute(select(DBUser).where(DBUser.id == user_id))
-        user = result.scalars().first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Удаление пользователя и сохранение изменений
-        await session.delete(user)
-        await session.commit()
-        return {"message": "User deleted successfully"}
\ No newline at end of file
+    # Поиск пользователя для удаления
+    result = await session.execute(select(DBUser).where(DBUser.id == user_id))
+    user = result.scalars().first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Удаление пользователя (COMMIT выполнит зависимость get_db); выданные ему токены отзываются
+    await session.delete(user)
+    await record_token_revocations(session, [(user.id, user.token_version + 1)])
+    username = user.username
+    after_commit(session, lambda: user_cache.invalidate(user_id, username))
+    return {"message": "User deleted successfully"}
+
+# Эндпоинт для массового изменения или удаления пользователей
+@router.post("/users/bulk")
+async def bulk_users(
+    request_data: UserBulkRequest,
+    session: AsyncSession = db_session,
+    current_user: dict = Depends(role_required(UserRole.ADMIN))
+):
+    """
+    Массовое изменение роли и/или статуса активности либо удаление пользователей.
+    Пользователи отбираются по списку ids и/или фильтру (role, is_active), условия объединяются через AND.
+    Учетная запись самого администратора в операцию не попадает.
+    Выполняется одной командой UPDATE/DELETE ... RETURNING в одной транзакции.
+
+    Возвращает:
+    - action: выполненное действие
+    - affected: количество затронутых пользователей
+    - users: затронутые пользователи (для update - с новыми значениями)
+    """
+    if request_data.ids and len(request_data.ids) > settings.ADMIN_BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many ids, maximum is {settings.ADMIN_BULK_MAX_IDS}"
+        )
+
+    # Условия отбора; администратор не может случайно заблокировать или удалить сам себя
+    where = [DBUser.username != current_user["username"]]
+    if request_data.ids:
+        where.append(ids_condition(session, DBUser.id, request_data.ids))
+    if request_data.filter is not None:
+        if request_data.filter.role is not None:
+            where.append(DBUser.role == request_data.filter.role)
+        if request_data.filter.is_active is not None:
+            where.append(DBUser.is_active == request_data.filter.is_active)
+
+    # Одна команда на все строки; COMMIT выполнит зависимость get_db
+    try:
+        if request_data.action == "delete":
+            rows = await bulk_delete_users(session, where)
+        else:
+            values = {}
+            if request_data.role is not None:
+                values["role"] = request_data.role
+            if request_data.is_active is not None:
+                values["is_active"] = request_data.is_active
+            rows = await bulk_update_users(session, where, values)
+    except SQLAlchemyError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Bulk operation failed: {str(e)}"
+        )
+
+    # Кеш профилей сбрасывается после COMMIT, пачками ключей
+    affected = [(row.id, row.username) for row in rows]
+    if affected:
+        after_commit(session, lambda: user_cache.invalidate_many(affected))
+    return json_response({
+        "action": request_data.action,
+        "affected": len(rows),
+        "users": [user_dict(row) for row in rows],
+    })
+
+
+# Эндпоинт со списком сохраненных профилей запросов
+@router.get("/profiles")
+async def list_profiles(_ = Depends(role_required(UserRole.ADMIN))):
+    """
+    Профили запросов, новые первыми: маршрут, статус, время (wall и CPU), число SQL-запросов и время в БД.
+    Профиль снимается для запроса с заголовком X-Profile: 1 и токеном администратора
+    (id приходит в заголовке ответа X-Profile-Id) или для доли PROFILING_SAMPLE_RATE всех запросов.
+    Хранятся PROFILING_MAX_FILES последних профилей всех воркеров.
+    """
+    return await asyncio.to_thread(request_profiler.list_profiles)
+
+
+# Эндпоинт для скачивания профиля запроса
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, _ = Depends(role_required(UserRole.ADMIN))):
+    """
+    Скачивание профиля: HTML-отчет pyinstrument или файл .prof cProfile (pstats, snakeviz).
+    """
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(profile["path"], media_type=profile["media_type"], filename=profile["file"])
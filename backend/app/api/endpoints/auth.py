@@ -1,25 +1,55 @@
 # backend/app/api/endpoints/auth.py
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from app.core.config import settings
-from app.api.dependencies import get_current_user
-from app.db.models import Token, UserCreate, UserResponse, TokenData, UserRole
-from app.db.database import async_session
+from app.api.dependencies import db_session
+from app.db.models import Token, TokenRefresh, UserCreate, UserResponse
 from app.db.models import DBUser
-from passlib.context import CryptContext
-from jose import jwt
+from app.core.security import hash_password, verify_password
+from app.db.queries import insert_user_returning
+from jose import JWTError, jwt
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Создаем роутер FastAPI с префиксом "/auth" и тегом "auth" для группировки в документации
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-# Инициализируем контекст для хеширования паролей с использованием алгоритма bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def _issue_tokens(user) -> dict:
+    """
+    Пара токенов для пользователя (нужны id, username, role и token_version).
+    access-токен короткоживущий и проверяется без БД; refresh-токен живет дольше
+    и обменивается на новую пару в /auth/refresh с проверкой пользователя по БД.
+    """
+    now = datetime.now(timezone.utc)
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    # uid и ver: по ним воркеры отклоняют токены, выданные до смены роли или статуса
+    claims = {"sub": user.username, "uid": user.id, "ver": user.token_version}
+    access_token = jwt.encode(
+        {**claims, "role": user.role.value, "type": "access", "exp": now + access_token_expires},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+    refresh_token = jwt.encode(
+        {**claims, "type": "refresh", "exp": now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": int(access_token_expires.total_seconds()),
+    }
+
 
 # Эндпоинт для получения токена доступа (аутентификации)
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    session: AsyncSession = db_session
+):
     """
     Аутентификация пользователя и выдача JWT токена.
     
@@ -28,39 +58,70 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     - password: пароль
     
     Возвращает:
-    - access_token: JWT токен для аутентификации
+    - access_token: JWT токен для аутентификации (действует ACCESS_TOKEN_EXPIRE_MINUTES)
+    - refresh_token: токен для получения новой пары через /auth/refresh
     - token_type: тип токена (bearer)
+    - expires_in: срок действия access_token в секундах
     """
-    # Открываем асинхронную сессию с базой данных
-    async with async_session() as session:
-        # Ищем пользователя по имени пользователя
-        result = await session.execute(select(DBUser).where(DBUser.username == form_data.username))
-        user = result.scalars().first()
-        
+    # Ищем пользователя по имени пользователя
+    result = await session.execute(select(DBUser).where(DBUser.username == form_data.username))
+    user = result.scalars().first()
+    # Возвращаем соединение в пул до проверки пароля: bcrypt занимает десятки миллисекунд
+    await session.close()
+    
     # Проверяем, существует ли пользователь и совпадает ли пароль
-    if not user or not pwd_context.verify(form_data.password, user.hashed_password):
+    # bcrypt выполняется в пуле, event loop не блокируется
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
+    # Заблокированный пользователь токены не получает: проверки активности в запросах не нужны
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
     
-    # Устанавливаем срок действия токена из настроек
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    # Возвращаем токены в стандартном формате OAuth2
+    return _issue_tokens(user)
+
+
+# Эндпоинт для обновления пары токенов
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(request_data: TokenRefresh, session: AsyncSession = db_session):
+    """
+    Выдает новую пару токенов по refresh_token.
     
-    # Генерируем JWT токен с данными пользователя
-    access_token = jwt.encode(
-        {"sub": user.username, "role": user.role.value},  # payload токена
-        settings.SECRET_KEY,                             # секретный ключ
-        algorithm=settings.ALGORITHM                     # алгоритм шифрования
+    Единственная проверка пользователя по БД: он существует, активен, а его token_version
+    совпадает с версией в токене. После смены роли, статуса или username refresh-токены,
+    выданные раньше, не принимаются - нужен повторный вход.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    # Возвращаем токен в стандартном формате OAuth2
-    return {"access_token": access_token, "token_type": "bearer"}
+    try:
+        payload = jwt.decode(
+            request_data.refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM],
+            options={"require_exp": True},
+        )
+    except JWTError:
+        raise credentials_exception
+    if payload.get("type") != "refresh" or payload.get("uid") is None:
+        raise credentials_exception
+
+    result = await session.execute(
+        select(DBUser.id, DBUser.username, DBUser.role, DBUser.is_active, DBUser.token_version)
+        .where(DBUser.id == payload["uid"])
+    )
+    user = result.first()
+    if user is None or not user.is_active or user.token_version != payload.get("ver"):
+        raise credentials_exception
+    return _issue_tokens(user)
 
 
 # Эндпоинт для регистрации новых пользователей
 @router.post("/register", response_model=UserResponse)
-async def register_user(user: UserCreate):
+async def register_user(user: UserCreate, session: AsyncSession = db_session):
     """
     Регистрация нового пользователя в системе.
     
@@ -73,29 +134,20 @@ async def register_user(user: UserCreate):
     Возвращает:
     - Данные зарегистрированного пользователя
     """
-    async with async_session() as session:
-        # Проверяем, что username уникален
-        result = await session.execute(select(DBUser).where(DBUser.username == user.username))
-        if result.scalars().first():
-            raise HTTPException(status_code=400, detail="Username already registered")
-        
-        # Хешируем пароль перед сохранением в базу
-        hashed_password = pwd_context.hash(user.password)
-        
-        # Создаем объект пользователя для базы данных
-        db_user = DBUser(
-            username=user.username,
-            email=user.email,
-            hashed_password=hashed_password,
-            role=user.role  # Используем значение из запроса
-        )
-        
-        # Добавляем пользователя в сессию и сохраняем в базу
-        session.add(db_user)
-        await session.commit()
-        
-        # Обновляем объект пользователя (получаем сгенерированный ID и т.д.)
-        await session.refresh(db_user)
-        
-        # Возвращаем данные зарегистрированного пользователя
-        return db_user
\ No newline at end of file
+    # Хешируем пароль до обращения к БД, чтобы не держать соединение во время bcrypt
+    hashed_password = await hash_password(user.password)
+    
+    # Одна команда INSERT ... ON CONFLICT (username) DO NOTHING RETURNING:
+    # проверка уникальности и вставка атомарны, две параллельные регистрации не пройдут обе.
+    # COMMIT выполнит зависимость get_db
+    db_user = await insert_user_returning(session, {
+        "username": user.username,
+        "email": user.email,
+        "hashed_password": hashed_password,
+        "role": user.role,  # Используем значение из запроса
+    })
+    if db_user is None:
+        raise HTTPException(status_code=400, detail="Username already registered")
+    
+    # Возвращаем данные зарегистрированного пользователя
+    return db_user
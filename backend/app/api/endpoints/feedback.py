@@ -1,55 +1,95 @@
 # Импорт необходимых модулей и зависимостей
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, delete
-from app.api.dependencies import get_current_active_user, role_required, UserRole
+from typing import Any, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Response, status
+from pydantic import ValidationError
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.dependencies import get_current_active_user, UserRole, PageParams, db_session, CollectionETag
 from app.db.models import FeedbackCreate, DBFeedback
-from app.db.database import async_session
+from app.core.config import settings
+from app.db.queries import fetch_feedback_page, insert_feedback_rows
+from app.db.write_buffer import feedback_buffer
+from app.api.responses import FastJSONResponse, cache_headers, json_response
 
 # Создание роутера FastAPI с префиксом '/api/feedback' и тегом 'feedback' для документации
-router = APIRouter(prefix="/api/feedback", tags=["feedback"])
+router = APIRouter(prefix="/api/feedback", tags=["feedback"], default_response_class=FastJSONResponse)
 
 # Эндпоинт для создания нового отзыва
 @router.post("/", response_model=FeedbackCreate)
 async def create_feedback(
     feedback: FeedbackCreate,  # Получаем данные отзыва из тела запроса
-    current_user: dict = Depends(get_current_active_user)  # Проверяем авторизацию пользователя
+    response: Response,
+    current_user: dict = Depends(get_current_active_user),  # Проверяем авторизацию пользователя
+    session: AsyncSession = db_session  # Сессия БД на запрос, COMMIT в конце выполнит get_db
 ):
-    async with async_session() as session:  # Открываем асинхронную сессию с БД
-        # Создаем новый объект отзыва для базы данных
-        db_feedback = DBFeedback(
-            name=feedback.name,
-            message=feedback.message,
-            email=feedback.email,
-            phone=feedback.phone
+    if feedback_buffer.running:
+        # Режим write-behind: отзыв уходит в очередь и записывается пачкой вместе с другими,
+        # соединение из пула на время запроса не занимается
+        await feedback_buffer.submit(feedback.model_dump())
+        if feedback_buffer.durability == "accepted":
+            response.status_code = status.HTTP_202_ACCEPTED
+        return feedback
+
+    # Вставляем отзыв (INSERT ... RETURNING id), COMMIT выполнит зависимость get_db
+    await insert_feedback_rows(session, [feedback.model_dump()])
+    return feedback  # Возвращаем исходные данные отзыва (без ID)
+
+# Эндпоинт для пакетной загрузки отзывов
+@router.post("/bulk")
+async def create_feedback_bulk(
+    items: list[dict[str, Any]] = Body(..., description="Список отзывов в формате FeedbackCreate"),
+    current_user: dict = Depends(get_current_active_user),
+    session: AsyncSession = db_session
+):
+    """
+    Загружает пачку отзывов одной командой (многострочный INSERT или COPY для больших пачек).
+    Каждый элемент проверяется отдельно: корректные сохраняются, для остальных возвращаются ошибки.
+
+    Возвращает:
+    - created: индексы элементов запроса и присвоенные id
+    - errors: индексы элементов, не прошедших проверку, и описание ошибок
+    """
+    if len(items) > settings.FEEDBACK_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many items, maximum is {settings.FEEDBACK_BULK_MAX_ITEMS}"
         )
-        session.add(db_feedback)  # Добавляем отзыв в сессию
-        await session.commit()  # Сохраняем изменения в БД
-        await session.refresh(db_feedback)  # Обновляем объект для получения данных из БД (например, ID)
-        return feedback  # Возвращаем исходные данные отзыва (без ID)
 
-# Эндпоинт для получения списка всех отзывов
+    valid_indexes, rows, errors = [], [], []
+    for index, item in enumerate(items):
+        try:
+            feedback = FeedbackCreate.model_validate(item)
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.errors(include_url=False, include_context=False)})
+            continue
+        valid_indexes.append(index)
+        rows.append(feedback.model_dump())
+
+    # Все корректные отзывы - одной командой; COMMIT выполнит зависимость get_db
+    ids = await insert_feedback_rows(session, rows)
+    return json_response({
+        "created": [{"index": index, "id": feedback_id} for index, feedback_id in zip(valid_indexes, ids)],
+        "errors": errors,
+    })
+
+# Эндпоинт для получения списка отзывов (постранично)
 @router.get("/")
-async def get_feedbacks(current_user: dict = Depends(get_current_active_user)):
-    async with async_session() as session:  # Открываем асинхронную сессию с БД
-        # Выполняем запрос на выбор всех записей из таблицы отзывов
-        result = await session.execute(select(DBFeedback))
-        feedbacks = result.scalars().all()  # Получаем все результаты
-        # Преобразуем результаты в список словарей для ответа
-        return [
-            {
-                "id": fb.id,
-                "name": fb.name,
-                "message": fb.message,
-                "email": fb.email,
-                "phone": fb.phone
-            } for fb in feedbacks
-        ]
+async def get_feedbacks(
+    page: PageParams = Depends(),  # limit/after из query-параметров
+    current_user: dict = Depends(get_current_active_user),
+    session: AsyncSession = db_session,
+    etag: Optional[str] = Depends(CollectionETag("feedback"))  # 304, если список не менялся
+):
+    # Страница отзывов: {"items": [...], "next_cursor": id | null, "limit": n}
+    page_data = await fetch_feedback_page(session, page.limit, page.after)
+    return json_response(page_data, headers=cache_headers(etag))
 
 # Эндпоинт для удаления отзыва по ID
 @router.delete("/{feedback_id}")
 async def delete_feedback(
     feedback_id: int,  # ID отзыва из URL пути
-    current_user: dict = Depends(get_current_active_user)  # Проверяем авторизацию пользователя
+    current_user: dict = Depends(get_current_active_user),  # Проверяем авторизацию пользователя
+    session: AsyncSession = db_session
 ):
     # Проверяем права пользователя - только ADMIN или MODERATOR могут удалять
     if current_user["role"] not in [UserRole.ADMIN, UserRole.MODERATOR]:
@@ -58,19 +98,17 @@ async def delete_feedback(
             detail="Not enough permissions"
         )
     
-    async with async_session() as session:  # Открываем асинхронную сессию с БД
-        # Выполняем запрос на удаление отзыва с указанным ID
-        result = await session.execute(
-            delete(DBFeedback).where(DBFeedback.id == feedback_id)
+    # Выполняем запрос на удаление отзыва с указанным ID (COMMIT выполнит get_db)
+    result = await session.execute(
+        delete(DBFeedback).where(DBFeedback.id == feedback_id)
+    )
+    
+    # Проверяем, была ли удалена хотя бы одна запись
+    if result.rowcount == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Feedback not found"
         )
-        await session.commit()  # Сохраняем изменения в БД
-        
-        # Проверяем, была ли удалена хотя бы одна запись
-        if result.rowcount == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Feedback not found"
-            )
-        
-        # Возвращаем сообщение об успешном удалении
-        return {"message": "Feedback deleted successfully"}
\ No newline at end of file
+    
+    # Возвращаем сообщение об успешном удалении
+    return {"message": "Feedback deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,38 @@
+import hmac
+import ipaddress
+
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from app.core.config import settings
+from app.core.metrics import render_metrics
+
+router = APIRouter()
+
+# Сети, которым метрики доступны без токена
+ALLOWED_NETWORKS = [
+    ipaddress.ip_network(network.strip())
+    for network in settings.METRICS_ALLOWED_NETWORKS.split(",")
+    if network.strip()
+]
+
+
+def _metrics_allowed(request: Request) -> bool:
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode())
+    if request.client is None:
+        return False
+    try:
+        address = ipaddress.ip_address(request.client.host)
+    except ValueError:
+        return False
+    return any(address in network for network in ALLOWED_NETWORKS)
+
+
+# Метрики для Prometheus (агрегированы по всем воркерам gunicorn).
+# Чужим клиентам - 404, как и через nginx: эндпоинт не должен выдавать себя
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if not _metrics_allowed(request):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,14 +1,36 @@
 # Импорт необходимых модулей и зависимостей
-from fastapi import APIRouter, Depends
-from app.api.dependencies import role_required, UserRole
-from app.db.database import async_session
-from app.db.models import DBFeedback
-from sqlalchemy import select
+import asyncio
+import csv
+import io
+import logging
+import time
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.api.dependencies import oauth2_scheme, role_required, UserRole, PageParams, db_session, CollectionETag
+from app.api.responses import FastJSONResponse, cache_headers, dumps, json_response
+from app.core.config import settings
+from app.core.security import decode_access_token
+from app.db.database import async_session, engine
+from app.db.feed import CLOSED, RESYNC, feedback_feed
+from app.db.revocations import token_revocations
+from app.db.queries import (
+    FEEDBACK_COLUMNS,
+    fetch_feedback_page,
+    fetch_feedback_stats,
+    latest_feedback_id,
+    search_feedback,
+    stream_feedback_batches,
+)
+
+logger = logging.getLogger(__name__)
 
 # Создание роутера для модераторских эндпоинтов
 # prefix="/api/moderator" - все пути в этом роутере будут начинаться с /api/moderator
 # tags=["moderator"] - для группировки в документации Swagger/OpenAPI
-router = APIRouter(prefix="/api/moderator", tags=["moderator"])
+router = APIRouter(prefix="/api/moderator", tags=["moderator"], default_response_class=FastJSONResponse)
 
 # Тестовый эндпоинт для проверки работы модераторского раздела
 @router.get("/test")
@@ -16,30 +38,264 @@ async def test_endpoint():
     # Просто возвращает JSON-ответ, подтверждающий что эндпоинт работает
     return {"message": "Moderator endpoint works"}
 
-# Эндпоинт для получения всех отзывов (доступен только модераторам)
+# Эндпоинт для получения отзывов (доступен только модераторам)
 @router.get("/feedbacks")
-async def get_all_feedbacks(_ = Depends(role_required(UserRole.MODERATOR))):
+async def get_all_feedbacks(
+    page: PageParams = Depends(),
+    session: AsyncSession = db_session,
+    _ = Depends(role_required(UserRole.MODERATOR)),
+    etag: Optional[str] = Depends(CollectionETag("feedback"))  # 304, если список не менялся
+):
     """
-    Получает список всех отзывов из базы данных.
+    Получает страницу отзывов из базы данных.
     Доступ разрешен только пользователям с ролью MODERATOR.
     Зависимость role_required проверяет права доступа.
+
+    Пагинация по курсору: limit - размер страницы (не больше PAGE_SIZE_MAX),
+    after - значение next_cursor из предыдущего ответа.
+    """
+    # Тот же запрос, что и в /api/feedback/ - выборка страницы по id
+    page_data = await fetch_feedback_page(session, page.limit, page.after)
+    return json_response(page_data, headers=cache_headers(etag))
+
+
+# Эндпоинт для полнотекстового поиска по отзывам (доступен только модераторам)
+@router.get("/feedbacks/search")
+async def search_feedbacks(
+    q: str = Query(..., min_length=1, max_length=200, description="Поисковый запрос: слова, \"фраза\", -исключение"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор: next_cursor из предыдущего ответа с тем же q"),
+    session: AsyncSession = db_session,
+    _ = Depends(role_required(UserRole.MODERATOR))
+):
+    """
+    Ищет отзывы по имени отправителя и тексту (PostgreSQL full-text search, GIN-индекс).
+    Результаты отсортированы по релевантности, поле rank - оценка релевантности.
+    Следующая страница - по next_cursor из ответа.
+    """
+    if session.bind.dialect.name != "postgresql":
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Feedback search requires PostgreSQL")
+    try:
+        page = await search_feedback(session, q, min(limit, settings.PAGE_SIZE_MAX), cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(page)
+
+
+def _stats_etag_vary(request) -> str:
+    # Окно days отсчитывается от текущей даты UTC: после полуночи ответ другой, даже без новых отзывов
+    # Параметры - до валидации, поэтому в ETag попадают только цифры
+    today = datetime.now(timezone.utc).strftime("%Y%m%d")
+    days, top = (
+        "".join(filter(str.isdigit, request.query_params.get(name, default)))
+        for name, default in (("days", "30"), ("top", "10"))
+    )
+    return f"{today}-{days}-{top}"
+
+
+# Эндпоинт со статистикой отзывов (доступен только модераторам)
+@router.get("/feedbacks/stats")
+async def get_feedback_stats(
+    days: int = Query(30, ge=1, le=366, description="За сколько последних дней (UTC) вернуть число отзывов по дням"),
+    top: int = Query(10, ge=1, le=100, description="Сколько доменов и отправителей вернуть"),
+    session: AsyncSession = db_session,
+    _ = Depends(role_required(UserRole.MODERATOR)),
+    # 304, если отзывы не менялись, а дата и параметры те же
+    etag: Optional[str] = Depends(CollectionETag("feedback", vary=_stats_etag_vary))
+):
+    """
+    Статистика отзывов: общее число, число по дням, самые частые домены email и отправители.
+
+    Значения берутся из счетчиков feedback_stats, которые триггеры обновляют в той же транзакции,
+    что и создание или удаление отзыва, - без GROUP BY по таблице отзывов.
+    Время ответа не зависит от числа отзывов.
+    """
+    if session.bind.dialect.name != "postgresql":
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Feedback stats require PostgreSQL")
+    return json_response(await fetch_feedback_stats(session, days, top), headers=cache_headers(etag))
+
+
+# Форматы выгрузки: тип содержимого и расширение файла
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+
+async def _ndjson_chunks():
+    # Одна строка JSON на отзыв, одна порция ответа на пачку строк из курсора
+    async for batch in stream_feedback_batches(settings.FEEDBACK_EXPORT_CHUNK_SIZE):
+        yield b"".join(dumps(row._asdict()) + b"\n" for row in batch)
+
+
+async def _csv_chunks():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # Заголовок отправляем сразу, еще до выполнения запроса
+    writer.writerow([column.key for column in FEEDBACK_COLUMNS])
+    yield buffer.getvalue()
+
+    async for batch in stream_feedback_batches(settings.FEEDBACK_EXPORT_CHUNK_SIZE):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+# Эндпоинт для потоковой выгрузки всех отзывов (доступен только модераторам)
+@router.get("/feedbacks/export")
+async def export_feedbacks(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson или csv"),
+    _ = Depends(role_required(UserRole.MODERATOR))
+):
+    """
+    Выгружает все отзывы в формате NDJSON или CSV.
+    Строки читаются из серверного курсора пачками по FEEDBACK_EXPORT_CHUNK_SIZE
+    и сразу отправляются клиенту, поэтому потребление памяти не зависит от размера таблицы.
+    """
+    media_type, extension = EXPORT_FORMATS[format]
+    chunks = _csv_chunks() if format == "csv" else _ndjson_chunks()
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="feedback.{extension}"'},
+    )
+
+
+def _sse_event(item: dict) -> bytes:
+    # id события - id отзыва: браузер вернет его в Last-Event-ID при переподключении
+    return b"id: %d\nevent: feedback\ndata: %s\n\n" % (item["id"], dumps(item))
+
+
+async def _catch_up(since: int, delivered: set) -> tuple:
+    """
+    Отзывы с id > since из БД (не больше FEEDBACK_FEED_BACKLOG_MAX) в виде событий,
+    кроме уже отправленных в этом подключении (delivered). Возвращает (события, наибольший
+    прочитанный id или None). Если пропущено больше, добавляет событие truncated с курсором:
+    остальное клиент дочитывает через GET /api/moderator/feedbacks.
     """
-    
-    # Создание асинхронной сессии для работы с базой данных
     async with async_session() as session:
-        # Выполнение SQL-запроса для выборки всех записей из таблицы отзывов
-        result = await session.execute(select(DBFeedback))
-        
-        # Преобразование результата в список объектов Python
-        feedbacks = result.scalars().all()
-        
-        # Преобразование каждого объекта отзыва в словарь и возврат списка таких словарей
-        return [
-            {
-                "id": fb.id,           # ID отзыва
-                "name": fb.name,       # Имя отправителя
-                "message": fb.message,  # Текст отзыва
-                "email": fb.email,      # Email отправителя
-                "phone": fb.phone       # Телефон отправителя
-            } for fb in feedbacks       # Генератор списка для всех отзывов
-        ]
\ No newline at end of file
+        page = await fetch_feedback_page(session, settings.FEEDBACK_FEED_BACKLOG_MAX, since)
+    items = [item for item in page["items"] if item["id"] not in delivered]
+    chunk = b"".join(_sse_event(item) for item in items)
+    if page["next_cursor"] is not None:
+        chunk += b"event: truncated\ndata: %s\n\n" % dumps({"next_cursor": page["next_cursor"]})
+    delivered.update(item["id"] for item in items)
+    return chunk, page["items"][-1]["id"] if page["items"] else None
+
+
+def _forget_delivered(delivered: set, after: int) -> None:
+    # Отправленные id нужны только в окне look-back: более старые _catch_up не перечитывает
+    if len(delivered) > 2 * settings.FEEDBACK_FEED_LOOKBACK_IDS:
+        floor = after - settings.FEEDBACK_FEED_LOOKBACK_IDS
+        delivered.difference_update([feedback_id for feedback_id in delivered if feedback_id <= floor])
+
+
+def _still_authorized(user: dict, expires: float) -> bool:
+    # Права проверяются при подключении, а поток живет часами: токен может истечь или быть отозван
+    return time.time() < expires and not token_revocations.is_revoked(user["id"], user["token_version"])
+
+
+async def _feed_events(after: Optional[int], user: dict, expires: float):
+    # Подписываемся до чтения пропущенного: отзыв, созданный между чтением и подпиской, не потеряется
+    queue = feedback_feed.subscribe()
+    try:
+        # id, отправленные в этом подключении (последние FEEDBACK_FEED_LOOKBACK_IDS)
+        delivered = set()
+        if after is None:
+            # Новое подключение: только отзывы, созданные с этого момента
+            async with async_session() as session:
+                after = await latest_feedback_id(session)
+        else:
+            # Переподключение: что клиент получил до обрыва, неизвестно - только id > after
+            chunk, last_id = await _catch_up(after, delivered)
+            after = max(after, last_id or 0)
+            if chunk:
+                yield chunk
+
+        while True:
+            # Ждем не дольше heartbeat и не дольше срока действия токена
+            timeout = min(settings.FEEDBACK_FEED_HEARTBEAT_SECONDS, max(expires - time.time(), 0))
+            try:
+                batch = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                batch = None
+            if not _still_authorized(user, expires):
+                # Закрываем поток: браузер переподключится и получит 401 со старым токеном
+                logger.info(f"🔒 Live feed closed for user {user['id']}: token expired or revoked")
+                return
+            if batch is None:
+                # Комментарий SSE: держит соединение через прокси и обнаруживает отключение клиента
+                yield b": ping\n\n"
+                continue
+            if batch is CLOSED:
+                return
+            if batch is RESYNC:
+                # Клиент не успевал читать или LISTEN переподключался: пропущенное - из БД.
+                # id выдаются при INSERT, а видны после COMMIT: отзыв с меньшим id может появиться
+                # позже отправленного, поэтому перечитываем и окно из FEEDBACK_FEED_LOOKBACK_IDS id до after
+                since = max(after - settings.FEEDBACK_FEED_LOOKBACK_IDS, 0)
+                chunk, last_id = await _catch_up(since, delivered)
+                after = max(after, last_id or 0)
+                _forget_delivered(delivered, after)
+                if chunk:
+                    yield chunk
+                continue
+            # Отзывы, уже отправленные из БД, второй раз не шлем
+            items = [row._asdict() for row in batch if row.id not in delivered]
+            if items:
+                after = max(after, max(item["id"] for item in items))
+                delivered.update(item["id"] for item in items)
+                _forget_delivered(delivered, after)
+                yield b"".join(_sse_event(item) for item in items)
+    finally:
+        feedback_feed.unsubscribe(queue)
+
+
+# Эндпоинт с лентой новых отзывов в реальном времени (доступен только модераторам)
+@router.get("/feedbacks/live")
+async def live_feedbacks(
+    after: Optional[int] = Query(None, ge=0, description="Дослать отзывы с id больше этого (id последнего полученного)"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(role_required(UserRole.MODERATOR))
+):
+    """
+    Server-sent events: событие feedback с данными отзыва на каждый новый отзыв, сразу после COMMIT.
+    Вместо периодического опроса /feedbacks: воркер держит одно LISTEN-соединение с PostgreSQL
+    и раздает уведомления всем подключенным модераторам.
+
+    Продолжение после обрыва: браузер сам присылает Last-Event-ID (id последнего отзыва),
+    либо передайте after. Пропущенные отзывы досылаются из БД (не больше FEEDBACK_FEED_BACKLOG_MAX,
+    при большем разрыве приходит событие truncated с курсором для /feedbacks).
+    Без них лента начинается с отзывов, созданных после подключения.
+    Отзыв, закоммиченный позже отзыва с большим id (параллельные транзакции), при переподключении
+    не досылается, если его id меньше Last-Event-ID: такие отзывы видны в /feedbacks.
+
+    Поток закрывается, когда истекает access-токен или он отозван (смена роли, деактивация):
+    проверка - на каждом событии и heartbeat, без запросов к БД.
+    """
+    if engine.dialect.name != "postgresql":
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Live feed requires PostgreSQL")
+    if last_event_id is not None and last_event_id.isdigit():
+        after = int(last_event_id)
+
+    try:
+        await feedback_feed.start()
+    except Exception as e:
+        logger.error(f"❌ Feedback feed is unavailable: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Live feed is temporarily unavailable",
+            headers={"Retry-After": "5"},
+        )
+
+    # Токен уже проверен в role_required, здесь нужен только его срок действия
+    expires = decode_access_token(token)["exp"]
+    return StreamingResponse(
+        _feed_events(after, current_user, expires),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx отдает события сразу, без буферизации ответа
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,9 +1,13 @@
 # Импорт необходимых модулей и классов
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.future import select
-from app.db.database import async_session  # Асинхронная сессия для работы с БД
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import DBUser, UserResponse, UserUpdate  # Модели БД и Pydantic
-from app.api.dependencies import get_current_active_user  # Зависимость для получения текущего пользователя
+from app.api.dependencies import get_current_active_user, db_session  # Текущий пользователь и сессия БД на запрос
+from app.core.security import hash_password  # Хеширование паролей в отдельном пуле
+from app.core.cache import user_cache  # Кеш профилей пользователей
+from app.db.database import after_commit, use_primary
+from app.db.queries import USER_COLUMNS, update_user_returning
 
 # Создание роутера для обработки запросов, связанных с пользователями
 # prefix="/api/users" - все пути в этом роутере будут начинаться с /api/users
@@ -13,7 +17,10 @@ router = APIRouter(prefix="/api/users", tags=["users"])
 # Эндпоинт для получения информации о текущем авторизованном пользователе
 # response_model=UserResponse - указывает формат ответа (Pydantic модель)
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user: dict = Depends(get_current_active_user)):
+async def read_users_me(
+    current_user: dict = Depends(get_current_active_user),
+    session: AsyncSession = db_session  # Сессия БД, общая для всего запроса
+):
     """
     Получает информацию о текущем авторизованном пользователе.
     
@@ -23,22 +30,32 @@ async def read_users_me(current_user: dict = Depends(get_current_active_user)):
     Возвращает:
     - Объект пользователя в формате UserResponse
     """
-    # Создание асинхронной сессии для работы с БД
-    async with async_session() as session:
-        # Выполнение запроса к БД для поиска пользователя по username
-        result = await session.execute(
-            select(DBUser).where(DBUser.username == current_user["username"])
-        )
-        # Получение первого результата (так как username уникален)
-        user = result.scalars().first()
-        return user
+    # Профиль из кеша: запрос к БД не нужен
+    cached = await user_cache.get_by_username(current_user["username"])
+    if cached is not None:
+        return cached
+
+    # Поколение - до чтения: если запись сбросят, пока ждем БД, старая строка в кеш не попадет.
+    # Кеш заполняется только с основной БД - отстающая реплика вернула бы старые данные
+    generation = await user_cache.generation(current_user["id"])
+    use_primary(session)
+    # Выполнение запроса к БД для поиска пользователя по username
+    result = await session.execute(
+        select(DBUser).where(DBUser.username == current_user["username"])
+    )
+    # Получение первого результата (так как username уникален)
+    user = result.scalars().first()
+    if user:
+        await user_cache.store(user, generation)
+    return user
 
 # Эндпоинт для обновления информации о текущем пользователе
 # response_model=UserResponse - указывает формат ответа
 @router.put("/me", response_model=UserResponse)
 async def update_user_me(
     user_data: UserUpdate,  # Данные для обновления (Pydantic модель)
-    current_user: dict = Depends(get_current_active_user)  # Текущий пользователь
+    current_user: dict = Depends(get_current_active_user),  # Текущий пользователь
+    session: AsyncSession = db_session  # Сессия БД, общая для всего запроса
 ):
     """
     Обновляет информацию о текущем авторизованном пользователе.
@@ -50,27 +67,30 @@ async def update_user_me(
     Возвращает:
     - Обновленный объект пользователя в формате UserResponse
     """
-    async with async_session() as session:
-        # Поиск пользователя в БД по username
-        result = await session.execute(
-            select(DBUser).where(DBUser.username == current_user["username"])
-        )
-        user = result.scalars().first()
-        
-        # Обновление email, если он предоставлен в user_data
-        if user_data.email:
-            user.email = user_data.email
-        
-        # Обновление пароля, если он предоставлен в user_data
-        # Пароль хешируется перед сохранением в БД
-        if user_data.password:
-            user.hashed_password = pwd_context.hash(user_data.password)
-        
-        # Фиксация изменений в БД
-        await session.commit()
-        # Обновление объекта пользователя из БД (чтобы получить актуальные данные)
-        await session.refresh(user)
-        return user
+    # Пароль хешируется до обращения к БД, чтобы не держать соединение во время bcrypt
+    hashed_password = await hash_password(user_data.password) if user_data.password else None
+
+    values = {}
+    # Обновление email, если он предоставлен в user_data
+    if user_data.email:
+        values["email"] = user_data.email
+    # Обновление пароля, если он предоставлен в user_data
+    if hashed_password:
+        values["hashed_password"] = hashed_password
+    
+    where = DBUser.username == current_user["username"]
+    if values:
+        # Одна команда UPDATE ... RETURNING вместо SELECT + UPDATE; COMMIT выполнит зависимость get_db
+        user = await update_user_returning(session, where, values)
+    else:
+        # Менять нечего - просто возвращаем профиль
+        user = (await session.execute(select(*USER_COLUMNS).where(where))).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    # Запись в кеше сбрасывается после COMMIT, чтобы ее не перечитали из старой версии строки
+    user_id, username = user.id, user.username
+    after_commit(session, lambda: user_cache.invalidate(user_id, username))
+    return user
     
 
 @router.get("/health", include_in_schema=False)
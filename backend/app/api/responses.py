@@ -0,0 +1,65 @@
+# backend/app/api/responses.py
+# Быстрая сериализация JSON-ответов
+import json
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson не установлен - тот же результат через стандартный json
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """
+    JSON в байтах: orjson, если он установлен, иначе стандартный json.
+    Ожидает готовые для JSON значения: dict/list/str/числа/None, Enum, datetime.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def _default(value: Any):
+    # То, что orjson сериализует сам: Enum -> значение, datetime/date -> ISO 8601
+    if hasattr(value, "value"):
+        return value.value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse, который сериализует через orjson (если доступен)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, status_code: int = 200, headers: dict = None) -> FastJSONResponse:
+    """
+    Готовый ответ: FastAPI не прогоняет его через response_model и jsonable_encoder.
+    Подходит для данных, которые уже состоят из простых значений (например, row._asdict()).
+    """
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверка If-None-Match (слабое сравнение: W/"x" совпадает с "x")."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque_tag(etag) in {_opaque_tag(tag) for tag in if_none_match.split(",")}
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag.strip().removeprefix("W/")
+
+
+def cache_headers(etag: Optional[str]) -> Optional[dict]:
+    """Заголовки для ответа с ETag: браузер хранит ответ, но перед использованием перепроверяет."""
+    if etag is None:
+        return None
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
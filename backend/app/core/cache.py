@@ -0,0 +1,343 @@
+# backend/app/core/cache.py
+# Кеши: в памяти процесса (отдельные для каждого воркера gunicorn) и общий (Redis)
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Ограниченный LRU-кеш с временем жизни записей.
+    При переполнении вытесняется запись, к которой дольше всего не обращались.
+    Потокобезопасен: синхронные зависимости FastAPI выполняются в пуле потоков.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение. ttl не может превышать время жизни кеша по умолчанию."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class InMemoryCacheBackend:
+    """
+    Бэкенд кеша в памяти процесса (TTL + LRU).
+    У каждого воркера gunicorn свой экземпляр: сброс записи виден только в этом воркере.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Поколения записей: обычный словарь без вытеснения и TTL. Вытесненный счетчик
+        # читался бы как начальный, и медленный читатель сохранил бы старую строку.
+        # Размер ограничен числом пользователей, данные которых менялись
+        self._generations: dict = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._cache.delete(key)
+
+    # Методы ниже не содержат await, поэтому в event loop выполняются атомарно
+    async def generation(self, key: str) -> Optional[str]:
+        return str(self._generations.get(key, 0))
+
+    async def bump_generations(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    async def set_if_generation(self, generation_key: str, generation: str, keys: Iterable[str], value: str, ttl: float) -> None:
+        if str(self._generations.get(generation_key, 0)) == generation:
+            for key in keys:
+                self._cache.set(key, value, ttl=ttl)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self._cache.stats()}
+
+
+class DisabledCacheBackend:
+    """
+    Кеш выключен: все чтения идут в БД. Используется вместо кеша в памяти при нескольких
+    воркерах без Redis - сброс записи в одном воркере не виден другим, и они отдавали бы
+    старые роли и статусы до истечения TTL.
+    """
+
+    async def get(self, key: str) -> Optional[str]:
+        return None
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        pass
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        pass
+
+    async def generation(self, key: str) -> Optional[str]:
+        return None
+
+    async def bump_generations(self, keys: Iterable[str]) -> None:
+        pass
+
+    async def set_if_generation(self, generation_key: str, generation: str, keys: Iterable[str], value: str, ttl: float) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "disabled"}
+
+
+# Сохранить запись, только если поколение (KEYS[1]) не изменилось с момента чтения из БД
+SET_IF_GENERATION_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+for i = 2, #KEYS do
+    redis.call('SET', KEYS[i], ARGV[2], 'EX', ARGV[3])
+end
+return 1
+"""
+
+
+class RedisCacheBackend:
+    """
+    Общий для всех воркеров бэкенд кеша в Redis.
+    Нужен пакет redis (redis.asyncio); сброс записи сразу виден всем воркерам.
+    """
+
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("USER_CACHE_URL is set but the 'redis' package is not installed") from e
+        self._client = redis_asyncio.from_url(url, decode_responses=True)
+        self._set_if_generation = self._client.register_script(SET_IF_GENERATION_SCRIPT)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self._client.get(key)
+        except Exception as e:
+            # Недоступный кеш не должен ломать запросы: читаем из БД
+            self.errors += 1
+            logger.warning(f"⚠ Cache get failed: {e}")
+            return None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        try:
+            await self._client.set(key, value, ex=max(1, math.ceil(ttl)))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠ Cache set failed: {e}")
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        # Ошибку сброса не глотаем: иначе читатели увидят устаревшие данные
+        keys = list(keys)
+        if keys:
+            await self._client.delete(*keys)
+
+    async def generation(self, key: str) -> Optional[str]:
+        try:
+            return await self._client.get(key) or "0"
+        except Exception as e:
+            # Без поколения запись не сохраняется: читаем из БД
+            self.errors += 1
+            logger.warning(f"⚠ Cache get failed: {e}")
+            return None
+
+    async def bump_generations(self, keys: Iterable[str]) -> None:
+        # Как и delete, ошибку не глотаем. Ключи поколений без TTL: при maxmemory-policy
+        # volatile-lru (docker-compose.yml) Redis их не вытесняет, счетчики только растут
+        keys = list(keys)
+        if keys:
+            async with self._client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.incr(key)
+                await pipe.execute()
+
+    async def set_if_generation(self, generation_key: str, generation: str, keys: Iterable[str], value: str, ttl: float) -> None:
+        try:
+            await self._set_if_generation(
+                keys=[generation_key, *keys], args=[generation, value, max(1, math.ceil(ttl))]
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠ Cache set failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class UserCache:
+    """
+    Кеш профилей пользователей (поля UserResponse) по username и по id.
+    Бэкенд можно заменить (например, на InMemoryCacheBackend в тестах): user_cache.backend = ...
+
+    Запись защищена поколением пользователя: читатель берет generation() до запроса к БД,
+    а сброс увеличивает поколение. Если запись изменили и сбросили, пока читатель ждал БД,
+    store() не сохранит прочитанную старую строку.
+    """
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def _keys(user_id: Optional[int] = None, username: Optional[str] = None) -> list[str]:
+        keys = []
+        if user_id is not None:
+            keys.append(f"user:id:{user_id}")
+        if username is not None:
+            keys.append(f"user:name:{username}")
+        return keys
+
+    async def _get(self, key: str) -> Optional[dict]:
+        value = await self.backend.get(key)
+        return json.loads(value) if value is not None else None
+
+    async def get_by_id(self, user_id: int) -> Optional[dict]:
+        return await self._get(f"user:id:{user_id}")
+
+    async def get_by_username(self, username: str) -> Optional[dict]:
+        return await self._get(f"user:name:{username}")
+
+    @staticmethod
+    def _generation_key(user_id: int) -> str:
+        return f"user:gen:{user_id}"
+
+    async def generation(self, user_id: int) -> Optional[str]:
+        """Поколение записей пользователя; берется до чтения из БД и передается в store()."""
+        return await self.backend.generation(self._generation_key(user_id))
+
+    async def store(self, user, generation: Optional[str]) -> None:
+        """
+        Сохраняет профиль пользователя (ORM-объект DBUser) под обоими ключами,
+        если поколение не изменилось с вызова generation(). None - не сохранять.
+        """
+        if generation is None:
+            return
+        value = json.dumps({
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "role": user.role.value if user.role is not None else None,
+            "is_active": user.is_active,
+        })
+        await self.backend.set_if_generation(
+            self._generation_key(user.id), generation, self._keys(user.id, user.username), value, self.ttl
+        )
+
+    async def invalidate(self, user_id: Optional[int] = None, *usernames: str) -> None:
+        """Удаляет записи пользователя по id и по всем переданным username (старому и новому)."""
+        keys = self._keys(user_id)
+        for username in usernames:
+            keys += self._keys(username=username)
+        if user_id is not None:
+            # Сначала поколение: читатель, уже ждущий БД, не сохранит старую строку после удаления
+            await self.backend.bump_generations([self._generation_key(user_id)])
+        await self.backend.delete(keys)
+
+    async def invalidate_many(self, users: Iterable[tuple[int, str]]) -> None:
+        """Сбрасывает записи многих пользователей (пары id, username) пачками ключей."""
+        generations, keys = [], []
+        for user_id, username in users:
+            generations.append(self._generation_key(user_id))
+            keys += self._keys(user_id, username)
+            if len(keys) >= 1000:
+                await self.backend.bump_generations(generations)
+                await self.backend.delete(keys)
+                generations, keys = [], []
+        await self.backend.bump_generations(generations)
+        await self.backend.delete(keys)
+
+    def stats(self) -> dict:
+        return {"ttl_seconds": self.ttl, **self.backend.stats()}
+
+
+def _user_cache_backend():
+    if settings.USER_CACHE_URL:
+        return RedisCacheBackend(settings.USER_CACHE_URL)
+    if settings.WEB_CONCURRENCY > 1:
+        logger.warning(
+            f"⚠ User cache disabled: {settings.WEB_CONCURRENCY} workers without USER_CACHE_URL "
+            f"would serve stale roles from per-worker caches"
+        )
+        return DisabledCacheBackend()
+    return InMemoryCacheBackend(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
+user_cache = UserCache(_user_cache_backend(), ttl=settings.USER_CACHE_TTL_SECONDS)
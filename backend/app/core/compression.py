@@ -0,0 +1,172 @@
+# backend/app/core/compression.py
+# Сжатие ответов API (gzip, опционально brotli)
+import zlib
+from typing import Optional
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli не установлен - остается только gzip
+    brotli = None
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+# Server-sent events не сжимаем: события должны уходить клиенту сразу и по одному
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+class _Gzip:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        # wbits=31: формат gzip (заголовок и контрольная сумма), а не «голый» deflate
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        # Для потоковых ответов: отдаем клиенту все, что накопилось, не закрывая поток
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _accepted_encodings(header: str) -> set:
+    """Кодировки из Accept-Encoding, кроме явно запрещенных (q=0)."""
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if name and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware: сжимает JSON и текстовые ответы от minimum_size байт.
+    brotli выбирается, если клиент его принимает и пакет установлен, иначе gzip.
+    Потоковые ответы (выгрузка отзывов) сжимаются по частям, каждая часть сразу уходит клиенту.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, use_brotli: bool = True):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.use_brotli = use_brotli and brotli is not None
+
+    def _compressor(self, accept_encoding: str):
+        accepted = _accepted_encodings(accept_encoding)
+        if self.use_brotli and "br" in accepted:
+            return _Brotli(self.brotli_quality)
+        if "gzip" in accepted:
+            return _Gzip(self.gzip_level)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        if not accept_encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[dict] = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Заголовки отправим, когда увидим тело и решим, сжимать ли его
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = {name.lower(): value for name, value in start_message["headers"]}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if (
+                    b"content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or content_type.startswith(UNCOMPRESSED_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = self._compressor(accept_encoding)
+                if compressor is None:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                raw_headers = [
+                    (name, value) for name, value in start_message["headers"]
+                    if name.lower() not in (b"content-length", b"vary")
+                ]
+                vary = headers.get(b"vary")
+                raw_headers.append((b"content-encoding", compressor.encoding.encode()))
+                raw_headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                if not more_body:
+                    body = compressor.compress(body) + compressor.finish()
+                    raw_headers.append((b"content-length", str(len(body)).encode()))
+                    await send({**start_message, "headers": raw_headers})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send({**start_message, "headers": raw_headers})
+
+            if more_body:
+                chunk = compressor.compress(body) + compressor.flush()
+            else:
+                chunk = compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def compression_options() -> dict:
+    """Параметры CompressionMiddleware из настроек."""
+    return {
+        "minimum_size": settings.RESPONSE_COMPRESSION_MIN_SIZE,
+        "gzip_level": settings.RESPONSE_COMPRESSION_GZIP_LEVEL,
+        "brotli_quality": settings.RESPONSE_COMPRESSION_BROTLI_QUALITY,
+        "use_brotli": settings.RESPONSE_COMPRESSION_BROTLI,
+    }
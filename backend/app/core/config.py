@@ -1,11 +1,104 @@
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Dict
 
 class Settings(BaseSettings):
     DATABASE_URL: str# = "postgresql+asyncpg://....:.....@db:5432/fastapi_db"  # Значение по умолчанию
+    # Реплики только для чтения: URL через запятую. Пусто - все запросы идут на основную БД
+    DATABASE_REPLICA_URLS: str = ""
+    DB_REPLICA_RETRY_SECONDS: float = 30  # На сколько исключать реплику после ошибки соединения
+    # Что делать со схемой БД при старте воркера:
+    # "create_all" - создать недостающие таблицы (удобно для разработки);
+    # "verify" - только проверить, что БД на head-ревизии Alembic, без DDL
+    #            (схему готовит 'python -m app.db.migrations' перед выкладкой)
+    STARTUP_DB_MODE: str = "create_all"
     SECRET_KEY: str# = ".............."  # Значение по умолчанию
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Короткоживущий access-токен и refresh-токен для получения нового (POST /auth/refresh)
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Как часто воркер дочитывает отозванные версии токенов (смена роли/статуса, удаление пользователя)
+    TOKEN_REVOCATION_SYNC_SECONDS: float = 5
+    # Кеш расшифрованных JWT: повторные запросы с тем же токеном не проверяют подпись заново
+    TOKEN_CACHE_SIZE: int = 10000  # Максимум токенов в кеше одного воркера
+    TOKEN_CACHE_TTL_SECONDS: float = 300  # Запись живет не дольше этого и не дольше exp токена
+
+    # Кеш профилей пользователей (/api/users/me, /api/admin/users/{id})
+    USER_CACHE_URL: str = ""  # redis://... - общий кеш для всех воркеров; пусто - кеш в памяти (только при одном воркере)
+    USER_CACHE_SIZE: int = 10000  # Максимум записей в кеше в памяти
+    USER_CACHE_TTL_SECONDS: float = 30  # Время жизни записи
+    WEB_CONCURRENCY: int = 1  # Число воркеров; gunicorn.conf.py выставляет его из --workers
+
+    # Движок БД и пул соединений (значения на один воркер gunicorn)
+    DB_ECHO: bool = False  # Логировать каждый SQL-запрос (только для отладки)
+    DB_POOL_SIZE: int = 5  # Постоянные соединения в пуле
+    DB_MAX_OVERFLOW: int = 10  # Дополнительные соединения сверх DB_POOL_SIZE при пиковой нагрузке
+    DB_POOL_TIMEOUT: float = 30  # Сколько секунд ждать свободное соединение
+    DB_POOL_RECYCLE: int = 1800  # Пересоздавать соединения старше N секунд
+    DB_POOL_PRE_PING: bool = True  # Проверять соединение перед выдачей из пула
+    DB_STATEMENT_CACHE_SIZE: int = 100  # Кеш prepared statements asyncpg (0 - выключить, нужно для pgbouncer)
+
+    # Контроль числа и времени SQL-запросов (предупреждения в лог; 0 - проверка выключена)
+    DB_QUERY_BUDGET: int = 10  # Больше запросов на один HTTP-запрос - предупреждение с маршрутом и SQL
+    # Свой бюджет для маршрутов, JSON: {"POST /api/admin/users/bulk": 20}
+    DB_QUERY_BUDGET_OVERRIDES: Dict[str, int] = {}
+    DB_SLOW_QUERY_MS: float = 200  # Запросы дольше этого пишутся в лог
+    DB_N_PLUS_ONE_THRESHOLD: int = 5  # Один и тот же запрос столько раз за HTTP-запрос - вероятный N+1
+
+    # Пул для хеширования паролей (bcrypt не должен блокировать event loop)
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" или "process"
+    PASSWORD_HASH_WORKERS: int = 4  # Количество потоков/процессов в пуле
+    PASSWORD_HASH_QUEUE_DEPTH: int = 32  # Максимум задач в очереди, сверх него - 503
+
+    # Массовые операции с пользователями (POST /api/admin/users/bulk)
+    ADMIN_BULK_MAX_IDS: int = 50000  # Максимум id в одном запросе
+
+    # Постраничная выдача списков (keyset-пагинация по id)
+    PAGE_SIZE_DEFAULT: int = 50  # Размер страницы, если limit не передан
+    PAGE_SIZE_MAX: int = 500  # Жесткий предел: больший limit урезается до этого значения
+
+    # Потоковая выгрузка отзывов: сколько строк читать из курсора и отправлять за раз
+    FEEDBACK_EXPORT_CHUNK_SIZE: int = 1000
+
+    # Лента новых отзывов для модераторов (GET /api/moderator/feedbacks/live, только PostgreSQL)
+    FEEDBACK_FEED_HEARTBEAT_SECONDS: float = 15  # Пустое событие, если новых отзывов нет (держит соединение через прокси)
+    FEEDBACK_FEED_BACKLOG_MAX: int = 1000  # Сколько пропущенных отзывов дослать при переподключении
+    FEEDBACK_FEED_LOOKBACK_IDS: int = 200  # Окно id до курсора, которое перечитывается при досылке (поздние COMMIT)
+    FEEDBACK_FEED_QUEUE_SIZE: int = 100  # Очередь пачек на одного клиента; при переполнении клиент дочитывает из БД
+    FEEDBACK_FEED_RECONNECT_SECONDS: float = 1  # Пауза перед переподключением LISTEN-соединения после обрыва
+
+    # Пакетная загрузка отзывов (POST /api/feedback/bulk)
+    FEEDBACK_BULK_MAX_ITEMS: int = 10000  # Максимум отзывов в одном запросе
+    FEEDBACK_BULK_COPY_THRESHOLD: int = 1000  # С этого размера пачки - COPY вместо INSERT (только asyncpg)
+
+    # Отложенная пакетная запись одиночных отзывов (POST /api/feedback/)
+    FEEDBACK_WRITE_BEHIND: bool = False  # Включить очередь вместо INSERT + COMMIT на каждый запрос
+    # "commit" - ответ после COMMIT пачки, в которую попал отзыв (ничего не теряется);
+    # "accepted" - ответ 202 сразу после постановки в очередь (при падении процесса очередь теряется)
+    FEEDBACK_WRITE_BEHIND_DURABILITY: str = "commit"
+    FEEDBACK_WRITE_BEHIND_BATCH_SIZE: int = 200  # Максимум отзывов в одной пачке
+    FEEDBACK_WRITE_BEHIND_MAX_DELAY_MS: float = 5  # Сколько ждать наполнения пачки после первого отзыва
+    FEEDBACK_WRITE_BEHIND_QUEUE_SIZE: int = 10000  # Максимальная длина очереди, сверх нее - 503
+
+    # Сжатие ответов API (JSON, NDJSON, CSV)
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024  # Ответы меньше этого размера (байт) не сжимаются
+    RESPONSE_COMPRESSION_GZIP_LEVEL: int = 6  # Уровень gzip: 1 - быстрее, 9 - сильнее
+    RESPONSE_COMPRESSION_BROTLI: bool = True  # Использовать brotli, если клиент его принимает и пакет установлен
+    RESPONSE_COMPRESSION_BROTLI_QUALITY: int = 4  # Качество brotli (0-11); высокие значения слишком медленны для API
+
+    # Доступ к /api/metrics: с METRICS_TOKEN нужен заголовок Authorization: Bearer <токен>,
+    # без него эндпоинт отвечает только адресам из METRICS_ALLOWED_NETWORKS
+    METRICS_TOKEN: str = ""
+    METRICS_ALLOWED_NETWORKS: str = "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"  # Через запятую
+    METRICS_EXPORT_SECONDS: float = 5  # Как часто воркер переносит статистику пулов, кешей и очередей в метрики
+
+    # Профилирование отдельных запросов (заголовок X-Profile с токеном администратора или выборка)
+    PROFILING_ENABLED: bool = True  # Разрешить профилирование по заголовку X-Profile: 1
+    PROFILING_SAMPLE_RATE: float = 0.0  # Доля запросов, профилируемых без заголовка (0.001 - каждый тысячный)
+    PROFILING_DIR: str = ""  # Каталог для профилей, общий для воркеров; пусто - <tmp>/fastapi-profiles
+    PROFILING_MAX_FILES: int = 50  # Сколько последних профилей хранить, более старые удаляются
+    PROFILING_INTERVAL_MS: float = 1  # Интервал выборки pyinstrument (cProfile записывает каждый вызов)
+    PROFILING_MAX_SECONDS: float = 30  # Профиль потокового ответа (выгрузки) обрезается через столько секунд
 
     class Config:
         # Правильный путь к .env (на 2 уровня выше от app/core/config.py)
@@ -0,0 +1,404 @@
+# backend/app/core/metrics.py
+# Метрики приложения в формате Prometheus
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+from app.api.dependencies import token_cache
+from app.core.cache import user_cache
+from app.core.config import settings
+from app.core.profiling import request_profiler
+from app.core.security import password_hasher
+from app.db.database import QueryStats, check_query_budget, current_query_stats, pool_status
+from app.db.feed import feedback_feed
+from app.db.revocations import token_revocations
+from app.db.write_buffer import feedback_buffer
+
+logger = logging.getLogger(__name__)
+
+# Маршрут для запросов, не совпавших ни с одним эндпоинтом (чтобы не плодить метки из URL)
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route and status",
+    ["method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+# livesum: при нескольких воркерах gunicorn суммируются значения только живых процессов
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being processed",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per HTTP request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+DB_TIME = Histogram(
+    "http_request_db_seconds",
+    "Time spent in the database per HTTP request",
+    ["method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+# Метрики компонентов воркера. Компоненты считают сами (stats()), ComponentMetrics переносит
+# значения сюда. Gauges в multiprocess-режиме: livesum - сумма по живым воркерам,
+# livemax - худший воркер; счетчики умерших воркеров Prometheus сохраняет (Counter)
+PASSWORD_HASH_WORKERS = Gauge(
+    "password_hash_workers", "Password hashing pool size", multiprocess_mode="livesum"
+)
+PASSWORD_HASH_BUSY = Gauge(
+    "password_hash_busy", "Password hashing jobs running in the pool", multiprocess_mode="livesum"
+)
+PASSWORD_HASH_QUEUED = Gauge(
+    "password_hash_queued", "Password hashing jobs waiting for a pool worker", multiprocess_mode="livesum"
+)
+PASSWORD_HASH_JOBS = Counter(
+    "password_hash_jobs_total",
+    "Password hashing jobs by result (completed, failed, rejected with 503)",
+    ["result"],
+)
+PASSWORD_HASH_SECONDS = Counter(
+    "password_hash_seconds_total", "Time spent in completed password hashing jobs"
+)
+PASSWORD_HASH_MAX_SECONDS = Gauge(
+    "password_hash_max_seconds", "Slowest completed password hashing job", multiprocess_mode="livemax"
+)
+
+# Пулы соединений: database - primary или URL реплики (без пароля)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size", "Connections kept in the pool", ["database"], multiprocess_mode="livesum"
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections in use", ["database"], multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections opened above the pool size", ["database"], multiprocess_mode="livesum"
+)
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total", "Connections handed out by the pool", ["database"]
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total", "Requests that gave up waiting for a connection (pool_timeout)", ["database"]
+)
+DB_POOL_WAIT_SECONDS = Counter(
+    "db_pool_wait_seconds_total", "Time spent waiting for a free connection", ["database"]
+)
+DB_POOL_WAIT_MAX_SECONDS = Gauge(
+    "db_pool_wait_max_seconds", "Longest wait for a free connection", ["database"], multiprocess_mode="livemax"
+)
+# livemin: 0, если реплику считает нездоровой хотя бы один воркер
+DB_REPLICA_HEALTHY = Gauge(
+    "db_replica_healthy", "Read replica is in rotation (1) or excluded after errors (0)", ["database"],
+    multiprocess_mode="livemin",
+)
+
+# Кеши: cache - token (проверенные JWT) или user (профили пользователей, в памяти или в Redis)
+CACHE_ENTRIES = Gauge(
+    "cache_entries", "Entries in the cache", ["cache"], multiprocess_mode="livesum"
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Cache lookups by result (hit, miss)", ["cache", "result"]
+)
+CACHE_EVICTIONS = Counter(
+    "cache_evictions_total", "Entries evicted because the cache was full", ["cache"]
+)
+CACHE_ERRORS = Counter(
+    "cache_errors_total", "Cache backend errors (Redis unavailable); the request fell back to the database", ["cache"]
+)
+
+# Отложенная запись отзывов (FEEDBACK_WRITE_BEHIND)
+FEEDBACK_BUFFER_QUEUE_DEPTH = Gauge(
+    "feedback_buffer_queue_depth", "Feedback waiting in the write-behind queue", multiprocess_mode="livesum"
+)
+FEEDBACK_BUFFER_QUEUE_SIZE = Gauge(
+    "feedback_buffer_queue_size", "Write-behind queue capacity", multiprocess_mode="livesum"
+)
+FEEDBACK_BUFFER_SUBMISSIONS = Counter(
+    "feedback_buffer_submissions_total", "Feedback submitted to the queue by result (accepted, rejected)", ["result"]
+)
+FEEDBACK_BUFFER_ROWS = Counter(
+    "feedback_buffer_rows_total", "Queued feedback written to the database by result (flushed, failed)", ["result"]
+)
+FEEDBACK_BUFFER_FLUSHES = Counter(
+    "feedback_buffer_flushes_total", "Batches written to the database"
+)
+FEEDBACK_BUFFER_FLUSH_SECONDS = Counter(
+    "feedback_buffer_flush_seconds_total", "Time spent writing batches"
+)
+FEEDBACK_BUFFER_FLUSH_MAX_SECONDS = Gauge(
+    "feedback_buffer_flush_max_seconds", "Slowest batch write", multiprocess_mode="livemax"
+)
+
+# Лента новых отзывов (SSE /api/moderator/feedbacks/live)
+FEEDBACK_FEED_LISTENING = Gauge(
+    "feedback_feed_listening", "Workers holding a LISTEN connection for the live feed", multiprocess_mode="livesum"
+)
+FEEDBACK_FEED_SUBSCRIBERS = Gauge(
+    "feedback_feed_subscribers", "Connected live feed clients", multiprocess_mode="livesum"
+)
+FEEDBACK_FEED_EVENTS = Counter(
+    "feedback_feed_events_total",
+    "Live feed events: notifications received, batches and rows fanned out, client resyncs, LISTEN reconnects",
+    ["event"],
+)
+
+# Таблица отозванных версий токенов (копия в каждом воркере)
+TOKEN_REVOCATIONS_ENTRIES = Gauge(
+    "token_revocations_entries", "Users with revoked token versions in the worker's table", multiprocess_mode="livemax"
+)
+TOKEN_REVOCATIONS_SYNCS = Counter(
+    "token_revocations_syncs_total", "Revocation table syncs with the database by result (ok, error)", ["result"]
+)
+TOKEN_REVOCATIONS_REJECTED = Counter(
+    "token_revocations_rejected_total", "Access tokens rejected as revoked"
+)
+# livemax: воркер, который дольше всех не синхронизировался
+TOKEN_REVOCATIONS_SYNC_AGE = Gauge(
+    "token_revocations_sync_age_seconds", "Seconds since the last successful revocation sync", multiprocess_mode="livemax"
+)
+
+# Профилирование запросов (X-Profile и PROFILING_SAMPLE_RATE)
+PROFILING_ACTIVE = Gauge(
+    "profiling_active", "Requests being profiled right now", multiprocess_mode="livesum"
+)
+PROFILING_PROFILES = Counter(
+    "profiling_profiles_total",
+    "Requests selected for profiling by result (saved, failed to save, skipped because another was profiled)",
+    ["result"],
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: задержка, статусы и число запросов в обработке по маршрутам,
+    а также число SQL-запросов и время в БД на каждый HTTP-запрос.
+    Маршрут берется из шаблона пути (/api/admin/users/{user_id}), а не из URL.
+    После запроса проверяется бюджет SQL-запросов и повторы одного запроса (check_query_budget).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        query_stats = QueryStats(scope)
+        token = current_query_stats.set(query_stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_PROGRESS.labels(method).inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_PROGRESS.labels(method).dec()
+            current_query_stats.reset(token)
+
+            route = scope.get("route")
+            route = getattr(route, "path", UNMATCHED_ROUTE)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            REQUEST_LATENCY.labels(method, route).observe(elapsed)
+            DB_QUERIES.labels(method, route).observe(query_stats.count)
+            DB_TIME.labels(method, route).observe(query_stats.seconds)
+            check_query_budget(query_stats)
+
+
+def _export_password_hasher(metrics: "ComponentMetrics") -> None:
+    stats = password_hasher.stats()
+    PASSWORD_HASH_WORKERS.set(stats["workers"])
+    PASSWORD_HASH_BUSY.set(stats["busy"])
+    PASSWORD_HASH_QUEUED.set(stats["queued"])
+    for result in ("completed", "failed", "rejected"):
+        metrics.count(PASSWORD_HASH_JOBS.labels(result), stats[result])
+    metrics.count(PASSWORD_HASH_SECONDS, stats["total_seconds"])
+    PASSWORD_HASH_MAX_SECONDS.set(stats["max_seconds"])
+
+
+def _export_db_pools(metrics: "ComponentMetrics") -> None:
+    status = pool_status()
+    for replica in status["replicas"]:
+        DB_REPLICA_HEALTHY.labels(replica["url"]).set(1 if replica["healthy"] else 0)
+    for database, pool in [("primary", status), *((replica["url"], replica) for replica in status["replicas"])]:
+        if "size" not in pool:
+            # SQLite (локальные проверки) работает без пула соединений
+            continue
+        DB_POOL_SIZE.labels(database).set(pool["size"])
+        DB_POOL_CHECKED_OUT.labels(database).set(pool["checked_out"])
+        DB_POOL_OVERFLOW.labels(database).set(max(pool["overflow"], 0))
+        if "checkouts" in pool:
+            metrics.count(DB_POOL_CHECKOUTS.labels(database), pool["checkouts"])
+            metrics.count(DB_POOL_TIMEOUTS.labels(database), pool["timeouts"])
+            metrics.count(DB_POOL_WAIT_SECONDS.labels(database), pool["wait_seconds_total"])
+            DB_POOL_WAIT_MAX_SECONDS.labels(database).set(pool["wait_seconds_max"])
+
+
+def _export_cache(metrics: "ComponentMetrics", cache: str, stats: dict) -> None:
+    # Общий формат для кешей: значения, которых у бэкенда нет, пропускаются
+    if "size" in stats:
+        CACHE_ENTRIES.labels(cache).set(stats["size"])
+    for result, key in (("hit", "hits"), ("miss", "misses")):
+        if key in stats:
+            metrics.count(CACHE_LOOKUPS.labels(cache, result), stats[key])
+    if "evictions" in stats:
+        metrics.count(CACHE_EVICTIONS.labels(cache), stats["evictions"])
+    if "errors" in stats:
+        metrics.count(CACHE_ERRORS.labels(cache), stats["errors"])
+
+
+def _export_token_cache(metrics: "ComponentMetrics") -> None:
+    _export_cache(metrics, "token", token_cache.stats())
+
+
+def _export_user_cache(metrics: "ComponentMetrics") -> None:
+    stats = user_cache.stats()
+    # Кеш выключен (несколько воркеров без Redis): считать нечего
+    if stats["backend"] != "disabled":
+        _export_cache(metrics, "user", stats)
+
+
+def _export_feedback_buffer(metrics: "ComponentMetrics") -> None:
+    stats = feedback_buffer.stats()
+    if not stats["enabled"]:
+        return
+    FEEDBACK_BUFFER_QUEUE_DEPTH.set(stats["queue_depth"])
+    FEEDBACK_BUFFER_QUEUE_SIZE.set(stats["queue_size"])
+    metrics.count(FEEDBACK_BUFFER_SUBMISSIONS.labels("accepted"), stats["submitted"])
+    metrics.count(FEEDBACK_BUFFER_SUBMISSIONS.labels("rejected"), stats["rejected"])
+    metrics.count(FEEDBACK_BUFFER_ROWS.labels("flushed"), stats["flushed_rows"])
+    metrics.count(FEEDBACK_BUFFER_ROWS.labels("failed"), stats["failed_rows"])
+    metrics.count(FEEDBACK_BUFFER_FLUSHES, stats["flushes"])
+    metrics.count(FEEDBACK_BUFFER_FLUSH_SECONDS, stats["flush_seconds_total"])
+    FEEDBACK_BUFFER_FLUSH_MAX_SECONDS.set(stats["flush_seconds_max"])
+
+
+def _export_feedback_feed(metrics: "ComponentMetrics") -> None:
+    stats = feedback_feed.stats()
+    FEEDBACK_FEED_LISTENING.set(1 if stats["listening"] else 0)
+    FEEDBACK_FEED_SUBSCRIBERS.set(stats["subscribers"])
+    for event in ("notifications", "batches", "rows", "resyncs", "reconnects"):
+        metrics.count(FEEDBACK_FEED_EVENTS.labels(event), stats[event])
+
+
+def _export_token_revocations(metrics: "ComponentMetrics") -> None:
+    stats = token_revocations.stats()
+    TOKEN_REVOCATIONS_ENTRIES.set(stats["entries"])
+    metrics.count(TOKEN_REVOCATIONS_SYNCS.labels("ok"), stats["syncs"])
+    metrics.count(TOKEN_REVOCATIONS_SYNCS.labels("error"), stats["sync_errors"])
+    metrics.count(TOKEN_REVOCATIONS_REJECTED, stats["rejected"])
+    if stats["seconds_since_sync"] is not None:
+        TOKEN_REVOCATIONS_SYNC_AGE.set(stats["seconds_since_sync"])
+
+
+def _export_profiler(metrics: "ComponentMetrics") -> None:
+    stats = request_profiler.stats()
+    PROFILING_ACTIVE.set(1 if stats["active"] else 0)
+    metrics.count(PROFILING_PROFILES.labels("saved"), stats["profiled"])
+    metrics.count(PROFILING_PROFILES.labels("failed"), stats["failed"])
+    metrics.count(PROFILING_PROFILES.labels("skipped_busy"), stats["skipped_busy"])
+
+
+class ComponentMetrics:
+    """
+    Переносит stats() компонентов воркера в метрики Prometheus: раз в interval секунд
+    и перед каждым ответом /api/metrics. Счетчики компонентов увеличивают Counter
+    на прирост с прошлого переноса.
+    """
+
+    def __init__(self, exporters: list, interval: float):
+        self.exporters = exporters
+        self.interval = interval
+        # Последнее перенесенное значение каждого счетчика (с метками)
+        self._counted = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def count(self, counter, value: float) -> None:
+        delta = value - self._counted.get(counter, 0)
+        if delta > 0:
+            counter.inc(delta)
+            self._counted[counter] = value
+
+    def export(self) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter(self)
+            except Exception as e:
+                logger.warning(f"⚠ Metrics export failed in {exporter.__name__}: {e}")
+
+    async def start(self) -> None:
+        self.export()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.export()
+
+
+component_metrics = ComponentMetrics(
+    exporters=[
+        _export_password_hasher, _export_db_pools, _export_token_cache, _export_user_cache,
+        _export_feedback_buffer, _export_feedback_feed, _export_token_revocations,
+        _export_profiler,
+    ],
+    interval=settings.METRICS_EXPORT_SECONDS,
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Метрики в текстовом формате Prometheus.
+    Если задан PROMETHEUS_MULTIPROC_DIR (несколько воркеров gunicorn), значения собираются
+    из файлов всех воркеров, поэтому ответ не зависит от того, какой воркер его отдал.
+    Метрики компонентов других воркеров отстают не больше чем на METRICS_EXPORT_SECONDS.
+    """
+    component_metrics.export()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
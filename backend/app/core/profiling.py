@@ -0,0 +1,314 @@
+# backend/app/core/profiling.py
+# Профилирование отдельных HTTP-запросов по требованию администратора или по выборке
+import asyncio
+import cProfile
+import json
+import logging
+import marshal
+import os
+import random
+import re
+import tempfile
+import time
+from typing import Optional
+
+from jose import JWTError
+
+from app.core.config import settings
+from app.core.security import decode_access_token
+from app.db.database import current_query_stats
+from app.db.models import UserRole
+from app.db.revocations import token_revocations
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # pyinstrument не установлен - профиль снимает cProfile
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+# Заголовок запроса, включающий профилирование, и заголовок ответа с id профиля
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+# id профиля: <время в мс>-<pid>-<случайная часть>; другие имена эндпоинт скачивания не принимает
+PROFILE_ID = re.compile(r"^\d{13}-\d+-[0-9a-f]{8}$")
+
+
+class _PyinstrumentSession:
+    # Выборка стека раз в interval; async_mode="enabled" - только задача этого запроса,
+    # ожидание (SQL, bcrypt в пуле) показывается как await в вызвавшей функции
+    profiler = "pyinstrument"
+    extension = "html"
+    media_type = "text/html; charset=utf-8"
+
+    def __init__(self, interval: float):
+        self._profiler = Profiler(interval=interval, async_mode="enabled")
+
+    def start(self) -> None:
+        self._profiler.start()
+
+    def stop(self) -> None:
+        self._profiler.stop()
+
+    def render(self) -> bytes:
+        return self._profiler.output_html().encode()
+
+
+class _CProfileSession:
+    # Все вызовы в потоке event loop, в том числе других запросов, выполнявшихся одновременно.
+    # Файл .prof открывается pstats, snakeviz или gprof2dot
+    profiler = "cprofile"
+    extension = "prof"
+    media_type = "application/octet-stream"
+
+    def __init__(self, interval: float):
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    def render(self) -> bytes:
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)
+
+
+class RequestProfiler:
+    """
+    Снимает профиль всего запроса: middleware ниже, разрешение зависимостей, разбор JWT,
+    bcrypt, SQL и сериализацию ответа. Профили пишутся в кольцевой буфер на диске
+    (max_files последних, каталог общий для воркеров) вместе с описанием в <id>.json.
+    Одновременно профилируется не больше одного запроса на воркер.
+
+    Потоковые ответы профилируются не до конца: SSE (text/event-stream) - до начала ответа,
+    остальные (выгрузки) - не дольше max_seconds. Иначе профиль держал бы профилировщик воркера
+    занятым часами, а сохранился бы только после закрытия потока.
+    """
+
+    def __init__(
+        self, directory: str, max_files: int, sample_rate: float, header_enabled: bool, interval: float,
+        max_seconds: float,
+    ):
+        self.directory = directory
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self.header_enabled = header_enabled
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.session_class = _PyinstrumentSession if Profiler is not None else _CProfileSession
+        self.active = False
+        self.profiled = 0
+        self.skipped_busy = 0
+        self.failed = 0
+
+    def trigger(self, scope) -> Optional[str]:
+        """Причина профилировать запрос ("header" или "sample") или None."""
+        if self.header_enabled:
+            headers = dict(scope["headers"])
+            if headers.get(PROFILE_HEADER, b"").lower() in (b"1", b"true") and _is_admin(headers):
+                return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def new_id(self) -> str:
+        return f"{time.time_ns() // 1_000_000}-{os.getpid()}-{os.urandom(4).hex()}"
+
+    def save(self, profile_id: str, session, meta: dict) -> None:
+        """Записывает профиль и описание и удаляет самые старые профили сверх max_files."""
+        data = session.render()
+        os.makedirs(self.directory, exist_ok=True)
+        filename = f"{profile_id}.{session.extension}"
+        meta = {**meta, "file": filename, "size": len(data), "media_type": session.media_type}
+        _write_atomic(os.path.join(self.directory, filename), data)
+        # Описание пишется последним: по нему список видит только полностью записанные профили
+        _write_atomic(os.path.join(self.directory, f"{profile_id}.json"), json.dumps(meta).encode())
+        self._trim()
+
+    def _trim(self) -> None:
+        ids = self._ids()
+        for profile_id in ids[:max(len(ids) - self.max_files, 0)]:
+            for name in os.listdir(self.directory):
+                if name.startswith(profile_id + "."):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except FileNotFoundError:  # Уже удалил другой воркер
+                        pass
+
+    def _ids(self) -> list:
+        # id начинаются со времени в мс одинаковой длины, поэтому сортировка по имени - по времени
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-5] for name in names if name.endswith(".json") and PROFILE_ID.match(name[:-5]))
+
+    def list_profiles(self) -> list:
+        """Описания сохраненных профилей, новые первыми."""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(os.path.join(self.directory, f"{profile_id}.json"), "rb") as file:
+                    profiles.append(json.load(file))
+            except (FileNotFoundError, ValueError):
+                continue
+        return profiles
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        """Описание профиля с полем path или None, если профиля нет."""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json"), "rb") as file:
+                meta = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        path = os.path.join(self.directory, meta["file"])
+        return {**meta, "path": path} if os.path.exists(path) else None
+
+    def stats(self) -> dict:
+        return {
+            "profiler": self.session_class.profiler,
+            "directory": self.directory,
+            "max_files": self.max_files,
+            "sample_rate": self.sample_rate,
+            "max_seconds": self.max_seconds,
+            "active": self.active,
+            "profiled": self.profiled,
+            "skipped_busy": self.skipped_busy,
+            "failed": self.failed,
+        }
+
+
+def _is_admin(headers: dict) -> bool:
+    # Та же проверка, что в role_required(UserRole.ADMIN), но без кеша токенов:
+    # запрос разберет токен так же, как без профилирования
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        claims = decode_access_token(token)
+    except JWTError:
+        return False
+    return claims["role"] == UserRole.ADMIN and not token_revocations.is_revoked(claims["id"], claims["token_version"])
+
+
+def _is_event_stream(headers: list) -> bool:
+    return any(name.lower() == b"content-type" and value.startswith(b"text/event-stream") for name, value in headers)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware: профилирует запрос, если администратор прислал X-Profile: 1
+    или запрос попал в выборку PROFILING_SAMPLE_RATE. id профиля возвращается
+    в заголовке X-Profile-Id, профиль скачивается через /api/admin/profiles/{id}.
+    """
+
+    def __init__(self, app, profiler: "RequestProfiler"):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self.profiler.trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        if self.profiler.active:
+            # Профилировщик на поток один: второй запрос выполняется без профиля
+            self.profiler.skipped_busy += 1
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = self.profiler.new_id()
+        session = self.profiler.session_class(self.profiler.interval)
+        status_code = 500
+        finished = False
+
+        async def finish(truncated: Optional[str]) -> None:
+            # Останавливает профиль и сохраняет его; для потоковых ответов - до конца запроса
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            session.stop()
+            self.profiler.active = False
+            query_stats = current_query_stats.get()
+            route = getattr(scope.get("route"), "path", None)
+            meta = {
+                "id": profile_id,
+                "created_at": time.time(),
+                "pid": os.getpid(),
+                "trigger": trigger,
+                "profiler": session.profiler,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route,
+                "status": status_code,
+                # None - профиль всего запроса, иначе причина остановки: event-stream или max-seconds
+                "truncated": truncated,
+                "wall_seconds": time.perf_counter() - started,
+                # CPU всего процесса: включает потоки bcrypt и запросы, выполнявшиеся одновременно
+                "cpu_seconds": time.process_time() - cpu_started,
+                "db_queries": query_stats.count if query_stats is not None else None,
+                "db_seconds": query_stats.seconds if query_stats is not None else None,
+            }
+            try:
+                # Отрисовка и запись на диск - вне event loop
+                await asyncio.to_thread(self.profiler.save, profile_id, session, meta)
+                self.profiler.profiled += 1
+                logger.info(
+                    f"🔬 Profiled {scope['method']} {route or scope['path']} "
+                    f"in {meta['wall_seconds'] * 1000:.0f} ms: {profile_id}"
+                )
+            except Exception as e:
+                self.profiler.failed += 1
+                logger.warning(f"⚠ Failed to save profile {profile_id}: {e}")
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            event_stream = False
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                event_stream = _is_event_stream(message.get("headers", []))
+                message = {**message, "headers": [*message.get("headers", []), (PROFILE_ID_HEADER, profile_id.encode())]}
+            await send(message)
+            if finished:
+                return
+            if event_stream:
+                # SSE живет, пока клиент подключен: профиль - до начала ответа (права, досылка из БД)
+                await finish("event-stream")
+            elif message.get("more_body") and time.perf_counter() - started > self.profiler.max_seconds:
+                # Потоковый ответ (выгрузка) дольше max_seconds: остаток потока не профилируем
+                await finish("max-seconds")
+
+        self.profiler.active = True
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        session.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await finish(None)
+
+
+# Единый профилировщик на воркер; каталог с профилями общий для всех воркеров
+request_profiler = RequestProfiler(
+    directory=settings.PROFILING_DIR or os.path.join(tempfile.gettempdir(), "fastapi-profiles"),
+    max_files=settings.PROFILING_MAX_FILES,
+    sample_rate=settings.PROFILING_SAMPLE_RATE,
+    header_enabled=settings.PROFILING_ENABLED,
+    interval=settings.PROFILING_INTERVAL_MS / 1000,
+    max_seconds=settings.PROFILING_MAX_SECONDS,
+)
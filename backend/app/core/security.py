@@ -0,0 +1,162 @@
+# backend/app/core/security.py
+# Хеширование и проверка паролей вне event loop, разбор access-токенов
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+from jose import JWTError, jwt
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.db.models import UserRole
+
+logger = logging.getLogger(__name__)
+
+# Контекст для хеширования паролей с использованием bcrypt
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Функции уровня модуля, чтобы их можно было передать в ProcessPoolExecutor (pickle)
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Выполняет bcrypt в отдельном пуле потоков или процессов.
+    Очередь ограничена: если все воркеры заняты и в очереди уже queue_depth задач,
+    новые запросы сразу получают 503, а не копятся бесконечно.
+    """
+
+    def __init__(self, executor: str = "thread", workers: int = 4, queue_depth: int = 32):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor}")
+        self.executor_kind = executor
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor: Optional[Executor] = None
+        # Счетчик задач в пуле (выполняются + ждут). Меняется только из event loop
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._failed = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        # Пул создается лениво, чтобы не плодить процессы при импорте модуля
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="pwd-hash"
+                )
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self._pending >= self.workers + self.queue_depth:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password hashing queue is full, try again later",
+                headers={"Retry-After": "1"},
+            )
+
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), func, *args)
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._pending -= 1
+        # Время и completed - только по успешным задачам; ошибки считаются в failed,
+        # отмененные запросы (клиент отключился) не попадают ни туда, ни туда
+        elapsed = time.perf_counter() - started
+        self._completed += 1
+        self._total_seconds += elapsed
+        self._max_seconds = max(self._max_seconds, elapsed)
+        return result
+
+    async def hash(self, password: str) -> str:
+        """Возвращает bcrypt-хеш пароля."""
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Проверяет пароль по хешу."""
+        return await self._run(_verify, password, hashed_password)
+
+    def stats(self) -> dict:
+        """Метрики загрузки пула для текущего воркера."""
+        busy = min(self._pending, self.workers)
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "busy": busy,
+            "queued": max(self._pending - self.workers, 0),
+            "utilization": busy / self.workers if self.workers else 0.0,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "total_seconds": self._total_seconds,
+            "avg_seconds": self._total_seconds / self._completed if self._completed else 0.0,
+            "max_seconds": self._max_seconds,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Единый экземпляр на процесс (на каждый воркер gunicorn)
+password_hasher = PasswordHasher(
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_depth=settings.PASSWORD_HASH_QUEUE_DEPTH,
+)
+
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(password, hashed_password)
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Проверяет подпись и срок действия access-токена и возвращает данные пользователя
+    (username, role, id, token_version, exp). Отзыв токена здесь не проверяется.
+    При недействительном токене - JWTError.
+    """
+    # Токены без срока действия (exp) не принимаются
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM], options={"require_exp": True})
+    # sub - имя пользователя, uid и ver - id пользователя и версия его токенов на момент выдачи
+    claims = {
+        "username": payload.get("sub"),
+        "role": payload.get("role"),
+        "id": payload.get("uid"),
+        "token_version": payload.get("ver"),
+    }
+    # refresh-токен вместо access-токена не принимается
+    if payload.get("type") != "access" or None in claims.values():
+        raise JWTError("Not an access token")
+    try:
+        claims["role"] = UserRole(claims["role"])
+    except ValueError:
+        raise JWTError("Unknown role")
+    claims["exp"] = payload["exp"]
+    return claims
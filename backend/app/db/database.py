@@ -1,9 +1,20 @@
 # Импорт необходимых модулей из SQLAlchemy для асинхронной работы
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy import Delete, Insert, Update, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.schema import CreateColumn
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+from fastapi import Request
 
 # Инициализация логгера для текущего модуля
 logger = logging.getLogger(__name__)
@@ -16,18 +27,312 @@ from app.core.config import Settings
 settings = Settings()
 DATABASE_URL = settings.DATABASE_URL
 
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который дополнительно считает, сколько запросы ждут свободное соединение.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0  # Сколько раз соединение выдавалось из пула
+        self.timeouts = 0  # Сколько раз не дождались соединения за pool_timeout
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self.checkouts += 1
+        return connection
+
+
+def engine_options(url: str) -> dict:
+    """
+    Параметры create_async_engine из настроек.
+    Для SQLite (локальные проверки) настройки пула не применяются.
+    """
+    options = {"echo": settings.DB_ECHO}
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+class QueryStats:
+    """
+    Число SQL-запросов и суммарное время в БД в рамках одного HTTP-запроса,
+    а также число выполнений и время по каждому нормализованному запросу.
+    """
+
+    __slots__ = ("count", "seconds", "statements", "scope")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}  # Нормализованный SQL -> [число выполнений, секунды]
+        self.scope = scope  # ASGI scope запроса: маршрут для логов
+
+    @property
+    def route(self) -> str:
+        route = getattr(self.scope.get("route"), "path", None) if self.scope is not None else None
+        return f"{self.scope['method']} {route or self.scope['path']}" if self.scope is not None else "<вне запроса>"
+
+    def top(self, limit: int = 5) -> str:
+        """Самые частые запросы, по строке на запрос: 'N× за X мс: SQL'."""
+        statements = sorted(self.statements.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        return "\n".join(f"  {n}× за {seconds * 1000:.1f} мс: {sql}" for sql, (n, seconds) in statements)
+
+
+# Статистика текущего HTTP-запроса; устанавливается middleware метрик (None вне запроса)
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+# Параметры и литералы: $1 (asyncpg), ? (sqlite), %(name)s (psycopg2), :name, 'строка', числа
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\$\d+|%\(\w+\)s|\?|(?<!:):\w+|\b\d+(?:\.\d+)?\b")
+# Списки параметров (IN, VALUES) разной длины сводятся к одному виду
+_SQL_LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+_SQL_ROWS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(statement: str) -> str:
+    """
+    SQL без значений параметров и литералов, в одну строку: запросы, отличающиеся только
+    значениями или длиной списка IN (...), дают одну и ту же строку.
+    Текст запросов SQLAlchemy повторяется, поэтому результат кешируется.
+    """
+    sql = _SQL_LITERALS.sub("?", " ".join(statement.split()))
+    sql = _SQL_LISTS.sub("...", sql)
+    return _SQL_ROWS.sub("(...), ...", sql)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        entry = stats.statements.setdefault(normalize_sql(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+    if settings.DB_SLOW_QUERY_MS and elapsed * 1000 >= settings.DB_SLOW_QUERY_MS:
+        route = stats.route if stats is not None else "<вне запроса>"
+        logger.warning(f"🐢 Медленный запрос {elapsed * 1000:.0f} мс ({route}): {normalize_sql(statement)}")
+
+
+# Активные assert_max_queries: получают статистику каждого завершившегося HTTP-запроса
+_query_captures: list = []
+
+
+def check_query_budget(stats: QueryStats) -> None:
+    """
+    Вызывается middleware метрик после HTTP-запроса. Пишет в лог превышение бюджета
+    запросов (DB_QUERY_BUDGET или значение для маршрута из DB_QUERY_BUDGET_OVERRIDES)
+    и запросы, повторенные DB_N_PLUS_ONE_THRESHOLD и больше раз (вероятный N+1).
+    """
+    route = stats.route
+    budget = settings.DB_QUERY_BUDGET_OVERRIDES.get(route, settings.DB_QUERY_BUDGET)
+    if budget and stats.count > budget:
+        logger.warning(
+            f"💸 Превышен бюджет запросов ({route}): {stats.count} при бюджете {budget}, "
+            f"{stats.seconds * 1000:.1f} мс в БД\n{stats.top()}"
+        )
+    threshold = settings.DB_N_PLUS_ONE_THRESHOLD
+    if threshold:
+        for sql, (n, seconds) in stats.statements.items():
+            if n >= threshold:
+                logger.warning(f"🔁 Возможный N+1 ({route}): запрос выполнен {n} раз за {seconds * 1000:.1f} мс: {sql}")
+    for capture in list(_query_captures):
+        capture.append(stats)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """
+    Помощник для тестов: AssertionError, если код внутри блока или любой HTTP-запрос,
+    завершившийся внутри блока (TestClient, httpx с ASGITransport), выполнил больше limit
+    SQL-запросов. В сообщении - маршрут и самые частые запросы.
+
+        with assert_max_queries(2):
+            client.get("/api/admin/users", headers=admin_headers)
+    """
+    direct = QueryStats()
+    requests = []
+    token = current_query_stats.set(direct)
+    _query_captures.append(requests)
+    try:
+        yield requests
+    finally:
+        _query_captures.remove(requests)
+        current_query_stats.reset(token)
+    for stats in ([direct] if direct.count else []) + requests:
+        if stats.count > limit:
+            raise AssertionError(
+                f"{stats.route}: {stats.count} SQL-запросов при пределе {limit}\n{stats.top(limit=20)}"
+            )
+
+
+def instrument_engine(target: AsyncEngine) -> AsyncEngine:
+    """Подключает к движку подсчет запросов и времени в БД для текущего HTTP-запроса."""
+    event.listen(target.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    return target
+
+
 # Создание асинхронного движка SQLAlchemy
-# echo=True включает логирование SQL-запросов (полезно для отладки)
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Размеры пула, таймауты и логирование SQL (DB_ECHO) берутся из настроек
+engine = instrument_engine(create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL)))
+
+
+
+class ReplicaSet:
+    """
+    Движки реплик только для чтения.
+    Реплики выбираются по кругу (round-robin). Реплика, на которой произошла ошибка соединения,
+    исключается на DB_REPLICA_RETRY_SECONDS; если недоступны все, чтение идет на основную БД.
+    """
+
+    def __init__(self, urls: list[str]):
+        self.engines = [instrument_engine(create_async_engine(url, **engine_options(url))) for url in urls]
+        self._next = 0
+        self._down_until: dict[AsyncEngine, float] = {}
+
+    def is_healthy(self, replica: AsyncEngine) -> bool:
+        return self._down_until.get(replica, 0.0) <= time.monotonic()
+
+    def mark_down(self, replica: AsyncEngine) -> None:
+        logger.warning(f"⚠ Реплика {replica.url.render_as_string()} недоступна, чтение переключено")
+        self._down_until[replica] = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+
+    def choose(self) -> Optional[AsyncEngine]:
+        """Следующая доступная реплика или None, если живых реплик нет."""
+        for _ in range(len(self.engines)):
+            replica = self.engines[self._next % len(self.engines)]
+            self._next += 1
+            if self.is_healthy(replica):
+                return replica
+        return None
+
+
+replicas = ReplicaSet([url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()])
+
+
+class RoutingSession(Session):
+    """
+    Сессия, которая отправляет чтение на реплику, если она назначена сессии (session.info["replica"]).
+    Запись, flush и любое чтение после записи в той же сессии идут на основную БД.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replica = self.info.get("replica")
+        if (
+            replica is None
+            or self._flushing
+            or self.info.get("has_writes")
+            or isinstance(clause, (Insert, Update, Delete))
+        ):
+            return engine.sync_engine
+        return replica.sync_engine
+
+    def _connection_for_bind(self, engine_, execution_options=None, **kwargs):
+        try:
+            return super()._connection_for_bind(engine_, execution_options, **kwargs)
+        except (DBAPIError, OSError, asyncio.TimeoutError):
+            replica = self.info.get("replica")
+            if replica is None or engine_ is not replica.sync_engine:
+                raise
+            # Реплика не отвечает: исключаем ее из ротации, а этот запрос дочитывает с основной БД
+            replicas.mark_down(replica)
+            del self.info["replica"]
+            return super()._connection_for_bind(engine.sync_engine, execution_options, **kwargs)
+
 
 # Создание фабрики сессий для работы с БД
 # expire_on_commit=False - объекты не будут терять свои атрибуты после коммита
 # class_=AsyncSession указывает, что нужно использовать асинхронные сессии
-async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+# sync_session_class=RoutingSession - выбор основной БД или реплики для каждого запроса
+async_session = sessionmaker(
+    engine, expire_on_commit=False, class_=AsyncSession, sync_session_class=RoutingSession
+)
+
+
+def use_replica(session: AsyncSession) -> None:
+    """Разрешает сессии читать с реплики (если реплики настроены и доступны)."""
+    replica = replicas.choose() if replicas.engines else None
+    if replica is not None:
+        session.info["replica"] = replica
+
+
+def use_primary(session: AsyncSession) -> None:
+    """Дальнейшее чтение в сессии - только с основной БД."""
+    session.info.pop("replica", None)
 
 # Базовый класс для всех моделей SQLAlchemy
 Base = declarative_base()
 
+
+def _engine_pool_status(target: AsyncEngine) -> dict:
+    pool = target.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        status.update(
+            checkouts=pool.checkouts,
+            timeouts=pool.timeouts,
+            wait_seconds_total=pool.wait_seconds_total,
+            wait_seconds_avg=pool.wait_seconds_total / pool.checkouts if pool.checkouts else 0.0,
+            wait_seconds_max=pool.wait_seconds_max,
+        )
+    return status
+
+
+def pool_status() -> dict:
+    """
+    Текущее состояние пулов соединений (основная БД и реплики) этого воркера.
+    """
+    return {
+        **_engine_pool_status(engine),
+        "replicas": [
+            {
+                "url": replica.url.render_as_string(hide_password=True),
+                "healthy": replicas.is_healthy(replica),
+                **_engine_pool_status(replica),
+            }
+            for replica in replicas.engines
+        ],
+    }
+
 async def init_db():
     """
     Асинхронная функция для инициализации базы данных.
@@ -40,36 +345,305 @@ async def init_db():
             # run_sync используется для вызова синхронного кода в асинхронном контексте
             await conn.run_sync(Base.metadata.create_all)
             logger.info("✅ Таблицы успешно созданы")
+            # create_all не меняет существующие таблицы: колонки, добавленные в модели позже, - отдельно
+            await add_missing_columns(conn)
             
             # Проверка существования конкретной таблицы 'users'
-            # Выполняем SQL-запрос для проверки регистрации таблицы в PostgreSQL
-            result = await conn.execute(text("SELECT to_regclass('public.users')"))
+            # Через инспектор, чтобы проверка работала не только на PostgreSQL
+            exists = await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table("users"))
             
-            # Если таблица существует (result.scalar() возвращает не None)
-            if result.scalar():
+            if exists:
                 logger.info("✔ Таблица 'users' существует")
             else:
                 logger.error("❌ Таблица 'users' не создана")
+
+            if conn.dialect.name == "postgresql":
+                await install_collection_versions(conn)
+                logger.info("✅ Счетчики версий коллекций установлены")
+                await install_feedback_stats(conn)
+                logger.info("✅ Статистика отзывов установлена")
                 
     except Exception as e:
         # Логируем любые ошибки, возникающие при инициализации БД
         logger.error(f"❌ Ошибка при инициализации БД: {e}")
         raise  # Пробрасываем исключение дальше
 
-@asynccontextmanager
-async def get_db():
+def missing_columns(sync_conn) -> list:
+    """Колонки моделей, которых нет в уже существующих таблицах БД (create_all их не добавляет)."""
+    inspector = inspect(sync_conn)
+    existing = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name in existing:
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            missing.extend(column for column in table.columns if column.name not in present)
+    return missing
+
+
+async def add_missing_columns(conn) -> None:
+    """
+    Добавляет в существующие таблицы колонки, появившиеся в моделях позже
+    (feedback.search_vector, feedback.created_at, users.token_version), и индексы этих таблиц:
+    ALTER TABLE ... ADD COLUMN IF NOT EXISTS, CREATE INDEX IF NOT EXISTS. Только PostgreSQL;
+    на других БД с устаревшей схемой - RuntimeError: таблицы нужно пересоздать.
+    """
+    if not await conn.run_sync(missing_columns):
+        return
+    if conn.dialect.name != "postgresql":
+        missing = [f"{column.table.name}.{column.name}" for column in await conn.run_sync(missing_columns)]
+        raise RuntimeError(f"Database schema is outdated, missing columns: {', '.join(missing)}")
+
+    # Воркеры стартуют одновременно: DDL выполняет один, остальные после него уже ничего не найдут
+    await conn.execute(text(f"SELECT pg_advisory_xact_lock({_VERSIONS_DDL_LOCK})"))
+    missing = await conn.run_sync(missing_columns)
+    for column in missing:
+        ddl = CreateColumn(column).compile(dialect=conn.dialect)
+        await conn.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN IF NOT EXISTS {ddl}"))
+        logger.info(f"✅ Добавлена колонка {column.table.name}.{column.name}")
+    for table in {column.table for column in missing}:
+        for index in table.indexes:
+            await conn.run_sync(lambda sync_conn, index=index: index.create(sync_conn, checkfirst=True))
+
+
+# Версии коллекций для ETag списков: последовательность {table}_version_seq.
+# Триггер увеличивает ее на каждую команду INSERT/UPDATE/DELETE/TRUNCATE (в том числе вне приложения),
+# а приложение - еще раз после COMMIT. Последовательность не транзакционна, и триггер срабатывает
+# до фиксации данных; повторное увеличение после COMMIT гарантирует, что версия, под которой
+# клиент мог закешировать старые данные, после фиксации устареет
+VERSIONED_TABLES = frozenset({"users", "feedback"})
+
+# Ключ advisory-блокировки: воркеры gunicorn стартуют одновременно и не должны выполнять DDL параллельно
+# (общий для счетчиков версий и статистики отзывов)
+_VERSIONS_DDL_LOCK = 7351001
+
+
+def version_sequence(table: str) -> str:
+    return f"{table}_version_seq"
+
+
+async def install_collection_versions(conn) -> None:
+    """
+    Создает последовательности версий и триггеры (идемпотентно, только PostgreSQL).
+    Уже установленные триггеры не пересоздаются: CREATE/DROP TRIGGER берет блокировку
+    таблицы, и на каждом перезапуске воркеров она останавливала бы запросы к users и feedback.
+    """
+    await conn.execute(text(f"SELECT pg_advisory_xact_lock({_VERSIONS_DDL_LOCK})"))
+    await conn.execute(text(
+        "CREATE OR REPLACE FUNCTION bump_collection_version() RETURNS trigger AS $$ "
+        "BEGIN PERFORM nextval(TG_ARGV[0]); RETURN NULL; END; $$ LANGUAGE plpgsql"
+    ))
+    installed = set((await conn.execute(text(
+        "SELECT tgrelid::regclass::text FROM pg_trigger "
+        "WHERE tgname = tgrelid::regclass::text || '_version_bump' AND NOT tgisinternal"
+    ))).scalars())
+    for table in sorted(VERSIONED_TABLES - installed):
+        sequence = version_sequence(table)
+        await conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {sequence}"))
+        await conn.execute(text(
+            f"CREATE TRIGGER {table}_version_bump "
+            f"AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION bump_collection_version('{sequence}')"
+        ))
+
+
+# Статистика отзывов: строки feedback_stats (kind, key, count) для каждого разреза отзыва
+_FEEDBACK_STATS_KEYS = (
+    "(VALUES ('total', ''), "
+    "('day', to_char(c.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD')), "
+    "('domain', lower(split_part(c.email, '@', 2))), "
+    "('email', lower(c.email))) AS k(kind, key)"
+)
+
+
+def feedback_stats_upsert(source: str) -> str:
+    """
+    Команда, добавляющая к счетчикам изменения из source (колонки delta, created_at, email).
+    Ключи обновляются в порядке (kind, key): параллельные транзакции блокируют строки
+    счетчиков в одном порядке и не попадают во взаимоблокировку.
+    """
+    return (
+        "INSERT INTO feedback_stats AS s (kind, key, count) "
+        f"SELECT k.kind, k.key, sum(c.delta) FROM ({source}) AS c CROSS JOIN LATERAL {_FEEDBACK_STATS_KEYS} "
+        "WHERE k.key IS NOT NULL GROUP BY k.kind, k.key HAVING sum(c.delta) <> 0 ORDER BY k.kind, k.key "
+        "ON CONFLICT (kind, key) DO UPDATE SET count = s.count + EXCLUDED.count"
+    )
+
+
+_FEEDBACK_STATS_INSERTED = "SELECT 1 AS delta, created_at, email FROM new_rows"
+_FEEDBACK_STATS_DELETED = "SELECT -1 AS delta, created_at, email FROM old_rows"
+
+# Функция триггеров: одна команда на весь INSERT/UPDATE/DELETE (в том числе COPY и пакетные вставки)
+FEEDBACK_STATS_FUNCTION = (
+    "CREATE OR REPLACE FUNCTION feedback_stats_apply() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP = 'INSERT' THEN "
+    f"{feedback_stats_upsert(_FEEDBACK_STATS_INSERTED)}; "
+    "ELSIF TG_OP = 'DELETE' THEN "
+    f"{feedback_stats_upsert(_FEEDBACK_STATS_DELETED)}; "
+    "ELSIF TG_OP = 'UPDATE' THEN "
+    f"{feedback_stats_upsert(_FEEDBACK_STATS_INSERTED + ' UNION ALL ' + _FEEDBACK_STATS_DELETED)}; "
+    "ELSE DELETE FROM feedback_stats; "
+    "END IF; RETURN NULL; END; $$ LANGUAGE plpgsql"
+)
+
+# Триггеры уровня команды с таблицами переходов; для каждого события - свой триггер
+FEEDBACK_STATS_TRIGGERS = {
+    "feedback_stats_insert": "AFTER INSERT ON feedback REFERENCING NEW TABLE AS new_rows",
+    "feedback_stats_update": "AFTER UPDATE ON feedback REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "feedback_stats_delete": "AFTER DELETE ON feedback REFERENCING OLD TABLE AS old_rows",
+    "feedback_stats_truncate": "AFTER TRUNCATE ON feedback",
+}
+
+# Пересчет счетчиков по всей таблице feedback (при первой установке триггеров)
+FEEDBACK_STATS_REBUILD = feedback_stats_upsert("SELECT 1 AS delta, created_at, email FROM feedback")
+
+
+async def install_feedback_stats(conn) -> None:
+    """
+    Создает функцию и триггеры счетчиков отзывов (идемпотентно, только PostgreSQL).
+    Если триггеров еще не было, счетчики пересчитываются по уже существующим отзывам.
+    """
+    await conn.execute(text(f"SELECT pg_advisory_xact_lock({_VERSIONS_DDL_LOCK})"))
+    await conn.execute(text(FEEDBACK_STATS_FUNCTION))
+    installed = set((await conn.execute(text(
+        "SELECT tgname FROM pg_trigger WHERE tgrelid = 'feedback'::regclass AND tgname LIKE 'feedback_stats_%'"
+    ))).scalars())
+    if installed == set(FEEDBACK_STATS_TRIGGERS):
+        return
+    for name, definition in FEEDBACK_STATS_TRIGGERS.items():
+        await conn.execute(text(f"DROP TRIGGER IF EXISTS {name} ON feedback"))
+        await conn.execute(text(
+            f"CREATE TRIGGER {name} {definition} FOR EACH STATEMENT EXECUTE FUNCTION feedback_stats_apply()"
+        ))
+    await conn.execute(text("DELETE FROM feedback_stats"))
+    await conn.execute(text(FEEDBACK_STATS_REBUILD))
+
+
+async def collection_version(session: AsyncSession, table: str) -> Optional[int]:
+    """
+    Текущая версия коллекции или None, если версии не поддерживаются (не PostgreSQL).
+    Читается с основной БД: на репликах значения последовательностей обновляются с опозданием.
+    Позиция WAL на момент чтения запоминается для ensure_replica_fresh.
+    """
+    if session.bind.dialect.name != "postgresql":
+        return None
+    row = (await session.execute(
+        text(f"SELECT last_value, is_called, pg_current_wal_lsn()::text AS lsn FROM {version_sequence(table)}"),
+        bind_arguments={"bind": engine.sync_engine},
+    )).one()
+    session.info["version_lsn"] = row.lsn
+    return row.last_value if row.is_called else 0
+
+
+async def ensure_replica_fresh(session: AsyncSession) -> None:
+    """
+    После collection_version: данные списка читаются с реплики, только если она уже воспроизвела
+    WAL до момента чтения версии - тогда ответ не старее версии в ETag. Отстающая реплика -
+    дальнейшее чтение в сессии с основной БД. Без реплики ничего не делает.
+    """
+    lsn = session.info.pop("version_lsn", None)
+    if lsn is None or session.info.get("replica") is None:
+        return
+    # Не реплика (pg_last_wal_replay_lsn() = NULL) видит все зафиксированное сразу
+    caught_up = (await session.execute(
+        text("SELECT coalesce(pg_last_wal_replay_lsn(), pg_current_wal_lsn()) >= CAST(CAST(:lsn AS text) AS pg_lsn)"),
+        {"lsn": lsn},
+    )).scalar()
+    if not caught_up:
+        use_primary(session)
+
+
+async def bump_collection_versions(session: AsyncSession) -> None:
+    """Вызывается после COMMIT: увеличивает версии таблиц, которые сессия изменила."""
+    tables = sorted(session.info.pop("written_tables", set()) & VERSIONED_TABLES)
+    if not tables or session.bind.dialect.name != "postgresql":
+        return
+    try:
+        await session.execute(
+            text("SELECT " + ", ".join(f"nextval('{version_sequence(table)}')" for table in tables)),
+            bind_arguments={"bind": engine.sync_engine},
+        )
+    except Exception as e:
+        # Данные уже зафиксированы: ошибка здесь не должна превращать успешный запрос в 500
+        logger.warning(f"⚠ Не удалось увеличить версии {tables}: {e}")
+
+
+def mark_written(session: AsyncSession, table: str) -> None:
+    """Отмечает запись в таблицу, сделанную в обход ORM (например, COPY)."""
+    session.info["has_writes"] = True
+    session.info.setdefault("written_tables", set()).add(table)
+
+
+# Отметки о записи в сессии: по ним get_db решает, нужен ли COMMIT.
+# INSERT/UPDATE/DELETE через session.execute() не попадают в session.new/dirty/deleted,
+# поэтому отслеживаем их отдельно
+@event.listens_for(Session, "do_orm_execute")
+def _mark_write_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        session = orm_execute_state.session
+        session.info["has_writes"] = True
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            session.info.setdefault("written_tables", set()).add(table.name)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info["has_writes"] = True
+    # В after_flush new/dirty/deleted еще содержат объекты, которые были записаны
+    written = session.info.setdefault("written_tables", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        written.add(type(obj).__table__.name)
+
+
+def after_commit(session: AsyncSession, callback) -> None:
+    """
+    Регистрирует асинхронную функцию без аргументов, которую get_db вызовет после COMMIT.
+    Если транзакция откатится, функция не вызывается.
+    """
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+async def run_after_commit(session: AsyncSession) -> None:
+    """
+    Шаги после COMMIT: версии коллекций и функции after_commit (например, сброс кешей).
+    Данные уже зафиксированы, поэтому ошибка шага пишется в лог и не превращает
+    успешную запись в 500; остальные шаги все равно выполняются.
+    """
+    await bump_collection_versions(session)
+    for callback in session.info.pop("after_commit", []):
+        try:
+            await callback()
+        except Exception as e:
+            logger.error(f"❌ Ошибка после COMMIT ({getattr(callback, '__qualname__', callback)}): {e}")
+
+
+# Методы, которые не меняют данные: такие запросы могут читать с реплики
+SAFE_METHODS = ("GET", "HEAD")
+
+
+async def get_db(request: Request):
     """
-    Асинхронный контекстный менеджер для работы с сессией БД.
-    Обеспечивает автоматическое управление сессией (коммит/ролбэк) и ее закрытие.
+    Зависимость FastAPI: одна сессия БД на весь запрос (unit of work).
+    Если обработчик что-то записал, в конце делается один COMMIT.
+    Для запросов только на чтение COMMIT не выполняется.
+    При исключении транзакция откатывается.
+    GET/HEAD-запросы читают с реплики, если реплики настроены.
     """
     # Создаем новую сессию
     async with async_session() as session:
+        if request.method in SAFE_METHODS:
+            use_replica(session)
+        committed = False
         try:
             # Возвращаем сессию вызывающему коду
             yield session
-            # Если исключений не было, коммитим транзакцию
-            await session.commit()
+            # Если исключений не было и были изменения, коммитим транзакцию
+            if session.info.get("has_writes") or session.new or session.dirty or session.deleted:
+                await session.commit()
+                committed = True
         except Exception:
             # При возникновении исключения откатываем транзакцию
             await session.rollback()
-            raise  # Пробрасываем исключение дальше
\ No newline at end of file
+            raise  # Пробрасываем исключение дальше
+        if committed:
+            await run_after_commit(session)
@@ -0,0 +1,197 @@
+# backend/app/db/feed.py
+# Лента новых отзывов: одно LISTEN-соединение на воркер и раздача уведомлений подписчикам
+import asyncio
+import logging
+from typing import Optional
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.db.database import async_session
+from app.db.queries import FEEDBACK_CHANNEL, fetch_feedback_by_ids
+
+logger = logging.getLogger(__name__)
+
+# Метка для подписчика, который не успевал читать: пропущенное он дочитывает из БД сам
+RESYNC = object()
+# Метка остановки ленты: подписчики завершают поток
+CLOSED = object()
+
+
+class FeedbackFeed:
+    """
+    Раздает новые отзывы всем подключенным модераторам воркера.
+
+    Воркер держит одно asyncpg-соединение с LISTEN на FEEDBACK_CHANNEL (открывается при первом
+    подписчике). Уведомление несет только id отзывов; фоновая задача собирает id из всех
+    пришедших уведомлений, читает строки одним запросом и кладет одну пачку в очередь каждого
+    подписчика. Сколько бы модераторов ни было подключено, на уведомление - один SELECT на воркер.
+
+    Очередь подписчика ограничена queue_size пачками. Если клиент не успевает читать, очередь
+    очищается и в нее кладется RESYNC: клиент дочитывает пропущенное обычным запросом по id.
+    """
+
+    def __init__(self, dsn: str, queue_size: int = 100, reconnect_delay: float = 1.0):
+        self.dsn = dsn
+        self.queue_size = queue_size
+        self.reconnect_delay = reconnect_delay
+        self._subscribers: set = set()
+        self._pending_ids: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._connection: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self.notifications = 0
+        self.batches = 0
+        self.rows = 0
+        self.resyncs = 0
+        self.reconnects = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        """Открывает LISTEN-соединение и запускает фоновую задачу; повторный вызов ничего не делает."""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._task is not None:
+                return
+            self._wakeup = asyncio.Event()
+            await self._listen()
+            self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Feedback feed listening on '{FEEDBACK_CHANNEL}'")
+
+    def subscribe(self) -> asyncio.Queue:
+        """Очередь пачек новых отзывов (list[Row]) для одного клиента. Лента должна быть запущена (start)."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    async def stop(self) -> None:
+        """Закрывает LISTEN-соединение и завершает потоки всех подписчиков."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._close_connection()
+        for queue in self._subscribers:
+            self._replace_queue(queue, CLOSED)
+        self._subscribers.clear()
+        logger.info("⏹ Feedback feed stopped")
+
+    async def _listen(self) -> None:
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            connection.add_termination_listener(self._on_termination)
+            await connection.add_listener(FEEDBACK_CHANNEL, self._on_notify)
+        except BaseException:
+            await connection.close()
+            raise
+        self._connection = connection
+
+    async def _close_connection(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            await connection.close()
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        # Колбэк asyncpg вызывается в event loop: только запоминаем id, чтение строк - в _run
+        self.notifications += 1
+        self._pending_ids.update(int(feedback_id) for feedback_id in payload.split(",") if feedback_id)
+        self._wakeup.set()
+
+    def _on_termination(self, connection) -> None:
+        # Соединение оборвалось (рестарт БД, сеть): _run переподключится
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            if self._connection is None or self._connection.is_closed():
+                await self._reconnect()
+                continue
+
+            ids, self._pending_ids = sorted(self._pending_ids), set()
+            # Никто не подключен - строки читать незачем
+            if not ids or not self._subscribers:
+                continue
+            try:
+                async with async_session() as session:
+                    rows = await fetch_feedback_by_ids(session, ids)
+            except Exception as e:
+                logger.error(f"❌ Feedback feed failed to read {len(ids)} rows: {e}")
+                self._resync_all()
+                continue
+            if rows:
+                self._broadcast(rows)
+
+    async def _reconnect(self) -> None:
+        await self._close_connection()
+        while self._connection is None:
+            try:
+                await self._listen()
+            except Exception as e:
+                logger.warning(f"⚠ Feedback feed reconnect failed: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+        self.reconnects += 1
+        logger.info("🔄 Feedback feed reconnected")
+        # Уведомления, пришедшие без LISTEN, потеряны: подписчики дочитывают пропущенное из БД
+        self._resync_all()
+
+    def _broadcast(self, rows: list) -> None:
+        self.batches += 1
+        self.rows += len(rows)
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(rows)
+            except asyncio.QueueFull:
+                self.resyncs += 1
+                self._replace_queue(queue, RESYNC)
+
+    def _resync_all(self) -> None:
+        for queue in self._subscribers:
+            self.resyncs += 1
+            self._replace_queue(queue, RESYNC)
+
+    @staticmethod
+    def _replace_queue(queue: asyncio.Queue, marker) -> None:
+        # Непрочитанные пачки больше не нужны: после метки клиент читает из БД или завершается
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(marker)
+
+    def stats(self) -> dict:
+        return {
+            "listening": self._connection is not None and not self._connection.is_closed(),
+            "subscribers": len(self._subscribers),
+            "notifications": self.notifications,
+            "batches": self.batches,
+            "rows": self.rows,
+            "resyncs": self.resyncs,
+            "reconnects": self.reconnects,
+        }
+
+
+def _listen_dsn() -> str:
+    # asyncpg принимает обычный postgresql:// URL, без суффикса драйвера SQLAlchemy
+    return make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+# Единая лента на воркер; LISTEN-соединение открывается при первом подключении модератора
+feedback_feed = FeedbackFeed(
+    dsn=_listen_dsn(),
+    queue_size=settings.FEEDBACK_FEED_QUEUE_SIZE,
+    reconnect_delay=settings.FEEDBACK_FEED_RECONNECT_SECONDS,
+)
@@ -0,0 +1,117 @@
+# backend/app/db/migrations.py
+# Проверка ревизии Alembic при старте и подготовка схемы перед выкладкой
+#
+# Подготовка схемы (один раз перед запуском воркеров):
+#     python -m app.db.migrations
+import asyncio
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+from app.db.database import Base, engine, install_collection_versions, install_feedback_stats, missing_columns
+from app.db import models  # noqa: F401 - регистрирует таблицы в Base.metadata
+
+logger = logging.getLogger(__name__)
+
+# Каталог миграций: backend/alembic
+ALEMBIC_DIR = Path(__file__).resolve().parents[2] / "alembic"
+
+# Ревизия схемы, которую создавал create_all исходного кода (таблицы users и feedback без
+# поздних колонок): такую БД размечаем этой ревизией и применяем миграции после нее
+BASELINE_REVISION = "a15ef55cffb6"
+
+
+def alembic_config() -> Config:
+    """Конфигурация Alembic без alembic.ini: достаточно пути к миграциям."""
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    return config
+
+
+def head_revisions() -> set:
+    """Последние ревизии из файлов миграций (без обращения к БД)."""
+    return set(ScriptDirectory.from_config(alembic_config()).get_heads())
+
+
+async def current_revisions() -> set:
+    """Ревизии из таблицы alembic_version; пустое множество, если таблицы нет."""
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+        except DBAPIError:
+            return set()
+        return set(result.scalars())
+
+
+async def verify_db_revision() -> str:
+    """
+    Проверяет, что БД на последней ревизии миграций. Один запрос, никакого DDL.
+    Если БД отстает или не размечена Alembic, бросает RuntimeError: воркер не должен стартовать
+    со схемой, которую код не ожидает.
+    """
+    heads = head_revisions()
+    current = await current_revisions()
+    if current != heads:
+        raise RuntimeError(
+            f"Database revision {sorted(current) or 'none'} does not match migrations head {sorted(heads)}; "
+            f"run 'python -m app.db.migrations' before starting the app"
+        )
+    return ", ".join(sorted(current))
+
+
+async def _bootstrap() -> tuple:
+    """
+    Текущие ревизии и состояние БД:
+    "alembic" - БД под управлением Alembic;
+    "baseline" - таблицы созданы create_all без Alembic, в них нет колонок из поздних миграций;
+    "created" - пустая БД (или уже полная схема без Alembic): схема создана из моделей.
+    """
+    try:
+        current = await current_revisions()
+        if current:
+            return current, "alembic"
+        async with engine.begin() as conn:
+            tables = await conn.run_sync(lambda sync_conn: set(inspect(sync_conn).get_table_names()))
+            # create_all не добавит колонки в существующие таблицы - это сделают миграции
+            if tables & {"users", "feedback"} and await conn.run_sync(missing_columns):
+                return current, "baseline"
+            await conn.run_sync(Base.metadata.create_all)
+            if conn.dialect.name == "postgresql":
+                await install_collection_versions(conn)
+                await install_feedback_stats(conn)
+        return current, "created"
+    finally:
+        # Alembic запускает миграции в своем event loop, соединения этого loop не переиспользуются
+        await engine.dispose()
+
+
+def prepare_database() -> None:
+    """
+    Приводит БД к последней ревизии.
+    Пустая БД: схема из моделей и отметка head.
+    Таблицы, созданные create_all без Alembic: отметка BASELINE_REVISION и alembic upgrade head.
+    БД под управлением Alembic: alembic upgrade head.
+    """
+    current, state = asyncio.run(_bootstrap())
+    config = alembic_config()
+    if state == "created":
+        logger.info("🛠 alembic_version не найдена: схема создана из моделей, отмечаем head")
+        command.stamp(config, "head")
+    elif state == "baseline":
+        logger.info(f"🛠 Таблицы созданы без Alembic: отмечаем {BASELINE_REVISION} и применяем миграции")
+        command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+    else:
+        logger.info(f"🛠 Текущая ревизия {sorted(current)}, применяем миграции")
+        command.upgrade(config, "head")
+    logger.info(f"✅ База данных на ревизии {sorted(head_revisions())}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    prepare_database()
@@ -1,11 +1,13 @@
 # Импорт необходимых модулей и классов
 from enum import Enum  # Для создания перечислений
-from sqlalchemy import Boolean, Column, Integer, String, Text, Enum as SQLEnum  # SQLAlchemy типы для БД
+from sqlalchemy import BigInteger, Boolean, Column, Computed, DateTime, Index, Integer, String, Text, func, Enum as SQLEnum  # SQLAlchemy типы для БД
+from sqlalchemy.dialects.postgresql import TSVECTOR  # Тип для полнотекстового поиска PostgreSQL
+from sqlalchemy.orm import deferred  # Колонки, которые не загружаются вместе с объектом
 from sqlalchemy.sql import select  # Для SQL запросов
 from app.db.database import Base  # Базовый класс для моделей SQLAlchemy
-from pydantic import BaseModel, EmailStr, Field  # Для создания моделей валидации данных
+from pydantic import BaseModel, EmailStr, Field, model_validator  # Для создания моделей валидации данных
 from datetime import datetime, timedelta  # Для работы с датами и временем
-from typing import Optional  # Для указания необязательных полей
+from typing import Literal, Optional  # Для указания необязательных полей
 
 # Перечисление ролей пользователей
 class UserRole(str, Enum):
@@ -32,6 +34,22 @@ class DBUser(Base):
     hashed_password = Column(String(100))  # Хешированный пароль
     role = Column(SQLEnum(UserRole), default=UserRole.USER)  # Роль из перечисления
     is_active = Column(Boolean, default=True)  # Флаг активности пользователя
+    # Версия токенов: увеличивается при смене роли, статуса или username, токены со старой версией отклоняются
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # Фильтр админки по роли и статусу; id в конце - порядок для keyset-пагинации
+        Index("ix_users_role_is_active", "role", "is_active", "id"),
+        # Поиск по префиксу и сортировка в побайтовом порядке (COLLATE "C"): такой индекс
+        # обслуживает и диапазон prefix <= x < prefix+1, и ORDER BY, независимо от локали БД.
+        # Только PostgreSQL: в SQLite нет сопоставления "C", там сравнение и так побайтовое
+        Index("ix_users_username_c", username.collate("C"), "id").ddl_if(dialect="postgresql"),
+        Index("ix_users_email_lower_c", func.lower(email).collate("C"), "id").ddl_if(dialect="postgresql"),
+    )
+
+# Конфигурация полнотекстового поиска PostgreSQL для отзывов.
+# 'russian' стеммит русские слова, а латиницу обрабатывает английским стеммером
+FEEDBACK_SEARCH_CONFIG = "russian"
 
 # Модель SQLAlchemy для таблицы обратной связи
 class DBFeedback(Base):
@@ -43,6 +61,50 @@ class DBFeedback(Base):
     message = Column(Text)  # Текст сообщения (длинный текст)
     email = Column(String(100))  # Email отправителя
     phone = Column(String(20))  # Телефон отправителя
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # Время создания (задает БД)
+    # Поисковый вектор: вычисляется PostgreSQL при вставке/обновлении, имя весит больше текста.
+    # deferred - не загружается вместе с объектом, нужен только в WHERE/ORDER BY
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{FEEDBACK_SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+            f"setweight(to_tsvector('{FEEDBACK_SEARCH_CONFIG}', coalesce(message, '')), 'B')",
+            persisted=True,
+        ),
+    ))
+
+    __table_args__ = (
+        # GIN-индекс для поиска по search_vector
+        Index("ix_feedback_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+
+# Счетчики отзывов для статистики модераторов (GET /api/moderator/feedbacks/stats).
+# Обновляются триггерами на feedback в той же транзакции, что и вставка/удаление отзывов
+# (app.db.database.install_feedback_stats), поэтому статистика не требует GROUP BY по feedback
+class DBFeedbackStat(Base):
+    __tablename__ = "feedback_stats"
+
+    # kind - разрез: total (key = ''), day (key = 'YYYY-MM-DD', UTC), domain (домен email), email
+    kind = Column(String(10), primary_key=True)
+    key = Column(String(100), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        # Топ доменов и отправителей: первые строки индекса, без сортировки всех ключей
+        Index("ix_feedback_stats_top", "kind", count.desc(), "key"),
+    )
+
+
+# Отзывы токенов: новая token_version пользователя. Воркеры периодически дочитывают свежие строки
+# (app.db.revocations); строки старше срока жизни access-токена удаляются
+class DBTokenRevocation(Base):
+    __tablename__ = "token_revocations"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    token_version = Column(Integer, nullable=False)  # Токены пользователя с меньшей версией недействительны
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
 
 
 # Модель Pydantic для ответа с данными пользователя
@@ -67,6 +129,12 @@ class FeedbackCreate(BaseModel):
 class Token(BaseModel):
     access_token: str  # JWT токен
     token_type: str    # Тип токена (обычно "bearer")
+    refresh_token: Optional[str] = None  # Токен для POST /auth/refresh
+    expires_in: Optional[int] = None  # Срок действия access_token в секундах
+
+# Модель Pydantic для обновления токенов
+class TokenRefresh(BaseModel):
+    refresh_token: str
 
 # Модель Pydantic для данных в токене
 class TokenData(BaseModel):
@@ -76,4 +144,36 @@ class TokenData(BaseModel):
 # Модель Pydantic для обновления данных пользователя
 class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None  # Новый email (необязательное поле)
-    password: Optional[str] = None    # Новый пароль (необязательное поле)
\ No newline at end of file
+    password: Optional[str] = None    # Новый пароль (необязательное поле)
+
+# Модель Pydantic для изменения пользователя администратором.
+# Все поля необязательны: None - не менять (пропущенная роль не понижает пользователя до USER)
+class UserAdminUpdate(BaseModel):
+    username: Optional[str] = None  # Новое имя пользователя
+    email: Optional[EmailStr] = None  # Новый email
+    password: Optional[str] = None  # Новый пароль
+    role: Optional[UserRole] = None  # Новая роль
+    is_active: Optional[bool] = None  # Заблокировать (False) или разблокировать (True)
+
+# Модель Pydantic для отбора пользователей в массовых операциях
+class UserBulkFilter(BaseModel):
+    role: Optional[UserRole] = None  # Только пользователи с этой ролью
+    is_active: Optional[bool] = None  # Только активные / только заблокированные
+
+# Модель Pydantic для массового изменения или удаления пользователей
+class UserBulkRequest(BaseModel):
+    ids: Optional[list[int]] = None  # Явный список id
+    filter: Optional[UserBulkFilter] = None  # Или отбор по полям (можно вместе с ids)
+    action: Literal["update", "delete"] = "update"  # Что сделать с отобранными пользователями
+    role: Optional[UserRole] = None  # Новая роль (для update)
+    is_active: Optional[bool] = None  # Новый статус активности (для update)
+
+    @model_validator(mode="after")
+    def check_selector_and_changes(self):
+        # Без условий отбора операция затронула бы всех пользователей - такое не выполняем
+        has_filter = self.filter is not None and (self.filter.role is not None or self.filter.is_active is not None)
+        if not self.ids and not has_filter:
+            raise ValueError("Specify ids or a non-empty filter")
+        if self.action == "update" and self.role is None and self.is_active is None:
+            raise ValueError("Nothing to update: specify role and/or is_active")
+        return self
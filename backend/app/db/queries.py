@@ -0,0 +1,527 @@
+# Общие запросы к БД, которые используют несколько роутеров
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+from sqlalchemy import Integer, and_, any_, case, delete, func, insert, literal, or_, select, text, tuple_, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.database import after_commit, async_session, mark_written, use_replica
+from app.db.models import DBFeedback, DBFeedbackStat, DBTokenRevocation, DBUser, FEEDBACK_SEARCH_CONFIG
+from app.db.revocations import token_revocations
+
+# Колонки отзыва, которые отдаются клиентам.
+# Выбираем колонки, а не ORM-объекты: строки не попадают в identity map сессии
+FEEDBACK_COLUMNS = (
+    DBFeedback.id,
+    DBFeedback.name,
+    DBFeedback.message,
+    DBFeedback.email,
+    DBFeedback.phone,
+)
+
+
+# Колонки пользователя для списков (то же, что UserResponse, без hashed_password)
+USER_COLUMNS = (
+    DBUser.id,
+    DBUser.username,
+    DBUser.email,
+    DBUser.role,
+    DBUser.is_active,
+)
+
+
+def user_dict(row: Row) -> dict:
+    """Строка, начинающаяся с USER_COLUMNS, в dict для ответа (служебные колонки после них отбрасываются)."""
+    return {column.key: row[i] for i, column in enumerate(USER_COLUMNS)}
+
+
+# Поля, после изменения которых ранее выданные токены недействительны (роль и username - в payload токена)
+TOKEN_FIELDS = ("username", "role", "is_active")
+
+
+async def record_token_revocations(session: AsyncSession, entries: list[tuple]) -> None:
+    """
+    Записывает новые token_version пользователей (пары (user_id, version)) в token_revocations
+    в текущей транзакции. После COMMIT этот воркер применяет их сразу, остальные - при синхронизации.
+    """
+    if not entries:
+        return
+    await session.execute(
+        insert(DBTokenRevocation),
+        [{"user_id": user_id, "token_version": version} for user_id, version in entries],
+    )
+
+    async def apply():
+        token_revocations.apply(entries)
+
+    after_commit(session, apply)
+
+
+async def insert_user_returning(session: AsyncSession, values: dict) -> Optional[Row]:
+    """
+    INSERT ... ON CONFLICT (username) DO NOTHING RETURNING - одна команда вместо проверки и вставки.
+    Возвращает строку USER_COLUMNS или None, если username уже занят (в том числе параллельной регистрацией).
+    """
+    dialect_insert = postgresql.insert if session.bind.dialect.name == "postgresql" else sqlite.insert
+    stmt = (
+        dialect_insert(DBUser)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=[DBUser.username])
+        .returning(*USER_COLUMNS)
+    )
+    return (await session.execute(stmt)).first()
+
+
+async def update_user_returning(session: AsyncSession, where, values: dict) -> Optional[Row]:
+    """
+    UPDATE users SET ... WHERE ... RETURNING: новые значения USER_COLUMNS и прежний username
+    (old_username, нужен для сброса кеша при переименовании). None, если строка не найдена.
+
+    Если меняется поле из TOKEN_FIELDS (значение действительно другое), token_version
+    увеличивается в той же команде, а новая версия записывается в token_revocations.
+
+    На PostgreSQL прежние значения берутся из самосоединения в той же команде:
+    строки из FROM видны в версии до UPDATE. SQLite в RETURNING видит только изменяемую
+    таблицу, поэтому там прежние значения читаются отдельным запросом.
+    """
+    values = dict(values)
+    changes = [getattr(DBUser, field).is_distinct_from(values[field]) for field in TOKEN_FIELDS if field in values]
+    if changes:
+        values["token_version"] = DBUser.token_version + case((or_(*changes), 1), else_=0)
+
+    if session.bind.dialect.name == "postgresql":
+        old = DBUser.__table__.alias("old")
+        stmt = (
+            update(DBUser)
+            .where(where, old.c.id == DBUser.id)
+            .values(**values)
+            .returning(
+                *USER_COLUMNS,
+                old.c.username.label("old_username"),
+                DBUser.token_version,
+                old.c.token_version.label("old_token_version"),
+            )
+        )
+    else:
+        old = (await session.execute(select(DBUser.username, DBUser.token_version).where(where))).first()
+        if old is None:
+            return None
+        stmt = (
+            update(DBUser)
+            .where(where)
+            .values(**values)
+            .returning(
+                *USER_COLUMNS,
+                literal(old.username).label("old_username"),
+                DBUser.token_version,
+                literal(old.token_version).label("old_token_version"),
+            )
+        )
+    result = await session.execute(stmt.execution_options(synchronize_session=False))
+    user = result.first()
+    if user is not None and user.token_version != user.old_token_version:
+        await record_token_revocations(session, [(user.id, user.token_version)])
+    return user
+
+
+def ids_condition(session: AsyncSession, column, ids: list[int]):
+    """
+    column IN ids. На PostgreSQL - column = ANY(:ids) с одним параметром-массивом:
+    обычный IN с десятками тысяч параметров упирается в лимит asyncpg (32767) и долго компилируется.
+    """
+    if session.bind.dialect.name == "postgresql":
+        return column == any_(literal(ids, postgresql.ARRAY(Integer)))
+    return column.in_(ids)
+
+
+async def bulk_update_users(session: AsyncSession, where: list, values: dict) -> list[Row]:
+    """
+    Один UPDATE для всех отобранных пользователей; возвращает измененные строки (USER_COLUMNS, token_version).
+    Смена роли или статуса отзывает токены всех затронутых пользователей.
+    """
+    values = dict(values)
+    revoke = any(field in values for field in TOKEN_FIELDS)
+    if revoke:
+        values["token_version"] = DBUser.token_version + 1
+    stmt = update(DBUser).where(*where).values(**values).returning(*USER_COLUMNS, DBUser.token_version)
+    result = await session.execute(stmt.execution_options(synchronize_session=False))
+    rows = result.all()
+    if revoke:
+        await record_token_revocations(session, [(row.id, row.token_version) for row in rows])
+    return rows
+
+
+async def bulk_delete_users(session: AsyncSession, where: list) -> list[Row]:
+    """
+    Один DELETE для всех отобранных пользователей; возвращает удаленные строки (USER_COLUMNS, token_version).
+    Токены удаленных пользователей отзываются.
+    """
+    stmt = delete(DBUser).where(*where).returning(*USER_COLUMNS, DBUser.token_version)
+    result = await session.execute(stmt.execution_options(synchronize_session=False))
+    rows = result.all()
+    await record_token_revocations(session, [(row.id, row.token_version + 1) for row in rows])
+    return rows
+
+
+# Сортировки списка пользователей в админке: ключ -> колонка (направление задается префиксом "-")
+USER_SORT_KEYS = ("id", "username", "email")
+
+
+def _user_sort_expression(session: AsyncSession, key: str):
+    """
+    Выражение сортировки, совпадающее с индексом (ix_users_username_c, ix_users_email_lower_c).
+    На PostgreSQL - COLLATE "C": побайтовый порядок, в котором поиск по префиксу - это диапазон.
+    """
+    if key == "id":
+        return DBUser.id
+    expr = DBUser.username if key == "username" else func.lower(DBUser.email)
+    if session.bind.dialect.name == "postgresql":
+        expr = expr.collate("C")
+    return expr
+
+
+def _prefix_condition(expr, prefix: str):
+    """
+    expr LIKE 'prefix%' в виде диапазона prefix <= expr < prefix+1 (последний символ увеличен на 1).
+    Диапазон использует btree-индекс и в generic-плане prepared statement, где LIKE с параметром
+    индекс не использует; спецсимволы % и _ в префиксе не нужно экранировать.
+    """
+    last = ord(prefix[-1])
+    if last >= 0x10FFFF:
+        return expr.startswith(prefix, autoescape=True)
+    return and_(expr >= prefix, expr < prefix[:-1] + chr(last + 1))
+
+
+def _encode_cursor(payload: list) -> str:
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, size: int) -> list:
+    """Список из size значений, закодированный _encode_cursor. ValueError, если курсор поврежден."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, list) or len(payload) != size:
+        raise ValueError("Invalid cursor")
+    return payload
+
+
+def encode_user_cursor(sort: str, value, user_id: int) -> str:
+    """Непрозрачный курсор: сортировка, значение ключа и id последней строки страницы."""
+    return _encode_cursor([sort, value, user_id])
+
+
+def decode_user_cursor(cursor: str, sort: str) -> tuple:
+    """(значение ключа, id) из курсора. ValueError, если курсор поврежден или выдан для другой сортировки."""
+    cursor_sort, value, user_id = _decode_cursor(cursor, 3)
+    if cursor_sort != sort or not isinstance(user_id, int) or isinstance(user_id, bool):
+        raise ValueError("Cursor does not match sort order")
+    if sort.lstrip("-") == "id":
+        value = user_id
+    elif not isinstance(value, str):
+        raise ValueError("Invalid cursor")
+    return value, user_id
+
+
+async def fetch_users_page(
+    session: AsyncSession,
+    limit: int,
+    sort: str = "id",
+    cursor: Optional[str] = None,
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    username_prefix: Optional[str] = None,
+    email_prefix: Optional[str] = None,
+) -> dict:
+    """
+    Страница пользователей с фильтрами и сортировкой (keyset-пагинация, без OFFSET).
+
+    sort - id, username или email; "-" в начале - по убыванию. При равных значениях ключа
+    порядок задает id, поэтому курсор - пара (значение ключа, id) последней строки.
+    username_prefix учитывает регистр, email_prefix - нет (сравнивается lower(email)).
+    Запрашиваем limit + 1 строку: лишняя строка говорит о том, что есть следующая страница.
+    ValueError, если курсор некорректен.
+    """
+    descending = sort.startswith("-")
+    key = sort.lstrip("-")
+    sort_expr = _user_sort_expression(session, key)
+
+    stmt = select(*USER_COLUMNS)
+    if key == "email":
+        stmt = stmt.add_columns(sort_expr.label("sort_key"))
+
+    if role is not None:
+        stmt = stmt.where(DBUser.role == role)
+    if is_active is not None:
+        stmt = stmt.where(DBUser.is_active == is_active)
+    if username_prefix:
+        stmt = stmt.where(_prefix_condition(_user_sort_expression(session, "username"), username_prefix))
+    if email_prefix:
+        stmt = stmt.where(_prefix_condition(_user_sort_expression(session, "email"), email_prefix.lower()))
+
+    if cursor is not None:
+        value, after_id = decode_user_cursor(cursor, sort)
+        if key == "id":
+            stmt = stmt.where(DBUser.id < after_id if descending else DBUser.id > after_id)
+        else:
+            # Сравнение строк (ключ, id) > (значение, id) - один диапазон по составному индексу
+            position = tuple_(sort_expr, DBUser.id)
+            after = tuple_(literal(value), literal(after_id))
+            stmt = stmt.where(position < after if descending else position > after)
+
+    if key == "id":
+        order = [DBUser.id.desc() if descending else DBUser.id]
+    else:
+        order = [sort_expr.desc(), DBUser.id.desc()] if descending else [sort_expr, DBUser.id]
+    stmt = stmt.order_by(*order).limit(limit + 1)
+
+    rows = (await session.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        value = {"id": last.id, "username": last.username}.get(key, last[-1])
+        next_cursor = encode_user_cursor(sort, value, last.id)
+
+    return {
+        "items": [user_dict(row) for row in rows],
+        "next_cursor": next_cursor,
+        "limit": limit,
+    }
+
+
+async def fetch_feedback_page(session: AsyncSession, limit: int, after: Optional[int] = None) -> dict:
+    """
+    Возвращает страницу отзывов, упорядоченных по id (keyset-пагинация).
+
+    after - id последней записи предыдущей страницы (None для первой страницы).
+    Запрашиваем limit + 1 строку: лишняя строка говорит о том, что есть следующая страница.
+    """
+    stmt = select(*FEEDBACK_COLUMNS).order_by(DBFeedback.id).limit(limit + 1)
+    if after is not None:
+        stmt = stmt.where(DBFeedback.id > after)
+
+    rows = (await session.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "items": [row._asdict() for row in rows],
+        "next_cursor": rows[-1].id if has_more else None,
+        "limit": limit,
+    }
+
+
+def decode_search_cursor(cursor: str) -> tuple:
+    """(rank, id) последней строки страницы поиска. ValueError, если курсор поврежден."""
+    rank, feedback_id = _decode_cursor(cursor, 2)
+    if (
+        not isinstance(rank, (int, float)) or isinstance(rank, bool)
+        or not isinstance(feedback_id, int) or isinstance(feedback_id, bool)
+    ):
+        raise ValueError("Invalid cursor")
+    return rank, feedback_id
+
+
+async def search_feedback(session: AsyncSession, query: str, limit: int, cursor: Optional[str] = None) -> dict:
+    """
+    Полнотекстовый поиск по имени и тексту отзыва (GIN-индекс по search_vector).
+    query - строка в синтаксисе веб-поиска: слова, "фраза", -исключение, or.
+    Результаты упорядочены по релевантности (ts_rank_cd), затем по id.
+
+    Пагинация по курсору (rank, id) последней строки: следующая страница не перечитывает
+    и не сортирует заново все предыдущие, как OFFSET. ValueError, если курсор поврежден.
+    """
+    ts_query = func.websearch_to_tsquery(FEEDBACK_SEARCH_CONFIG, query)
+    rank = func.ts_rank_cd(DBFeedback.search_vector, ts_query)
+    stmt = (
+        select(*FEEDBACK_COLUMNS, rank.label("rank"))
+        .where(DBFeedback.search_vector.op("@@")(ts_query))
+        .order_by(rank.desc(), DBFeedback.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        # Обе колонки по убыванию: строки "после" курсора - меньшие по (rank, id)
+        stmt = stmt.where(tuple_(rank, DBFeedback.id) < tuple_(*decode_search_cursor(cursor)))
+
+    rows = (await session.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "items": [row._asdict() for row in rows],
+        "next_cursor": _encode_cursor([rows[-1].rank, rows[-1].id]) if has_more else None,
+        "limit": limit,
+    }
+
+
+async def fetch_feedback_stats(session: AsyncSession, days: int, top: int) -> dict:
+    """
+    Статистика отзывов из счетчиков feedback_stats одним запросом: общее число, число по дням
+    за последние days дней (UTC, дни без отзывов - с нулем), top доменов и top отправителей (email).
+    Время ответа зависит от days и top, но не от числа отзывов.
+    """
+    today = datetime.now(timezone.utc).date()
+    since = today - timedelta(days=days - 1)
+    columns = (DBFeedbackStat.kind, DBFeedbackStat.key, DBFeedbackStat.count)
+
+    def top_keys(kind: str):
+        # Первые строки индекса ix_feedback_stats_top
+        return select(
+            select(*columns)
+            .where(DBFeedbackStat.kind == kind, DBFeedbackStat.count > 0)
+            .order_by(DBFeedbackStat.count.desc(), DBFeedbackStat.key)
+            .limit(top)
+            .subquery()
+        )
+
+    stmt = union_all(
+        select(*columns).where(DBFeedbackStat.kind == "total"),
+        select(*columns).where(
+            DBFeedbackStat.kind == "day",
+            DBFeedbackStat.key >= since.isoformat(),
+            DBFeedbackStat.count > 0,
+        ),
+        top_keys("domain"),
+        top_keys("email"),
+    )
+    rows = (await session.execute(stmt)).all()
+
+    counts = {"total": {}, "day": {}, "domain": {}, "email": {}}
+    for kind, key, count in rows:
+        counts[kind][key] = count
+
+    def ranked(kind: str, label: str) -> list[dict]:
+        ordered = sorted(counts[kind].items(), key=lambda item: (-item[1], item[0]))
+        return [{label: key, "count": count} for key, count in ordered]
+
+    daily = []
+    for offset in range(days):
+        day = (since + timedelta(days=offset)).isoformat()
+        daily.append({"day": day, "count": counts["day"].get(day, 0)})
+
+    return {
+        "total": counts["total"].get("", 0),
+        "daily": daily,
+        "domains": ranked("domain", "domain"),
+        "submitters": ranked("email", "email"),
+    }
+
+
+async def stream_feedback_batches(chunk_size: int) -> AsyncIterator[list[Row]]:
+    """
+    Читает все отзывы через серверный курсор и отдает их пачками по chunk_size строк.
+    В памяти одновременно находится только одна пачка, независимо от размера таблицы.
+
+    Сессия открывается внутри генератора: она должна жить, пока ответ отправляется клиенту.
+    """
+    async with async_session() as session:
+        # Выгрузка только читает данные - ее можно отдать реплике
+        use_replica(session)
+        result = await session.stream(
+            select(*FEEDBACK_COLUMNS)
+            .order_by(DBFeedback.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for batch in result.partitions():
+            yield batch
+
+
+# Колонки, которые заполняются при вставке отзыва (кроме id)
+FEEDBACK_INSERT_COLUMNS = ("name", "message", "email", "phone")
+
+
+async def insert_feedback_rows(session: AsyncSession, rows: list[dict]) -> list[int]:
+    """
+    Вставляет отзывы одной командой и возвращает их id в том же порядке, что и rows.
+
+    Небольшие пачки - многострочный INSERT ... RETURNING id.
+    Пачки от FEEDBACK_BULK_COPY_THRESHOLD строк на PostgreSQL/asyncpg - COPY.
+    Вставка идет в текущей транзакции сессии, COMMIT выполняет вызывающий код.
+    """
+    if not rows:
+        return []
+
+    connection = await session.connection()
+    if len(rows) >= settings.FEEDBACK_BULK_COPY_THRESHOLD and connection.dialect.driver == "asyncpg":
+        ids = await _copy_feedback_rows(session, rows)
+    elif connection.dialect.name == "postgresql":
+        result = await session.execute(
+            insert(DBFeedback).returning(DBFeedback.id, sort_by_parameter_order=True),
+            rows,
+        )
+        ids = list(result.scalars())
+    else:
+        # sort_by_parameter_order на SQLite выполняется по одному INSERT на строку.
+        # Без него - многострочный INSERT; rowid новых строк одной команды возрастают
+        # в порядке VALUES (запись в SQLite только одна), поэтому отсортированные id совпадают с rows
+        result = await session.execute(insert(DBFeedback).returning(DBFeedback.id), rows)
+        ids = sorted(result.scalars())
+
+    if connection.dialect.name == "postgresql":
+        await notify_feedback_created(session, ids)
+    return ids
+
+
+# Канал LISTEN/NOTIFY для ленты новых отзывов (app.db.feed)
+FEEDBACK_CHANNEL = "feedback_created"
+# id в одном уведомлении: payload NOTIFY ограничен 8000 байт
+FEEDBACK_NOTIFY_IDS = 500
+
+
+async def notify_feedback_created(session: AsyncSession, ids: list[int]) -> None:
+    """
+    pg_notify с id новых отзывов (через запятую, пачками по FEEDBACK_NOTIFY_IDS) - одной командой.
+    NOTIFY транзакционный: подписчики получат уведомление только после COMMIT, при откате - никогда.
+    """
+    payloads = [
+        ",".join(map(str, ids[start:start + FEEDBACK_NOTIFY_IDS]))
+        for start in range(0, len(ids), FEEDBACK_NOTIFY_IDS)
+    ]
+    await session.execute(
+        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+        {"channel": FEEDBACK_CHANNEL, "payloads": payloads},
+    )
+
+
+async def latest_feedback_id(session: AsyncSession) -> int:
+    """Наибольший id отзыва (0, если отзывов нет) - по индексу первичного ключа."""
+    return (await session.execute(select(func.max(DBFeedback.id)))).scalar() or 0
+
+
+async def fetch_feedback_by_ids(session: AsyncSession, ids: list[int]) -> list[Row]:
+    """Отзывы (FEEDBACK_COLUMNS) с указанными id, по возрастанию id."""
+    stmt = select(*FEEDBACK_COLUMNS).where(ids_condition(session, DBFeedback.id, ids)).order_by(DBFeedback.id)
+    return (await session.execute(stmt)).all()
+
+
+async def _copy_feedback_rows(session: AsyncSession, rows: list[dict]) -> list[int]:
+    connection = await session.connection()
+    # COPY не умеет RETURNING, поэтому id заранее берем из последовательности
+    ids = (await connection.execute(
+        text("SELECT nextval(pg_get_serial_sequence('feedback', 'id')) FROM generate_series(1, :count)"),
+        {"count": len(rows)},
+    )).scalars().all()
+
+    records = [
+        (feedback_id, *(row[column] for column in FEEDBACK_INSERT_COLUMNS))
+        for feedback_id, row in zip(ids, rows)
+    ]
+    # COPY выполняется на том же соединении и в той же транзакции, что и сессия
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        DBFeedback.__tablename__,
+        records=records,
+        columns=("id", *FEEDBACK_INSERT_COLUMNS),
+    )
+    # COPY идет мимо ORM, поэтому сами отмечаем, что в сессии есть запись
+    mark_written(session, DBFeedback.__tablename__)
+    return list(ids)
@@ -0,0 +1,143 @@
+# backend/app/db/revocations.py
+# Отзыв JWT без запроса к БД на каждый запрос: таблица версий токенов в памяти воркера
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, select
+
+from app.core.config import settings
+from app.db.database import async_session
+from app.db.models import DBTokenRevocation
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRevocations:
+    """
+    Минимальная допустимая версия токенов по id пользователя.
+
+    В access-токене есть uid и ver (DBUser.token_version на момент выдачи). Смена роли, статуса
+    активности или username и удаление пользователя увеличивают token_version и добавляют строку
+    в token_revocations. Каждый воркер раз в sync_interval секунд дочитывает новые строки
+    и отклоняет токены с ver меньше записанной версии - без запроса к БД в самом запросе.
+    Воркер, выполнивший изменение, применяет его сразу после COMMIT.
+
+    Строка нужна, пока живы access-токены, выданные до нее (retention); refresh-токены
+    проверяются по users.token_version в /auth/refresh, поэтому старые строки удаляются.
+    """
+
+    def __init__(self, sync_interval: float, retention: float):
+        self.sync_interval = sync_interval
+        self.retention = retention
+        # user_id -> (минимальная версия, monotonic-время, после которого запись не нужна)
+        self._versions: dict = {}
+        # Время БД последней синхронизации: следующая читает строки начиная с него
+        self._synced_at: Optional[datetime] = None
+        self._last_prune = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.syncs = 0
+        self.sync_errors = 0
+        self.rejected = 0
+        self.last_sync_monotonic: Optional[float] = None
+
+    def is_revoked(self, user_id: int, version: int) -> bool:
+        entry = self._versions.get(user_id)
+        if entry is None:
+            return False
+        min_version, expires_at = entry
+        if expires_at <= time.monotonic():
+            # Все токены, выданные до отзыва, уже истекли
+            del self._versions[user_id]
+            return False
+        if version < min_version:
+            self.rejected += 1
+            return True
+        return False
+
+    def apply(self, entries: Iterable[tuple]) -> None:
+        """Применяет пары (user_id, новая token_version)."""
+        expires_at = time.monotonic() + self.retention
+        for user_id, version in entries:
+            current = self._versions.get(user_id)
+            if current is None or current[0] <= version:
+                self._versions[user_id] = (version, expires_at)
+
+    async def start(self) -> None:
+        # Первая синхронизация до приема запросов: отозванные токены не должны пройти после рестарта
+        try:
+            await self.sync()
+        except Exception as e:
+            self.sync_errors += 1
+            logger.error(f"❌ Token revocations initial sync failed: {e}")
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Token revocations synced every {self.sync_interval:g} s")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                self.sync_errors += 1
+                logger.warning(f"⚠ Token revocations sync failed: {e}")
+
+    async def sync(self) -> None:
+        """Дочитывает строки token_revocations, появившиеся после прошлой синхронизации."""
+        async with async_session() as session:
+            now = (await session.execute(select(func.now()))).scalar()
+            # Строка получает created_at в начале своей транзакции, а видна после COMMIT:
+            # перечитываем с запасом, чтобы не пропустить транзакции, зафиксированные позже
+            since = (
+                self._synced_at - timedelta(seconds=self.sync_interval + 60)
+                if self._synced_at is not None
+                else now - timedelta(seconds=self.retention)
+            )
+            rows = (await session.execute(
+                select(DBTokenRevocation.user_id, DBTokenRevocation.token_version)
+                .where(DBTokenRevocation.created_at > since)
+            )).all()
+            self.apply(rows)
+            self._synced_at = now
+
+            # Раз в retention удаляем строки, которые больше никому не нужны
+            if time.monotonic() - self._last_prune >= self.retention:
+                await session.execute(
+                    delete(DBTokenRevocation)
+                    .where(DBTokenRevocation.created_at < now - timedelta(seconds=self.retention))
+                )
+                await session.commit()
+                self._last_prune = time.monotonic()
+        self.syncs += 1
+        self.last_sync_monotonic = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._versions),
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+            "rejected": self.rejected,
+            "seconds_since_sync": (
+                time.monotonic() - self.last_sync_monotonic if self.last_sync_monotonic is not None else None
+            ),
+        }
+
+
+# Единая таблица на воркер; синхронизация запускается из lifespan.
+# Запись хранится, пока не истекут access-токены, выданные до отзыва (с запасом на синхронизацию)
+token_revocations = TokenRevocations(
+    sync_interval=settings.TOKEN_REVOCATION_SYNC_SECONDS,
+    retention=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60 + settings.TOKEN_REVOCATION_SYNC_SECONDS + 60,
+)
@@ -0,0 +1,175 @@
+# backend/app/db/write_buffer.py
+# Отложенная пакетная запись отзывов (write-behind)
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.db.database import async_session, bump_collection_versions
+from app.db.queries import insert_feedback_rows
+
+logger = logging.getLogger(__name__)
+
+# Метка остановки: после нее фоновая задача дописывает очередь и завершается
+_STOP = object()
+
+
+class FeedbackWriteBuffer:
+    """
+    Очередь отзывов в памяти воркера и фоновая задача, которая пишет их в БД пачками.
+    Пачка уходит, когда набралось batch_size отзывов или прошло max_delay секунд
+    после первого отзыва в пачке. Одна пачка - одна транзакция и одно соединение из пула.
+
+    durability:
+    - "commit": submit() ждет COMMIT своей пачки и возвращает id отзыва;
+    - "accepted": submit() возвращается сразу после постановки в очередь.
+    """
+
+    def __init__(self, batch_size: int, max_delay: float, queue_size: int, durability: str = "commit"):
+        if durability not in ("commit", "accepted"):
+            raise ValueError(f"Unknown write-behind durability: {durability}")
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.queue_size = queue_size
+        self.durability = durability
+        # Очередь и задача создаются в start(), внутри работающего event loop
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.submitted = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.flush_seconds_last = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Feedback write-behind buffer started (durability={self.durability})")
+
+    async def stop(self) -> None:
+        """Перестает принимать отзывы и дописывает все, что осталось в очереди."""
+        if self._task is None:
+            return
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info("⏹ Feedback write-behind buffer flushed and stopped")
+
+    async def submit(self, row: dict) -> Optional[int]:
+        """
+        Ставит отзыв в очередь. В режиме "commit" возвращает id после COMMIT,
+        в режиме "accepted" - None сразу.
+        """
+        if not self.running:
+            raise RuntimeError("Feedback write-behind buffer is not running")
+
+        future = asyncio.get_running_loop().create_future() if self.durability == "commit" else None
+        try:
+            self._queue.put_nowait((row, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Feedback queue is full, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.submitted += 1
+        if future is not None:
+            return await future
+        return None
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            # Даем пачке наполниться, если очередь еще не набрала полную пачку
+            if self._queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # Остановка: дописываем остаток очереди полными пачками
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+
+    async def _flush(self, batch: list) -> None:
+        started = time.perf_counter()
+        try:
+            async with async_session() as session:
+                ids = await insert_feedback_rows(session, [row for row, _ in batch])
+                await session.commit()
+                await bump_collection_versions(session)
+        except Exception as e:
+            self.failed_rows += len(batch)
+            logger.error(f"❌ Feedback write-behind flush failed ({len(batch)} rows): {e}")
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), feedback_id in zip(batch, ids):
+            if future is not None and not future.done():
+                future.set_result(feedback_id)
+
+        elapsed = time.perf_counter() - started
+        self.flushes += 1
+        self.flushed_rows += len(batch)
+        self.flush_seconds_last = elapsed
+        self.flush_seconds_total += elapsed
+        self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.running,
+            "durability": self.durability,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "avg_batch_size": self.flushed_rows / self.flushes if self.flushes else 0.0,
+            "flush_seconds_last": self.flush_seconds_last,
+            "flush_seconds_total": self.flush_seconds_total,
+            "flush_seconds_avg": self.flush_seconds_total / self.flushes if self.flushes else 0.0,
+            "flush_seconds_max": self.flush_seconds_max,
+        }
+
+
+# Единый буфер на воркер; запускается из lifespan, если FEEDBACK_WRITE_BEHIND включен
+feedback_buffer = FeedbackWriteBuffer(
+    batch_size=settings.FEEDBACK_WRITE_BEHIND_BATCH_SIZE,
+    max_delay=settings.FEEDBACK_WRITE_BEHIND_MAX_DELAY_MS / 1000,
+    queue_size=settings.FEEDBACK_WRITE_BEHIND_QUEUE_SIZE,
+    durability=settings.FEEDBACK_WRITE_BEHIND_DURABILITY,
+)
@@ -1,8 +1,20 @@
+import time
+_import_started = time.perf_counter()  # Отсчет времени старта воркера: импорт приложения тоже считается
+
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 import logging
 from app.db.database import init_db as db_init
-from app.api.endpoints import auth, users, admin, feedback, health
+from app.db.migrations import verify_db_revision
+from app.api.endpoints import auth, users, admin, feedback, health, metrics
+from app.core.config import settings
+from app.core.compression import CompressionMiddleware, compression_options
+from app.core.metrics import MetricsMiddleware, component_metrics
+from app.core.profiling import ProfilingMiddleware, request_profiler
+from app.core.security import password_hasher
+from app.db.feed import feedback_feed
+from app.db.revocations import token_revocations
+from app.db.write_buffer import feedback_buffer
 from fastapi.middleware.cors import CORSMiddleware
 
 logger = logging.getLogger(__name__)
@@ -10,14 +22,39 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🔄 Starting application initialization...")
+    started = time.perf_counter()
     try:
-        logger.info("🛠 Initializing database...")
-        await db_init()
-        logger.info("✅ Database initialized successfully")
+        if settings.STARTUP_DB_MODE == "verify":
+            # Схему готовят миграции до старта: воркер только сверяет ревизию (один запрос)
+            revision = await verify_db_revision()
+            logger.info(f"✅ Database is at migrations head ({revision})")
+        elif settings.STARTUP_DB_MODE == "create_all":
+            logger.info("🛠 Initializing database...")
+            await db_init()
+            logger.info("✅ Database initialized successfully")
+        else:
+            raise ValueError(f"Unknown STARTUP_DB_MODE: {settings.STARTUP_DB_MODE}")
     except Exception as e:
         logger.error(f"❌ Database initialization failed: {e}")
         raise
+    if settings.FEEDBACK_WRITE_BEHIND:
+        await feedback_buffer.start()
+    # Отозванные токены загружаются до приема запросов, дальше - раз в TOKEN_REVOCATION_SYNC_SECONDS
+    await token_revocations.start()
+    await component_metrics.start()
+    now = time.perf_counter()
+    logger.info(
+        f"🚀 Startup complete in {(now - _import_started) * 1000:.0f} ms "
+        f"(imports {(started - _import_started) * 1000:.0f} ms, "
+        f"database {settings.STARTUP_DB_MODE} {(now - started) * 1000:.0f} ms)"
+    )
     yield
+    # Сначала дописываем очередь отзывов, потом останавливаем остальное
+    await feedback_buffer.stop()
+    await component_metrics.stop()
+    await feedback_feed.stop()
+    await token_revocations.stop()
+    password_hasher.shutdown()
     logger.info("⏹ Application shutdown")
 
 app = FastAPI(
@@ -37,8 +74,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Сжатие JSON-ответов (gzip/brotli) от RESPONSE_COMPRESSION_MIN_SIZE байт
+app.add_middleware(CompressionMiddleware, **compression_options())
+
+# Профиль запроса по X-Profile (администратор) или по выборке: охватывает сжатие, зависимости и обработчик
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+# Метрики добавляются последними, чтобы учитывать время всех остальных middleware
+app.add_middleware(MetricsMiddleware)
+
 # Подключаем healthcheck первым
 app.include_router(health.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
 
 # Затем остальные роутеры
 app.include_router(auth.router)
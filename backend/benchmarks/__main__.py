@@ -0,0 +1,203 @@
+# backend/benchmarks/__main__.py
+# Командная строка: python -m benchmarks run|compare
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _app_env(pairs: list) -> dict:
+    env = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        env[key] = value
+    return env
+
+
+async def _run_load(args, base_url: str, scenarios: list) -> dict:
+    import httpx
+    from benchmarks.load import login_pool, run_scenario
+
+    context = {"users": args.users, "feedback": args.feedback}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        tokens = await login_pool(client, args.users, args.token_pool)
+        results = {}
+        for scenario in scenarios:
+            print(f"▶ {scenario.name} ...", file=sys.stderr)
+            results[scenario.name] = await run_scenario(
+                client, scenario, tokens, context,
+                concurrency=args.concurrency, duration=args.duration,
+                warmup=args.warmup, seed_value=args.seed,
+            )
+            summary = results[scenario.name]
+            print(
+                f"  {summary['throughput_rps']} rps, p50 {summary['latency_ms']['p50']} ms, "
+                f"p99 {summary['latency_ms']['p99']} ms, errors {summary['errors']}",
+                file=sys.stderr,
+            )
+        return results
+
+
+def run(args) -> int:
+    temp_dir = None
+    if not args.database_url:
+        temp_dir = tempfile.TemporaryDirectory(prefix="benchmark-")
+        args.database_url = f"sqlite+aiosqlite:///{temp_dir.name}/benchmark.db"
+
+    # Модули приложения читают настройки при импорте
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    app_env = _app_env(args.set)
+    os.environ.update(app_env)
+
+    from sqlalchemy.engine import make_url
+    from benchmarks.load import run_server
+    from benchmarks.scenarios import DEFAULT_SCENARIOS, SCENARIOS
+    from benchmarks.seed import check_drop_allowed, seed
+
+    dialect = make_url(args.database_url).get_backend_name()
+    names = args.endpoints or list(DEFAULT_SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown endpoints: {', '.join(unknown)}. Available: {', '.join(SCENARIOS)}", file=sys.stderr)
+        return 2
+    scenarios = [
+        SCENARIOS[name] for name in names
+        if not (SCENARIOS[name].postgres_only and dialect != "postgresql")
+    ]
+
+    if not args.no_seed:
+        try:
+            check_drop_allowed(args.database_url, args.drop)
+        except RuntimeError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 2
+
+    try:
+        if not args.no_seed:
+            started = time.perf_counter()
+            print(f"🌱 Seeding {args.users} users, {args.feedback} feedback rows ...", file=sys.stderr)
+            asyncio.run(seed(args.database_url, args.users, args.feedback, args.seed, drop=args.drop))
+            print(f"  done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        with run_server(args.database_url, workers=args.workers, env=app_env) as base_url:
+            results = asyncio.run(_run_load(args, base_url, scenarios))
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "database": dialect,
+            "users": args.users,
+            "feedback": args.feedback,
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "workers": args.workers,
+            "settings": app_env,
+        },
+        "endpoints": results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+def compare_reports(args) -> int:
+    from benchmarks.compare import compare, format_table, load
+
+    comparison = compare(load(args.base), load(args.candidate), args.threshold)
+    if args.json:
+        print(json.dumps(comparison, ensure_ascii=False, indent=2))
+    else:
+        print(format_table(comparison))
+    return 1 if comparison["regressions"] else 0
+
+
+def serialization(args) -> int:
+    os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    from benchmarks.serialization import run as run_serialization
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "rows": args.rows,
+            "iterations": args.iterations,
+        },
+        "endpoints": run_serialization(args.rows, args.iterations),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="API load benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Seed the database, start the app and measure endpoints")
+    run_parser.add_argument("--database-url", help="SQLAlchemy async URL (default: temporary SQLite file)")
+    run_parser.add_argument("--users", type=int, default=200, help="Regular users to seed")
+    run_parser.add_argument("--feedback", type=int, default=10000, help="Feedback rows to seed")
+    run_parser.add_argument("--no-seed", action="store_true", help="Reuse existing data (the schema is not reset)")
+    run_parser.add_argument("--drop", action="store_true",
+                            help="Allow dropping all tables of a database whose name does not contain 'bench'")
+    run_parser.add_argument("--endpoints", nargs="+", help="Scenarios to run (default: all main endpoints)")
+    run_parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients per endpoint")
+    run_parser.add_argument("--duration", type=float, default=10, help="Seconds of load per endpoint")
+    run_parser.add_argument("--warmup", type=int, default=20, help="Requests sent before measuring")
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    run_parser.add_argument("--token-pool", type=int, default=20, help="Distinct user tokens to rotate")
+    run_parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout, seconds")
+    run_parser.add_argument("--seed", type=int, default=42, help="Random seed for data and requests")
+    run_parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                            help="Extra app setting for seeding and the server, e.g. FEEDBACK_WRITE_BEHIND=true")
+    run_parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="Compare two JSON reports")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=10,
+                                help="Percent of throughput drop or p95 growth counted as a regression")
+    compare_parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    compare_parser.set_defaults(handler=compare_reports)
+
+    serialization_parser = commands.add_parser(
+        "serialization", help="CPU per response: default FastAPI serialization vs the fast JSON path"
+    )
+    serialization_parser.add_argument("--rows", type=int, default=500, help="Records per response")
+    serialization_parser.add_argument("--iterations", type=int, default=200, help="Responses per measurement")
+    serialization_parser.set_defaults(handler=serialization)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
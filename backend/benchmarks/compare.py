@@ -0,0 +1,64 @@
+# backend/benchmarks/compare.py
+# Сравнение двух JSON-отчетов бенчмарка
+import json
+
+# Метрики, для которых рост - это ухудшение
+LATENCY_KEYS = ("p50", "p95", "p99")
+
+
+def _change(before: float, after: float) -> float:
+    """Изменение в процентах относительно before."""
+    if not before:
+        return 0.0
+    return round((after - before) / before * 100, 2)
+
+
+def compare(base: dict, candidate: dict, threshold: float) -> dict:
+    """
+    Для каждого эндпоинта из обоих отчетов: изменение пропускной способности и перцентилей.
+    Регрессия - падение throughput или рост p95 больше чем на threshold процентов.
+    """
+    endpoints = {}
+    regressions = []
+    for name, before in base["endpoints"].items():
+        after = candidate["endpoints"].get(name)
+        if after is None:
+            continue
+        result = {
+            "throughput_rps": {
+                "base": before["throughput_rps"],
+                "candidate": after["throughput_rps"],
+                "change_percent": _change(before["throughput_rps"], after["throughput_rps"]),
+            },
+        }
+        for key in LATENCY_KEYS:
+            result[f"{key}_ms"] = {
+                "base": before["latency_ms"][key],
+                "candidate": after["latency_ms"][key],
+                "change_percent": _change(before["latency_ms"][key], after["latency_ms"][key]),
+            }
+        result["errors"] = {"base": before["errors"], "candidate": after["errors"]}
+        if (
+            result["throughput_rps"]["change_percent"] < -threshold
+            or result["p95_ms"]["change_percent"] > threshold
+        ):
+            regressions.append(name)
+        endpoints[name] = result
+    return {"threshold_percent": threshold, "endpoints": endpoints, "regressions": regressions}
+
+
+def format_table(comparison: dict) -> str:
+    lines = [f"{'endpoint':<22} {'rps':>28} {'p50 ms':>28} {'p95 ms':>28} {'p99 ms':>28}"]
+    for name, result in comparison["endpoints"].items():
+        cells = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            value = result[key]
+            cells.append(f"{value['base']:>8} → {value['candidate']:<8} {value['change_percent']:+.1f}%".rjust(28))
+        marker = "  ⚠" if name in comparison["regressions"] else ""
+        lines.append(f"{name:<22} " + " ".join(cells) + marker)
+    return "\n".join(lines)
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
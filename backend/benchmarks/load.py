@@ -0,0 +1,167 @@
+# backend/benchmarks/load.py
+# Запуск сервера приложения и генерация нагрузки конкурентными httpx-клиентами
+import asyncio
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from benchmarks.scenarios import Scenario
+from benchmarks.seed import ADMIN_USERNAME, MODERATOR_USERNAME, PASSWORD, username
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def run_server(database_url: str, workers: int = 1, env: Optional[dict] = None, startup_timeout: float = 60):
+    """Запускает uvicorn с приложением в отдельном процессе и возвращает базовый URL."""
+    port = _free_port()
+    process_env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark-secret-key"),
+        "WEB_CONCURRENCY": str(workers),
+        **(env or {}),
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "benchmarks.server:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=BACKEND_DIR,
+        env=process_env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            try:
+                if httpx.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("Server did not become healthy in time")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def _token(client: httpx.AsyncClient, name: str) -> str:
+    response = await client.post("/auth/token", data={"username": name, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def login_pool(client: httpx.AsyncClient, users: int, pool_size: int) -> dict:
+    """Токены админа, модератора и pool_size обычных пользователей."""
+    names = [username(i) for i in range(min(users, pool_size))]
+    tokens = await asyncio.gather(*(_token(client, name) for name in names))
+    return {
+        "admin": [await _token(client, ADMIN_USERNAME)],
+        "moderator": [await _token(client, MODERATOR_USERNAME)],
+        "user": list(tokens),
+    }
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Перцентиль по методу ближайшего ранга (fraction от 0 до 1)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: list, errors: int, elapsed: float, status_codes: dict) -> dict:
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    completed = len(latencies) + errors
+    return {
+        "requests": completed,
+        "errors": errors,
+        "status_codes": {str(code): count for code, count in sorted(status_codes.items())},
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1]) if latencies else 0.0,
+        },
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    tokens: dict,
+    context: dict,
+    concurrency: int,
+    duration: float,
+    warmup: int,
+    seed_value: int,
+) -> dict:
+    """
+    concurrency клиентов отправляют запросы без пауз в течение duration секунд.
+    Успешные (2xx) запросы идут в перцентили, остальные считаются ошибками.
+    """
+    rng = random.Random(seed_value)
+
+    def request_args() -> dict:
+        args = scenario.build(rng, context)
+        if scenario.role:
+            token = rng.choice(tokens[scenario.role])
+            args["headers"] = {"Authorization": f"Bearer {token}"}
+        return args
+
+    for _ in range(warmup):
+        await client.request(scenario.method, scenario.path, **request_args())
+
+    latencies = []
+    status_codes = {}
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            args = request_args()
+            started = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, scenario.path, **args)
+                code = response.status_code
+            except httpx.HTTPError:
+                code = 0
+            elapsed = time.perf_counter() - started
+            status_codes[code] = status_codes.get(code, 0) + 1
+            if 200 <= code < 300:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started, status_codes)
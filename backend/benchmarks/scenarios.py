@@ -0,0 +1,85 @@
+# backend/benchmarks/scenarios.py
+# Сценарии нагрузки: какой эндпоинт, от чьего имени и с какими параметрами
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from benchmarks.seed import PASSWORD, USER_PREFIX, WORDS, username
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    # Чей токен передавать: None - без авторизации, "user" - случайный из пула
+    role: Optional[str] = None
+    # Дополнительные аргументы httpx-запроса (params, json, data); получает генератор и параметры прогона
+    build: Callable[[random.Random, dict], dict] = field(default=lambda rng, ctx: {})
+    postgres_only: bool = False
+
+
+def _login(rng: random.Random, ctx: dict) -> dict:
+    return {"data": {"username": username(rng.randrange(ctx["users"])), "password": PASSWORD}}
+
+
+def _feedback(rng: random.Random, ctx: dict) -> dict:
+    return {"json": {
+        "name": "Bench",
+        "message": " ".join(rng.choice(WORDS) for _ in range(12)),
+        "email": "bench@bench.io",
+        "phone": "+79000000000",
+    }}
+
+
+def _deep_page(rng: random.Random, ctx: dict) -> dict:
+    return {"params": {"limit": 50, "after": rng.randrange(max(ctx["feedback"], 1))}}
+
+
+def _search(rng: random.Random, ctx: dict) -> dict:
+    return {"params": {"q": rng.choice(WORDS), "limit": 20}}
+
+
+def _admin_filter(rng: random.Random, ctx: dict) -> dict:
+    return {"params": {
+        "limit": 50,
+        "role": "user",
+        "is_active": "true",
+        "username_prefix": f"{USER_PREFIX}{rng.randrange(1, 10)}",
+        "sort": "username",
+    }}
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("health", "GET", "/api/health"),
+        Scenario("auth_token", "POST", "/auth/token", build=_login),
+        Scenario("users_me", "GET", "/api/users/me", role="user"),
+        Scenario("feedback_create", "POST", "/api/feedback/", role="user", build=_feedback),
+        Scenario("feedback_list", "GET", "/api/feedback/", role="user",
+                 build=lambda rng, ctx: {"params": {"limit": 50}}),
+        Scenario("feedback_list_deep", "GET", "/api/feedback/", role="user", build=_deep_page),
+        Scenario("moderator_feedbacks", "GET", "/api/moderator/feedbacks", role="moderator",
+                 build=lambda rng, ctx: {"params": {"limit": 50}}),
+        Scenario("moderator_search", "GET", "/api/moderator/feedbacks/search", role="moderator",
+                 build=_search, postgres_only=True),
+        Scenario("moderator_stats", "GET", "/api/moderator/feedbacks/stats", role="moderator",
+                 build=lambda rng, ctx: {"params": {"days": 30, "top": 10}}, postgres_only=True),
+        Scenario("admin_users", "GET", "/api/admin/users", role="admin"),
+        Scenario("admin_users_filtered", "GET", "/api/admin/users", role="admin", build=_admin_filter),
+    )
+}
+
+DEFAULT_SCENARIOS = (
+    "auth_token",
+    "users_me",
+    "feedback_create",
+    "feedback_list",
+    "feedback_list_deep",
+    "moderator_feedbacks",
+    "moderator_search",
+    "moderator_stats",
+    "admin_users",
+    "admin_users_filtered",
+)
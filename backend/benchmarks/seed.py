@@ -0,0 +1,101 @@
+# backend/benchmarks/seed.py
+# Подготовка схемы и тестовых данных для бенчмарков
+import random
+
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.security import pwd_context
+from app.db.database import Base
+from app.db.models import DBUser, UserRole
+from app.db.queries import insert_feedback_rows
+from benchmarks import sqlite_compat
+
+# Пароль всех тестовых пользователей: bcrypt считается один раз на весь сид
+PASSWORD = "benchmark-password"
+ADMIN_USERNAME = "bench_admin"
+MODERATOR_USERNAME = "bench_moderator"
+USER_PREFIX = "bench_user_"
+
+BATCH_SIZE = 5000
+
+WORDS = (
+    "отличный сервис быстро ответили спасибо проблема заказ доставка оплата "
+    "приложение ошибка вход пароль поддержка долго website login error slow fast"
+).split()
+
+
+def check_drop_allowed(database_url: str, drop: bool) -> None:
+    """
+    seed() удаляет все таблицы. Без явного drop это разрешено только для SQLite
+    и для баз, в имени которых есть "bench" - чтобы случайно не стереть рабочую БД.
+    """
+    url = make_url(database_url)
+    if drop or url.get_backend_name() == "sqlite" or "bench" in (url.database or "").lower():
+        return
+    raise RuntimeError(
+        f"Refusing to drop and recreate the schema of database {url.database!r}: "
+        f"use a database whose name contains 'bench' or pass --drop"
+    )
+
+
+def username(index: int) -> str:
+    return f"{USER_PREFIX}{index}"
+
+
+def _message(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30)))
+
+
+async def seed(database_url: str, users: int, feedback: int, seed_value: int = 42, drop: bool = False) -> dict:
+    """
+    Пересоздает схему и заполняет ее: админ, модератор, users обычных пользователей
+    и feedback отзывов. Данные детерминированы (seed_value), чтобы прогоны были сравнимы.
+    drop - разрешить пересоздание схемы в базе, не похожей на бенчмарочную (check_drop_allowed).
+    """
+    check_drop_allowed(database_url, drop)
+    rng = random.Random(seed_value)
+    engine = create_async_engine(database_url)
+    sqlite_compat.install(engine)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+        hashed = pwd_context.hash(PASSWORD)
+        user_rows = [
+            {"username": ADMIN_USERNAME, "email": "admin@bench.io", "hashed_password": hashed,
+             "role": UserRole.ADMIN, "is_active": True},
+            {"username": MODERATOR_USERNAME, "email": "moderator@bench.io", "hashed_password": hashed,
+             "role": UserRole.MODERATOR, "is_active": True},
+        ]
+        user_rows += [
+            {"username": username(i), "email": f"user{i}@bench.io", "hashed_password": hashed,
+             "role": UserRole.USER, "is_active": True}
+            for i in range(users)
+        ]
+
+        async with AsyncSession(engine) as session:
+            for start in range(0, len(user_rows), BATCH_SIZE):
+                await session.execute(insert(DBUser), user_rows[start:start + BATCH_SIZE])
+            await session.commit()
+
+            for start in range(0, feedback, BATCH_SIZE):
+                count = min(BATCH_SIZE, feedback - start)
+                rows = [
+                    {
+                        "name": f"Bench {start + i}",
+                        "message": _message(rng),
+                        "email": f"user{rng.randrange(max(users, 1))}@bench.io",
+                        "phone": f"+7900{rng.randrange(10**7):07d}",
+                    }
+                    for i in range(count)
+                ]
+                # Тот же путь записи, что и у API (INSERT ... RETURNING или COPY)
+                await insert_feedback_rows(session, rows)
+                await session.commit()
+    finally:
+        await engine.dispose()
+
+    return {"users": users, "feedback": feedback, "seed": seed_value}
@@ -0,0 +1,114 @@
+# backend/benchmarks/serialization.py
+# CPU на сериализацию одного ответа: путь FastAPI по умолчанию против быстрого пути
+import asyncio
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert, select
+
+from app.api.responses import json_response
+from app.db.models import DBUser, UserResponse, UserRole
+from app.db.queries import USER_COLUMNS
+from benchmarks.seed import WORDS
+
+
+def _rows(count: int):
+    """Настоящие строки SQLAlchemy (Row) из SQLite в памяти - как их возвращает запрос."""
+    engine = create_engine("sqlite://")
+    DBUser.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(DBUser), [
+            {"username": f"user_{i}", "email": f"user{i}@bench.io", "hashed_password": "x" * 60,
+             "role": UserRole.USER, "is_active": True}
+            for i in range(count)
+        ])
+        users = conn.execute(select(*USER_COLUMNS)).all()
+    feedback = [
+        {"id": i, "name": f"Bench {i}", "message": " ".join(WORDS[(i + j) % len(WORDS)] for j in range(20)),
+         "email": f"user{i}@bench.io", "phone": "+79000000000"}
+        for i in range(count)
+    ]
+    engine.dispose()
+    return users, feedback
+
+
+def build_app(count: int) -> FastAPI:
+    """Приложение с парами эндпоинтов: прежняя сериализация и быстрый путь на одних и тех же данных."""
+    users, feedback = _rows(count)
+    orm_users = [
+        DBUser(id=row.id, username=row.username, email=row.email, role=row.role, is_active=row.is_active)
+        for row in users
+    ]
+    page = {"items": feedback, "next_cursor": count, "limit": count}
+
+    app = FastAPI()
+
+    @app.get("/users/default", response_model=list[UserResponse])
+    async def users_default():
+        # Как было: ORM-объекты -> UserResponse на каждую строку -> JSON
+        return orm_users
+
+    @app.get("/users/fast", response_model=list[UserResponse])
+    async def users_fast():
+        return json_response([row._asdict() for row in users])
+
+    @app.get("/feedback/default")
+    async def feedback_default():
+        # Как было: dict -> jsonable_encoder -> json.dumps
+        return page
+
+    @app.get("/feedback/fast")
+    async def feedback_fast():
+        return json_response(page)
+
+    return app
+
+
+async def _call(app, path: str) -> bytes:
+    """Один запрос напрямую через ASGI, без сети и HTTP-клиента."""
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def _measure(app, path: str, iterations: int) -> dict:
+    size = len(await _call(app, path))  # прогрев
+    started = time.process_time()
+    for _ in range(iterations):
+        await _call(app, path)
+    cpu = time.process_time() - started
+    return {"cpu_ms_per_response": round(cpu / iterations * 1000, 4), "response_bytes": size}
+
+
+async def _run(rows: int, iterations: int) -> dict:
+    app = build_app(rows)
+    results = {}
+    for name in ("users", "feedback"):
+        default = await _measure(app, f"/{name}/default", iterations)
+        fast = await _measure(app, f"/{name}/fast", iterations)
+        results[name] = {
+            "default": default,
+            "fast": fast,
+            "cpu_reduction_percent": round(
+                (1 - fast["cpu_ms_per_response"] / default["cpu_ms_per_response"]) * 100, 1
+            ) if default["cpu_ms_per_response"] else 0.0,
+        }
+    return results
+
+
+def run(rows: int = 500, iterations: int = 200) -> dict:
+    """CPU-время процесса на один ответ со списком из rows записей."""
+    return asyncio.run(_run(rows, iterations))
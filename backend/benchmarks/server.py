@@ -0,0 +1,9 @@
+# backend/benchmarks/server.py
+# Точка входа uvicorn для бенчмарков: то же приложение, но с поддержкой SQLite
+from benchmarks import sqlite_compat
+from app.db.database import engine
+from app.main import app
+
+sqlite_compat.install(engine)
+
+__all__ = ["app"]
@@ -0,0 +1,32 @@
+# backend/benchmarks/sqlite_compat.py
+# Запуск моделей на SQLite: PostgreSQL-специфичные типы и функции заменяются заглушками
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.compiler import compiles
+
+
+@compiles(TSVECTOR, "sqlite")
+def _compile_tsvector(type_, compiler, **kw):
+    # Вычисляемая колонка search_vector хранится как обычный текст
+    return "TEXT"
+
+
+def _to_tsvector(config, document):
+    return (document or "").lower()
+
+
+def _setweight(vector, weight):
+    return vector
+
+
+def install(engine: AsyncEngine) -> None:
+    """Регистрирует на каждом соединении SQLite функции, которых нет вне PostgreSQL."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _register_functions(dbapi_connection, connection_record):
+        # deterministic=True обязателен для функций в вычисляемых колонках
+        dbapi_connection.create_function("to_tsvector", 2, _to_tsvector, deterministic=True)
+        dbapi_connection.create_function("setweight", 2, _setweight, deterministic=True)
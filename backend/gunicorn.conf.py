@@ -0,0 +1,23 @@
+# backend/gunicorn.conf.py
+# Хуки gunicorn для метрик Prometheus в многопроцессном режиме
+import os
+import shutil
+
+
+def on_starting(server):
+    # Число воркеров для приложения (settings.WEB_CONCURRENCY): кеш в памяти
+    # при нескольких воркерах отключается. Воркеры наследуют окружение мастера
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+
+    # Очищаем файлы метрик прошлого запуска, иначе счетчики продолжат старые значения
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Gauge умершего воркера больше не учитывается в livesum
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,53 @@
+# backend/tests/conftest.py
+# Приложение целиком на временной SQLite (как в бенчмарках), запросы - через httpx.ASGITransport
+import os
+import tempfile
+
+# Модули приложения читают настройки при импорте. База всегда временная:
+# тесты не должны попасть в DATABASE_URL из окружения разработчика
+_db_dir = tempfile.mkdtemp(prefix="fastapi-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_dir}/tests.db"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["STARTUP_DB_MODE"] = "create_all"
+os.environ["USER_CACHE_URL"] = ""
+os.environ["WEB_CONCURRENCY"] = "1"
+os.environ["FEEDBACK_WRITE_BEHIND"] = "false"
+os.environ["PROFILING_SAMPLE_RATE"] = "0"
+os.environ.setdefault("SECRET_KEY", "tests-secret-key")
+
+import httpx
+import pytest
+
+from app.db.database import engine
+from app.main import app
+from benchmarks import sqlite_compat
+from tests.utils import ADMIN_USERNAME, auth_headers, register
+
+sqlite_compat.install(engine)
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def client():
+    """Один экземпляр приложения на все тесты: lifespan (create_all, синхронизация отзывов токенов) и клиент."""
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            yield client
+    await engine.dispose()
+
+
+@pytest.fixture(scope="session")
+async def admin_headers(client):
+    await register(client, ADMIN_USERNAME, role="admin")
+    return await auth_headers(client, ADMIN_USERNAME)
+
+
+@pytest.fixture(scope="session")
+async def moderator_headers(client):
+    await register(client, "moderator", role="moderator")
+    return await auth_headers(client, "moderator")
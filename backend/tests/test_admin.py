@@ -0,0 +1,150 @@
+# backend/tests/test_admin.py
+import pytest
+
+from tests.utils import auth_headers, expect_queries, register, unique_username
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_admin_endpoints_require_admin(client):
+    username = unique_username()
+    await register(client, username)
+    headers = await auth_headers(client, username)
+    with expect_queries(0):
+        response = await client.get("/api/admin/users", headers=headers)
+    assert response.status_code == 403
+
+
+async def test_list_users(client, admin_headers):
+    prefix = unique_username("listed")
+    for index in range(3):
+        await register(client, f"{prefix}_{index}")
+    with expect_queries(1):
+        response = await client.get(
+            "/api/admin/users", headers=admin_headers, params={"username_prefix": prefix, "limit": 2},
+        )
+    assert response.status_code == 200
+    page = response.json()
+    assert [user["username"] for user in page["items"]] == [f"{prefix}_0", f"{prefix}_1"]
+    assert page["next_cursor"]
+    with expect_queries(1):
+        response = await client.get("/api/admin/users", headers=admin_headers, params={
+            "username_prefix": prefix, "limit": 2, "cursor": page["next_cursor"],
+        })
+    assert [user["username"] for user in response.json()["items"]] == [f"{prefix}_2"]
+    assert response.json()["next_cursor"] is None
+
+
+async def test_get_user_is_cached(client, admin_headers):
+    user = await register(client, unique_username())
+    with expect_queries(1):
+        response = await client.get(f"/api/admin/users/{user['id']}", headers=admin_headers)
+    assert response.json() == user
+    with expect_queries(0):
+        response = await client.get(f"/api/admin/users/{user['id']}", headers=admin_headers)
+    assert response.json() == user
+
+
+async def test_get_missing_user(client, admin_headers):
+    with expect_queries(1):
+        response = await client.get("/api/admin/users/999999", headers=admin_headers)
+    assert response.status_code == 404
+
+
+async def test_update_user_revokes_tokens(client, admin_headers):
+    username = unique_username()
+    user = await register(client, username)
+    user_headers = await auth_headers(client, username)
+    await client.get(f"/api/admin/users/{user['id']}", headers=admin_headers)
+    # SELECT прежних значений, UPDATE ... RETURNING, INSERT в token_revocations
+    with expect_queries(3):
+        response = await client.put(f"/api/admin/users/{user['id']}", headers=admin_headers, json={"role": "moderator"})
+    assert response.status_code == 200
+    assert response.json()["role"] == "moderator"
+    # Кеш сброшен после COMMIT, токен со старой ролью отклоняется
+    with expect_queries(1):
+        response = await client.get(f"/api/admin/users/{user['id']}", headers=admin_headers)
+    assert response.json()["role"] == "moderator"
+    assert (await client.get("/api/users/me", headers=user_headers)).status_code == 401
+    moderator_headers = await auth_headers(client, username)
+    assert (await client.get("/api/moderator/feedbacks", headers=moderator_headers)).status_code == 200
+
+
+async def test_deactivate_user(client, admin_headers):
+    username = unique_username()
+    user = await register(client, username)
+    response = await client.put(f"/api/admin/users/{user['id']}", headers=admin_headers, json={"is_active": False})
+    assert response.json()["is_active"] is False
+    assert response.json()["role"] == "user"
+    login = await client.post("/auth/token", data={"username": username, "password": "test-password"})
+    assert login.status_code == 400
+
+
+async def test_deactivate_moderator_keeps_role(client, admin_headers):
+    username = unique_username()
+    user = await register(client, username, role="moderator")
+    # Пропущенные поля не меняются: роль остается moderator
+    response = await client.put(f"/api/admin/users/{user['id']}", headers=admin_headers, json={"is_active": False})
+    assert response.status_code == 200
+    assert response.json() == {**user, "is_active": False}
+    response = await client.put(f"/api/admin/users/{user['id']}", headers=admin_headers, json={"is_active": True})
+    assert response.json()["role"] == "moderator"
+    assert (await client.post("/auth/token", data={"username": username, "password": "test-password"})).status_code == 200
+
+
+async def test_update_user_without_changes(client, admin_headers):
+    user = await register(client, unique_username())
+    with expect_queries(1):
+        response = await client.put(f"/api/admin/users/{user['id']}", headers=admin_headers, json={})
+    assert response.json() == user
+
+
+async def test_update_missing_user(client, admin_headers):
+    response = await client.put("/api/admin/users/999999", headers=admin_headers, json={"role": "user"})
+    assert response.status_code == 404
+    response = await client.put("/api/admin/users/999999", headers=admin_headers, json={})
+    assert response.status_code == 404
+
+
+async def test_delete_user(client, admin_headers):
+    username = unique_username()
+    user = await register(client, username)
+    user_headers = await auth_headers(client, username)
+    # SELECT, DELETE, INSERT в token_revocations
+    with expect_queries(3):
+        response = await client.delete(f"/api/admin/users/{user['id']}", headers=admin_headers)
+    assert response.status_code == 200
+    assert (await client.get(f"/api/admin/users/{user['id']}", headers=admin_headers)).status_code == 404
+    assert (await client.get("/api/users/me", headers=user_headers)).status_code == 401
+
+
+async def test_bulk_update_users(client, admin_headers):
+    users = [await register(client, unique_username()) for _ in range(5)]
+    ids = [user["id"] for user in users]
+    # Одна команда UPDATE ... RETURNING на все строки и одна вставка в token_revocations
+    with expect_queries(2):
+        response = await client.post("/api/admin/users/bulk", headers=admin_headers, json={
+            "ids": ids, "action": "update", "is_active": False,
+        })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["affected"] == 5
+    assert all(user["is_active"] is False for user in body["users"])
+
+
+async def test_bulk_delete_users(client, admin_headers):
+    users = [await register(client, unique_username()) for _ in range(3)]
+    ids = [user["id"] for user in users]
+    with expect_queries(2):
+        response = await client.post("/api/admin/users/bulk", headers=admin_headers, json={
+            "ids": ids, "action": "delete",
+        })
+    assert response.json()["affected"] == 3
+    for user_id in ids:
+        assert (await client.get(f"/api/admin/users/{user_id}", headers=admin_headers)).status_code == 404
+
+
+async def test_bulk_requires_selector(client, admin_headers):
+    with expect_queries(0):
+        response = await client.post("/api/admin/users/bulk", headers=admin_headers, json={"is_active": False})
+    assert response.status_code == 422
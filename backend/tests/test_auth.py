@@ -0,0 +1,68 @@
+# backend/tests/test_auth.py
+import pytest
+
+from tests.utils import PASSWORD, auth_headers, expect_queries, register, unique_username
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_register(client):
+    username = unique_username()
+    # INSERT ... ON CONFLICT DO NOTHING RETURNING
+    with expect_queries(1):
+        response = await client.post("/auth/register", json={
+            "username": username, "email": f"{username}@example.com", "password": PASSWORD,
+        })
+    assert response.status_code == 200
+    assert response.json()["username"] == username
+    assert response.json()["role"] == "user"
+    assert response.json()["is_active"] is True
+
+
+async def test_register_duplicate_username(client):
+    username = unique_username()
+    await register(client, username)
+    with expect_queries(1):
+        response = await client.post("/auth/register", json={
+            "username": username, "email": "other@example.com", "password": PASSWORD,
+        })
+    assert response.status_code == 400
+
+
+async def test_login(client):
+    username = unique_username()
+    await register(client, username)
+    with expect_queries(1):
+        response = await client.post("/auth/token", data={"username": username, "password": PASSWORD})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["token_type"] == "bearer"
+    assert body["refresh_token"]
+
+
+async def test_login_wrong_password(client):
+    username = unique_username()
+    await register(client, username)
+    with expect_queries(1):
+        response = await client.post("/auth/token", data={"username": username, "password": "wrong"})
+    assert response.status_code == 401
+
+
+async def test_refresh(client):
+    username = unique_username()
+    await register(client, username)
+    tokens = (await client.post("/auth/token", data={"username": username, "password": PASSWORD})).json()
+    with expect_queries(1):
+        response = await client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert (await client.get("/api/users/me", headers=headers)).json()["username"] == username
+
+
+async def test_access_token_is_not_a_refresh_token(client):
+    username = unique_username()
+    await register(client, username)
+    headers = await auth_headers(client, username)
+    access_token = headers["Authorization"].split()[1]
+    response = await client.post("/auth/refresh", json={"refresh_token": access_token})
+    assert response.status_code == 401
@@ -0,0 +1,141 @@
+# backend/tests/test_feedback.py
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import insert
+
+from app.api.endpoints.moderator import _feed_events
+from app.core.config import settings
+from app.db.database import async_session
+from app.db.feed import RESYNC, feedback_feed
+from app.db.models import DBFeedback
+from app.db.queries import fetch_feedback_by_ids
+from app.db.revocations import token_revocations
+from tests.utils import auth_headers, expect_queries, feedback_item, register, unique_username
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def user_headers(client):
+    username = unique_username()
+    await register(client, username)
+    return await auth_headers(client, username)
+
+
+async def test_create_feedback(client, user_headers):
+    with expect_queries(1):
+        response = await client.post("/api/feedback/", headers=user_headers, json=feedback_item(1))
+    assert response.status_code == 200
+    assert response.json()["name"] == "Tester 1"
+
+
+async def test_create_feedback_validation(client, user_headers):
+    with expect_queries(0):
+        response = await client.post("/api/feedback/", headers=user_headers, json={**feedback_item(1), "message": "short"})
+    assert response.status_code == 422
+
+
+async def test_bulk_feedback(client, user_headers):
+    items = [feedback_item(index) for index in range(5)] + [{**feedback_item(5), "email": "not-an-email"}]
+    # Один многострочный INSERT ... RETURNING
+    with expect_queries(1):
+        response = await client.post("/api/feedback/bulk", headers=user_headers, json=items)
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["index"] for item in body["created"]] == [0, 1, 2, 3, 4]
+    ids = [item["id"] for item in body["created"]]
+    assert ids == sorted(ids)
+    assert [error["index"] for error in body["errors"]] == [5]
+
+
+async def test_feedback_list_pages(client, user_headers):
+    await client.post("/api/feedback/bulk", headers=user_headers, json=[feedback_item(index) for index in range(3)])
+    with expect_queries(1):
+        response = await client.get("/api/feedback/", headers=user_headers, params={"limit": 2})
+    assert response.status_code == 200
+    page = response.json()
+    assert len(page["items"]) == 2
+    assert page["next_cursor"] is not None
+    with expect_queries(1):
+        response = await client.get("/api/feedback/", headers=user_headers, params={"limit": 2, "after": page["next_cursor"]})
+    assert response.json()["items"][0]["id"] != page["items"][-1]["id"]
+
+
+async def test_moderator_feedback_list(client, moderator_headers, user_headers):
+    await client.post("/api/feedback/", headers=user_headers, json=feedback_item(1))
+    with expect_queries(1):
+        response = await client.get("/api/moderator/feedbacks", headers=moderator_headers, params={"limit": 5})
+    assert response.status_code == 200
+    assert response.json()["items"]
+    with expect_queries(0):
+        response = await client.get("/api/moderator/feedbacks", headers=user_headers)
+    assert response.status_code == 403
+
+
+async def test_search_requires_postgresql(client, moderator_headers):
+    response = await client.get("/api/moderator/feedbacks/search", headers=moderator_headers, params={"q": "message"})
+    assert response.status_code == 501
+
+
+async def test_delete_feedback(client, moderator_headers, user_headers):
+    created = await client.post("/api/feedback/bulk", headers=user_headers, json=[feedback_item(1)])
+    feedback_id = created.json()["created"][0]["id"]
+    with expect_queries(0):
+        response = await client.delete(f"/api/feedback/{feedback_id}", headers=user_headers)
+    assert response.status_code == 403
+    with expect_queries(1):
+        response = await client.delete(f"/api/feedback/{feedback_id}", headers=moderator_headers)
+    assert response.status_code == 200
+    response = await client.delete(f"/api/feedback/{feedback_id}", headers=moderator_headers)
+    assert response.status_code == 404
+
+
+async def _next_event(events):
+    try:
+        return await events.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def test_live_feed_closes_on_revocation(client, monkeypatch):
+
+    monkeypatch.setattr(settings, "FEEDBACK_FEED_HEARTBEAT_SECONDS", 0.05)
+    user = await register(client, unique_username())
+    events = _feed_events(None, {"id": user["id"], "token_version": 0}, time.time() + 60)
+    assert await _next_event(events) == b": ping\n\n"
+    token_revocations.apply([(user["id"], 1)])
+    assert await _next_event(events) is None
+
+
+async def test_live_feed_closes_when_token_expires(client, monkeypatch):
+
+    monkeypatch.setattr(settings, "FEEDBACK_FEED_HEARTBEAT_SECONDS", 60)
+    user = await register(client, unique_username())
+    events = _feed_events(None, {"id": user["id"], "token_version": 0}, time.time() + 0.1)
+    # Закрывается по сроку действия токена, не дожидаясь heartbeat
+    assert await _next_event(events) is None
+
+
+async def test_live_feed_resync_sends_late_commits(client):
+    user = await register(client, unique_username())
+    events = _feed_events(None, {"id": user["id"], "token_version": 0}, time.time() + 60)
+    pending = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0.1)
+    queue = next(iter(feedback_feed._subscribers))
+
+    async with async_session() as session:
+        ids = [(await session.execute(insert(DBFeedback).values(feedback_item(index)).returning(DBFeedback.id))).scalar()
+               for index in range(2)]
+        await session.commit()
+        rows = await fetch_feedback_by_ids(session, ids)
+    # Второй отзыв пришел через NOTIFY раньше первого (первая транзакция закоммитилась позже)
+    await queue.put([rows[1]])
+    assert b"id: %d\n" % ids[1] in await pending
+    # Досылка из БД находит первый отзыв, хотя его id меньше уже отправленного, и не повторяет второй
+    await queue.put(RESYNC)
+    chunk = await events.__anext__()
+    assert b"id: %d\n" % ids[0] in chunk
+    assert b"id: %d\n" % ids[1] not in chunk
+    await events.aclose()
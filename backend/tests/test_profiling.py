@@ -0,0 +1,73 @@
+# backend/tests/test_profiling.py
+import asyncio
+
+import pytest
+
+from app.core.profiling import ProfilingMiddleware, RequestProfiler
+
+pytestmark = pytest.mark.anyio
+
+
+def _profiler(directory, max_seconds: float = 30) -> RequestProfiler:
+    # Профилируется каждый запрос
+    return RequestProfiler(
+        directory=str(directory), max_files=10, sample_rate=1, header_enabled=False, interval=0.001,
+        max_seconds=max_seconds,
+    )
+
+
+def _streaming_app(media_type: bytes, release: asyncio.Event):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", media_type)]})
+        await send({"type": "http.response.body", "body": b"first", "more_body": True})
+        # Поток продолжается, пока тест его не отпустит
+        await release.wait()
+        await send({"type": "http.response.body", "body": b"last"})
+    return app
+
+
+async def _request(middleware) -> list:
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/stream", "headers": []}
+    await middleware(scope, receive, send)
+    return sent
+
+
+@pytest.mark.parametrize(
+    "media_type, max_seconds, truncated",
+    [(b"text/event-stream", 30, "event-stream"), (b"text/csv", 0, "max-seconds")],
+)
+async def test_streaming_response_profile_is_saved_before_stream_ends(tmp_path, media_type, max_seconds, truncated):
+    profiler = _profiler(tmp_path, max_seconds)
+    release = asyncio.Event()
+    request = asyncio.ensure_future(_request(ProfilingMiddleware(_streaming_app(media_type, release), profiler)))
+    await asyncio.sleep(0.2)
+
+    # Поток еще открыт, а профилировщик уже свободен и профиль записан
+    assert not request.done()
+    assert not profiler.active
+    [profile] = profiler.list_profiles()
+    assert profile["truncated"] == truncated
+    assert profile["status"] == 200
+
+    release.set()
+    sent = await request
+    assert (b"x-profile-id", profile["id"].encode()) in sent[0]["headers"]
+    assert len(profiler.list_profiles()) == 1
+
+
+async def test_regular_response_is_profiled_to_the_end(tmp_path):
+    profiler = _profiler(tmp_path)
+    release = asyncio.Event()
+    release.set()
+    await _request(ProfilingMiddleware(_streaming_app(b"application/json", release), profiler))
+    [profile] = profiler.list_profiles()
+    assert profile["truncated"] is None
+    assert profiler.profiled == 1
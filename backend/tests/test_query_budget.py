@@ -0,0 +1,43 @@
+# backend/tests/test_query_budget.py
+import logging
+
+import pytest
+
+from app.core.config import settings
+from app.db.database import QueryStats, assert_max_queries, check_query_budget
+from tests.utils import auth_headers, expect_queries, feedback_item, register, unique_username
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bulk_feedback_is_one_statement(client, caplog):
+    # SQLite не выполняет пачку по одному INSERT на строку: нет ни превышения бюджета, ни N+1
+    username = unique_username()
+    await register(client, username)
+    headers = await auth_headers(client, username)
+    items = [feedback_item(index) for index in range(300)]
+    with caplog.at_level(logging.WARNING, logger="app.db.database"):
+        with expect_queries(1):
+            response = await client.post("/api/feedback/bulk", headers=headers, json=items)
+    assert response.status_code == 200
+    ids = [item["id"] for item in response.json()["created"]]
+    assert len(ids) == 300
+    assert ids == list(range(ids[0], ids[0] + 300))
+    assert not caplog.records
+
+
+async def test_assert_max_queries_fails_over_limit(client, admin_headers):
+    with pytest.raises(AssertionError, match="GET /api/admin/users/{user_id}"):
+        with assert_max_queries(0):
+            await client.get("/api/admin/users/999999", headers=admin_headers)
+
+
+def test_check_query_budget_reports_n_plus_one(caplog):
+    stats = QueryStats()
+    stats.count = settings.DB_QUERY_BUDGET + 1
+    stats.statements["SELECT users.id FROM users WHERE users.id = ?"] = [settings.DB_QUERY_BUDGET + 1, 0.0]
+    with caplog.at_level(logging.WARNING, logger="app.db.database"):
+        check_query_budget(stats)
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("бюджет" in message for message in messages)
+    assert any("N+1" in message for message in messages)
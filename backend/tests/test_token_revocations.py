@@ -0,0 +1,56 @@
+# backend/tests/test_token_revocations.py
+import pytest
+from sqlalchemy import insert, update
+
+from app.api import dependencies
+from app.db.database import async_session
+from app.db.models import DBTokenRevocation, DBUser
+from app.db.revocations import TokenRevocations, token_revocations
+from tests.utils import auth_headers, expect_queries, metric, register, unique_username
+
+pytestmark = pytest.mark.anyio
+
+
+async def _revoke_in_other_worker(user_id: int) -> None:
+    # Та же запись, что делает админка, но без применения к таблице этого воркера
+    async with async_session() as session:
+        await session.execute(update(DBUser).where(DBUser.id == user_id).values(token_version=DBUser.token_version + 1))
+        await session.execute(insert(DBTokenRevocation).values(user_id=user_id, token_version=1))
+        await session.commit()
+
+
+async def test_sync_picks_up_revocations_from_other_workers(client):
+    username = unique_username()
+    user = await register(client, username)
+    headers = await auth_headers(client, username)
+    assert (await client.get("/api/users/me", headers=headers)).status_code == 200
+
+    await _revoke_in_other_worker(user["id"])
+    # До синхронизации этот воркер об отзыве не знает
+    assert (await client.get("/api/users/me", headers=headers)).status_code == 200
+
+    rejected = await metric(client, "token_revocations_rejected_total")
+    await token_revocations.sync()
+    # Отказ - по таблице в памяти воркера, без запросов к БД
+    with expect_queries(0):
+        response = await client.get("/api/users/me", headers=headers)
+    assert response.status_code == 401
+    assert await metric(client, "token_revocations_rejected_total") == rejected + 1
+    assert await metric(client, 'token_revocations_syncs_total{result="ok"}') >= 1
+    assert (await client.post("/auth/token", data={"username": username, "password": "test-password"})).status_code == 200
+
+
+async def test_new_worker_loads_revocations_on_start(client, admin_headers, monkeypatch):
+    username = unique_username()
+    user = await register(client, username)
+    headers = await auth_headers(client, username)
+    await client.put(f"/api/admin/users/{user['id']}", headers=admin_headers, json={"role": "moderator"})
+
+    # Пустая таблица, как у только что запущенного воркера: первая синхронизация читает все свежие отзывы
+    fresh = TokenRevocations(sync_interval=token_revocations.sync_interval, retention=token_revocations.retention)
+    monkeypatch.setattr(dependencies, "token_revocations", fresh)
+    assert (await client.get("/api/users/me", headers=headers)).status_code == 200
+    await fresh.sync()
+    with expect_queries(0):
+        response = await client.get("/api/users/me", headers=headers)
+    assert response.status_code == 401
@@ -0,0 +1,127 @@
+# backend/tests/test_user_cache.py
+import pytest
+
+from app.core.cache import InMemoryCacheBackend, user_cache
+from tests.utils import auth_headers, expect_queries, register, unique_username
+
+pytestmark = pytest.mark.anyio
+
+
+class SharedCacheStandIn:
+    """
+    Замена RedisCacheBackend в тестах: тот же интерфейс, данные в словарях.
+    on_generation вызывается после чтения поколения - имитация записи, завершившейся,
+    пока читатель ждет БД.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.generations = {}
+        self.on_generation = None
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ttl):
+        self.values[key] = value
+
+    async def delete(self, keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    async def generation(self, key):
+        generation = str(self.generations.get(key, 0))
+        if self.on_generation is not None:
+            callback, self.on_generation = self.on_generation, None
+            await callback()
+        return generation
+
+    async def bump_generations(self, keys):
+        for key in keys:
+            self.generations[key] = self.generations.get(key, 0) + 1
+
+    async def set_if_generation(self, generation_key, generation, keys, value, ttl):
+        if str(self.generations.get(generation_key, 0)) == generation:
+            for key in keys:
+                self.values[key] = value
+
+    def stats(self):
+        return {"backend": "stand-in", "size": len(self.values)}
+
+
+@pytest.fixture
+def shared_cache():
+    backend = SharedCacheStandIn()
+    previous, user_cache.backend = user_cache.backend, backend
+    yield backend
+    user_cache.backend = previous
+
+
+async def test_update_me_invalidates(client, shared_cache):
+    username = unique_username()
+    user = await register(client, username)
+    headers = await auth_headers(client, username)
+    await client.get("/api/users/me", headers=headers)
+    assert f"user:name:{username}" in shared_cache.values
+
+    await client.put("/api/users/me", headers=headers, json={"email": f"new_{username}@example.com"})
+    assert f"user:name:{username}" not in shared_cache.values
+    assert f"user:id:{user['id']}" not in shared_cache.values
+    with expect_queries(1):
+        me = await client.get("/api/users/me", headers=headers)
+    assert me.json()["email"] == f"new_{username}@example.com"
+
+
+async def test_admin_rename_invalidates_old_and_new_username(client, admin_headers, shared_cache):
+    username = unique_username()
+    user = await register(client, username)
+    await client.get(f"/api/admin/users/{user['id']}", headers=admin_headers)
+    assert f"user:id:{user['id']}" in shared_cache.values
+    assert f"user:name:{username}" in shared_cache.values
+
+    new_username = unique_username("renamed")
+    response = await client.put(f"/api/admin/users/{user['id']}", headers=admin_headers, json={"username": new_username})
+    assert response.status_code == 200
+    assert f"user:id:{user['id']}" not in shared_cache.values
+    assert f"user:name:{username}" not in shared_cache.values
+    with expect_queries(1):
+        response = await client.get(f"/api/admin/users/{user['id']}", headers=admin_headers)
+    assert response.json()["username"] == new_username
+
+
+async def test_admin_delete_invalidates(client, admin_headers, shared_cache):
+    user = await register(client, unique_username())
+    await client.get(f"/api/admin/users/{user['id']}", headers=admin_headers)
+    assert f"user:id:{user['id']}" in shared_cache.values
+
+    await client.delete(f"/api/admin/users/{user['id']}", headers=admin_headers)
+    assert f"user:id:{user['id']}" not in shared_cache.values
+    assert (await client.get(f"/api/admin/users/{user['id']}", headers=admin_headers)).status_code == 404
+
+
+async def test_stale_fill_is_not_stored(client, admin_headers, shared_cache):
+    user = await register(client, unique_username())
+
+    async def concurrent_update():
+        # Запись и сброс кеша после COMMIT произошли между чтением поколения и SELECT читателя
+        await user_cache.invalidate(user["id"], user["username"])
+
+    shared_cache.on_generation = concurrent_update
+    response = await client.get(f"/api/admin/users/{user['id']}", headers=admin_headers)
+    assert response.status_code == 200
+    assert f"user:id:{user['id']}" not in shared_cache.values
+    # Следующий читатель берет новое поколение и заполняет кеш
+    await client.get(f"/api/admin/users/{user['id']}", headers=admin_headers)
+    assert f"user:id:{user['id']}" in shared_cache.values
+
+
+async def test_in_memory_generation_survives_eviction():
+    backend = InMemoryCacheBackend(maxsize=2, ttl=60)
+    generation = await backend.generation("user:gen:1")
+    await backend.bump_generations(["user:gen:1"])
+    # Записи других пользователей вытесняют все, что было в LRU, - но не счетчики поколений
+    for user_id in range(2, 10):
+        await backend.set(f"user:id:{user_id}", "{}", 60)
+        await backend.bump_generations([f"user:gen:{user_id}"])
+    await backend.set_if_generation("user:gen:1", generation, ["user:id:1"], '{"stale": true}', 60)
+    assert await backend.get("user:id:1") is None
@@ -0,0 +1,45 @@
+# backend/tests/test_users.py
+import pytest
+
+from tests.utils import auth_headers, expect_queries, register, unique_username
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_me_is_cached(client):
+    username = unique_username()
+    await register(client, username)
+    headers = await auth_headers(client, username)
+    with expect_queries(1):
+        response = await client.get("/api/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == username
+    # Повторный запрос - из кеша профилей, без БД
+    with expect_queries(0):
+        cached = await client.get("/api/users/me", headers=headers)
+    assert cached.json() == response.json()
+
+
+async def test_me_requires_token(client):
+    with expect_queries(0):
+        response = await client.get("/api/users/me")
+    assert response.status_code == 401
+
+
+async def test_update_me_invalidates_cache(client):
+    username = unique_username()
+    await register(client, username)
+    headers = await auth_headers(client, username)
+    await client.get("/api/users/me", headers=headers)
+    # SQLite: SELECT прежних значений и UPDATE ... RETURNING; пароль хешируется до обращения к БД
+    with expect_queries(2):
+        response = await client.put("/api/users/me", headers=headers, json={
+            "email": f"new_{username}@example.com", "password": "new-password",
+        })
+    assert response.status_code == 200
+    assert response.json()["email"] == f"new_{username}@example.com"
+    with expect_queries(1):
+        me = await client.get("/api/users/me", headers=headers)
+    assert me.json()["email"] == f"new_{username}@example.com"
+    login = await client.post("/auth/token", data={"username": username, "password": "new-password"})
+    assert login.status_code == 200
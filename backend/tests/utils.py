@@ -0,0 +1,66 @@
+# backend/tests/utils.py
+# Помощники тестов: пользователи, токены, метрики и точное число SQL-запросов на HTTP-запрос
+import itertools
+import re
+from contextlib import contextmanager
+
+from app.db.database import assert_max_queries
+
+PASSWORD = "test-password"
+ADMIN_USERNAME = "admin"
+
+_usernames = itertools.count(1)
+
+
+def unique_username(prefix: str = "user") -> str:
+    """Тесты используют одну БД, поэтому у каждого теста свои пользователи."""
+    return f"{prefix}_{next(_usernames)}"
+
+
+async def register(client, username: str, role: str = "user") -> dict:
+    response = await client.post("/auth/register", json={
+        "username": username, "email": f"{username}@example.com", "password": PASSWORD, "role": role,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def auth_headers(client, username: str) -> dict:
+    response = await client.post("/auth/token", data={"username": username, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def feedback_item(index: int) -> dict:
+    return {
+        "name": f"Tester {index}",
+        "message": f"Feedback message number {index}",
+        "email": f"tester{index}@example.com",
+        "phone": "+79001234567",
+    }
+
+
+async def metric(client, sample: str) -> float:
+    """Значение метрики из /api/metrics; sample - имя с метками, как в ответе: name{label="value"}."""
+    response = await client.get("/api/metrics")
+    assert response.status_code == 200
+    match = re.search(rf"^{re.escape(sample)} (\S+)$", response.text, re.MULTILINE)
+    assert match, f"{sample} is not exported"
+    return float(match.group(1))
+
+
+@contextmanager
+def expect_queries(count: int):
+    """
+    Каждый HTTP-запрос внутри блока выполняет ровно count SQL-запросов.
+    Больше - AssertionError из assert_max_queries с маршрутом и самыми частыми запросами,
+    меньше - тоже ошибка: предел в тесте нужно уменьшить.
+
+        with expect_queries(3):
+            await client.put(f"/api/admin/users/{user_id}", ...)
+    """
+    with assert_max_queries(count) as requests:
+        yield requests
+    assert requests, "No HTTP requests were made inside expect_queries"
+    for stats in requests:
+        assert stats.count == count, f"{stats.route}: {stats.count} SQL queries, expected {count}\n{stats.top(limit=20)}"
@@ -0,0 +1,35 @@
+#!/bin/sh
+# Сборка статики: хеш содержимого в именах CSS/JS и предварительно сжатые копии (.gz).
+# Использование: ./build.sh [исходный каталог] [каталог результата]
+set -eu
+
+SRC="${1:-public}"
+DIST="${2:-dist}"
+
+rm -rf "$DIST"
+mkdir -p "$DIST"
+cp -R "$SRC"/. "$DIST"/
+
+# style.css -> style.3f2a9c1b.css; ссылки в HTML переписываются на новые имена.
+# Имя меняется вместе с содержимым, поэтому такие файлы можно кешировать «навсегда»
+find "$DIST" -type f \( -name '*.css' -o -name '*.js' \) | while read -r file; do
+    hash=$(sha256sum "$file" | cut -c1-8)
+    dir=$(dirname "$file")
+    name=$(basename "$file")
+    hashed="${name%.*}.${hash}.${name##*.}"
+    mv "$file" "$dir/$hashed"
+
+    rel="${file#"$DIST"/}"
+    url="/$rel"
+    hashed_url="${url%/*}/$hashed"
+    find "$DIST" -type f -name '*.html' -exec sed -i "s#\"$url\"#\"$hashed_url\"#g" {} +
+    echo "  $url -> $hashed_url"
+done
+
+# Сжатые копии рядом с оригиналами: nginx (gzip_static) отдает их без сжатия на лету
+find "$DIST" -type f \( -name '*.html' -o -name '*.css' -o -name '*.js' -o -name '*.svg' -o -name '*.json' \) |
+while read -r file; do
+    gzip -9 -n -k -f "$file"
+done
+
+echo "✅ Static assets built in $DIST"
@@ -93,7 +93,39 @@ function updateAuthStatus() {
 }
 
 // ==================== API функции ====================
-async function makeRequest(method, endpoint, body = null) {
+function saveTokens(data) {
+    localStorage.setItem('token', data.access_token);
+    if (data.refresh_token) {
+        localStorage.setItem('refreshToken', data.refresh_token);
+    }
+}
+
+function clearTokens() {
+    localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
+}
+
+// access-токен живет недолго: при 401 один раз получаем новую пару по refresh-токену
+async function refreshTokens() {
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (!refreshToken) {
+        return false;
+    }
+    const response = await fetch('/auth/refresh', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken })
+    });
+    if (!response.ok) {
+        // Пользователь заблокирован или изменилась роль - нужен повторный вход
+        clearTokens();
+        return false;
+    }
+    saveTokens(await response.json());
+    return true;
+}
+
+async function makeRequest(method, endpoint, body = null, retried = false) {
     showLoading(true);
     console.log(`[makeRequest] Sending ${method} request to ${endpoint}`, body);
     
@@ -117,6 +149,10 @@ async function makeRequest(method, endpoint, body = null) {
         const response = await fetch(endpoint, options);
         console.log('[makeRequest] Received response:', response);
 
+        if (response.status === 401 && token && !retried && await refreshTokens()) {
+            return await makeRequest(method, endpoint, body, true);
+        }
+
         if (response.status === 204) {
             displayResponse({ message: 'Нет содержимого' }, 204);
             return null;
@@ -180,12 +216,12 @@ async function login() {
             throw new Error(data.detail || 'Ошибка входа');
         }
 
-        localStorage.setItem('token', data.access_token);
+        saveTokens(data);
         await getCurrentUser();
         displayResponse({ message: 'Вход выполнен успешно' });
     } catch (error) {
         console.error('[login] Error:', error);
-        localStorage.removeItem('token');
+        clearTokens();
         currentUser = null;
         updateAuthStatus();
         displayResponse({ error: error.message });
@@ -224,7 +260,7 @@ async function getCurrentUser() {
         return user;
     } catch (error) {
         console.error('[getCurrentUser] Error:', error);
-        localStorage.removeItem('token');
+        clearTokens();
         currentUser = null;
         updateAuthStatus();
         throw error;
@@ -232,7 +268,8 @@ async function getCurrentUser() {
 }
 
 function logout() {
-    localStorage.removeItem('token');
+    stopLiveFeed();
+    clearTokens();
     currentUser = null;
     updateAuthStatus();
     displayResponse({ message: 'Выход выполнен успешно' });
@@ -397,6 +434,90 @@ async function getAllFeedbacks() {
     }
 }
 
+// Лента новых отзывов (server-sent events). EventSource не умеет передавать заголовок
+// Authorization, поэтому поток читаем через fetch и сами разбираем события
+let liveFeed = null;
+
+function stopLiveFeed() {
+    if (liveFeed) {
+        liveFeed.abort();
+        liveFeed = null;
+    }
+    const button = document.getElementById('liveFeedButton');
+    if (button) {
+        button.textContent = 'Новые отзывы в реальном времени';
+    }
+}
+
+async function toggleLiveFeed() {
+    if (liveFeed) {
+        stopLiveFeed();
+        return;
+    }
+
+    const controller = new AbortController();
+    liveFeed = controller;
+    document.getElementById('liveFeedButton').textContent = 'Остановить ленту';
+    const received = [];
+    let lastEventId = null;
+
+    // При обрыве соединения переподключаемся и досылаем пропущенное по Last-Event-ID
+    while (liveFeed === controller) {
+        try {
+            const headers = { 'Authorization': `Bearer ${localStorage.getItem('token')}` };
+            if (lastEventId) {
+                headers['Last-Event-ID'] = lastEventId;
+            }
+            const response = await fetch('/api/moderator/feedbacks/live', { headers, signal: controller.signal });
+            // Истек access-токен: переподключаемся сразу с новым
+            if (response.status === 401 && await refreshTokens()) {
+                continue;
+            }
+            if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
+                throw new Error(data.detail || `HTTP ошибка! статус: ${response.status}`);
+            }
+            displayResponse({ message: 'Лента подключена, ожидаем новые отзывы', feedbacks: received });
+
+            const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) {
+                    break;
+                }
+                buffer += value;
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const block of events) {
+                    const event = {};
+                    for (const line of block.split('\n')) {
+                        const separator = line.indexOf(': ');
+                        if (separator > 0) {
+                            event[line.slice(0, separator)] = line.slice(separator + 2);
+                        }
+                    }
+                    if (event.event === 'feedback') {
+                        lastEventId = event.id;
+                        received.unshift(JSON.parse(event.data));
+                        received.splice(100);
+                        displayResponse({ message: 'Новые отзывы', feedbacks: received });
+                    }
+                }
+            }
+        } catch (error) {
+            if (controller.signal.aborted) {
+                return;
+            }
+            console.error('[toggleLiveFeed] Error:', error);
+            displayResponse({ error: error.message });
+            stopLiveFeed();
+            return;
+        }
+        await new Promise(resolve => setTimeout(resolve, 3000));
+    }
+}
+
 async function deleteFeedback() {
     const feedbackId = document.getElementById('feedbackId').value;
     if (!feedbackId) {